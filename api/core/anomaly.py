@@ -0,0 +1,207 @@
+"""
+Streaming per-node metric anomaly detection
+"""
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core.config import settings
+from core.heartbeat_feed import HeartbeatListener
+from core.node_store import epoch_to_iso
+
+METRICS = ("cpu_usage", "memory_usage")
+
+
+def occurrence_rank(slots: np.ndarray) -> np.ndarray:
+    """For each position, how many earlier positions hold the same slot"""
+    order = np.argsort(slots, kind="stable")
+    ordered = slots[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(ordered)]))
+    rank = np.empty(len(slots), dtype=np.int64)
+    rank[order] = np.arange(len(slots)) - group_start
+    return rank
+
+
+class AnomalyDetector(HeartbeatListener):
+    """
+    Exponentially weighted mean/variance baseline per node and metric.
+
+    State lives in (capacity, len(METRICS)) float arrays indexed by a
+    per-node slot, so a heartbeat batch is a few vectorised updates and
+    each sample costs O(1). Every sample is scored against the baseline
+    before it is folded in; deviations are winsorised at the threshold so
+    a single spike cannot drag the baseline with it. detect() scans the
+    latest scores for the whole fleet in one pass.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        alpha: float = 0.05,
+        threshold: float = 4.0,
+        warmup: int = 10,
+        min_std: float = 1.0,
+        max_age_seconds: float = 300
+    ):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.min_std = min_std
+        self.max_age_seconds = max_age_seconds
+        self._index: Dict[str, int] = {}
+        self._free: List[int] = []
+        self.node_ids: List[Optional[str]] = []
+        shape = (capacity, len(METRICS))
+        self.mean = np.zeros(shape)
+        self.var = np.zeros(shape)
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.expected = np.zeros(shape)
+        self.actual = np.zeros(shape)
+        self.score = np.zeros(shape)
+        self.scored_at = np.zeros(shape)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.mean)
+
+    def _grow(self):
+        capacity = self.capacity * 2
+        for name in ("mean", "var", "count", "expected", "actual", "score", "scored_at"):
+            column = getattr(self, name)
+            grown = np.zeros((capacity, column.shape[1]), dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def _slots(self, node_ids: Sequence[str]) -> np.ndarray:
+        slots = np.empty(len(node_ids), dtype=np.int64)
+        index = self._index
+        for i, node_id in enumerate(node_ids):
+            slot = index.get(node_id)
+            if slot is None:
+                if self._free:
+                    slot = self._free.pop()
+                    self.node_ids[slot] = node_id
+                else:
+                    slot = len(self.node_ids)
+                    if slot == self.capacity:
+                        self._grow()
+                    self.node_ids.append(node_id)
+                index[node_id] = slot
+            slots[i] = slot
+        return slots
+
+    def forget(self, node_id: str):
+        slot = self._index.pop(node_id, None)
+        if slot is None:
+            return
+        self.node_ids[slot] = None
+        for name in ("mean", "var", "count", "expected", "actual", "score", "scored_at"):
+            getattr(self, name)[slot] = 0
+        self._free.append(slot)
+
+    def ingest(self, node_ids, cpu, memory, timestamps):
+        slots = self._slots(node_ids)
+        values = np.column_stack((cpu, memory)).astype(np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        rank = occurrence_rank(slots)
+        if not rank.any():
+            self._update(slots, values, timestamps)
+            return
+        # Replayed buffers repeat a node; apply its samples in order
+        for r in range(int(rank.max()) + 1):
+            step = rank == r
+            self._update(slots[step], values[step], timestamps[step])
+
+    def _update(self, slots: np.ndarray, values: np.ndarray, timestamps: np.ndarray):
+        for m in range(len(METRICS)):
+            x = values[:, m]
+            present = ~np.isnan(x)
+            if not present.all():
+                s, x, ts = slots[present], x[present], timestamps[present]
+            else:
+                s, ts = slots, timestamps
+            if not len(s):
+                continue
+            mean = self.mean[s, m]
+            var = self.var[s, m]
+            count = self.count[s, m]
+            std = np.maximum(np.sqrt(var), self.min_std)
+
+            diff = x - mean
+            score = np.where(count > 0, diff / std, 0.0)
+            self.expected[s, m] = np.where(count > 0, mean, x)
+            self.actual[s, m] = x
+            self.score[s, m] = score
+            self.scored_at[s, m] = ts
+
+            # Winsorise once warmed up so outliers only nudge the baseline
+            limit = self.threshold * std
+            clipped = np.where(count >= self.warmup, np.clip(diff, -limit, limit), diff)
+            increment = self.alpha * clipped
+            self.mean[s, m] = np.where(count > 0, mean + increment, x)
+            self.var[s, m] = np.where(count > 0, (1 - self.alpha) * (var + clipped * increment), 0.0)
+            self.count[s, m] = count + 1
+
+    def detect(
+        self,
+        node_id: Optional[str] = None,
+        metric_type: Optional[str] = None,
+        now: Optional[float] = None
+    ) -> List[dict]:
+        """Current anomalies across the fleet, largest deviation first"""
+        now = time.time() if now is None else now
+        size = len(self.node_ids)
+        flagged = (
+            (self.count[:size] > self.warmup)
+            & (np.abs(self.score[:size]) >= self.threshold)
+            & (self.scored_at[:size] >= now - self.max_age_seconds)
+        )
+        if node_id is not None:
+            slot = self._index.get(node_id)
+            keep = np.zeros(size, dtype=bool)
+            if slot is not None:
+                keep[slot] = True
+            flagged &= keep[:, None]
+        if metric_type is not None:
+            if metric_type not in METRICS:
+                return []
+            flagged[:, [i for i, m in enumerate(METRICS) if m != metric_type]] = False
+
+        slots, metrics = np.nonzero(flagged)
+        order = np.argsort(-np.abs(self.score[slots, metrics]), kind="stable")
+        slots, metrics = slots[order], metrics[order]
+        anomalies = []
+        for slot, m, expected, actual, score, ts in zip(
+            slots.tolist(),
+            metrics.tolist(),
+            self.expected[slots, metrics].tolist(),
+            self.actual[slots, metrics].tolist(),
+            self.score[slots, metrics].tolist(),
+            self.scored_at[slots, metrics].tolist()
+        ):
+            node = self.node_ids[slot]
+            anomalies.append({
+                "anomaly_id": f"anom-{node}-{METRICS[m]}-{int(ts)}",
+                "node_id": node,
+                "metric_type": METRICS[m],
+                "expected_value": round(expected, 2),
+                "actual_value": round(actual, 2),
+                "deviation": round(score, 2),
+                "timestamp": epoch_to_iso(ts)
+            })
+        return anomalies
+
+
+anomaly_detector = AnomalyDetector(
+    capacity=settings.MAX_EDGE_NODES or 1024,
+    alpha=settings.ANOMALY_EWMA_ALPHA,
+    threshold=settings.ANOMALY_THRESHOLD,
+    warmup=settings.ANOMALY_WARMUP_SAMPLES,
+    min_std=settings.ANOMALY_MIN_STD,
+    max_age_seconds=settings.ANOMALY_MAX_AGE_SECONDS
+)
@@ -0,0 +1,65 @@
+"""
+Request body decompression shared by the bulk ingest endpoints
+"""
+import zlib
+
+from fastapi import HTTPException, Request, status
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Request body exceeds {max_bytes} bytes"
+    )
+
+
+async def read_body(request: Request, max_bytes: int) -> bytes:
+    """
+    Read and decompress a request body of at most max_bytes.
+
+    A larger Content-Length is refused before anything is read, and a
+    body streamed without one stops being buffered once it passes the cap.
+    """
+    try:
+        declared = int(request.headers.get("content-length", 0))
+    except ValueError:
+        declared = 0
+    if declared > max_bytes:
+        raise _too_large(max_bytes)
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise _too_large(max_bytes)
+        chunks.append(chunk)
+    return decompress_body(
+        b"".join(chunks),
+        request.headers.get("content-encoding", "").lower(),
+        max_bytes
+    )
+
+
+def decompress_body(body: bytes, encoding: str, max_bytes: int) -> bytes:
+    """Undo Content-Encoding, refusing bodies that are or inflate past max_bytes"""
+    if encoding in ("", "identity"):
+        if len(body) > max_bytes:
+            raise _too_large(max_bytes)
+        return body
+    if encoding not in ("gzip", "deflate"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported content encoding: {encoding}"
+        )
+    # wbits 47 auto-detects gzip and zlib headers
+    inflater = zlib.decompressobj(47)
+    try:
+        data = inflater.decompress(body, max_bytes)
+    except zlib.error as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid {encoding} body: {e}"
+        )
+    if inflater.unconsumed_tail:
+        raise _too_large(max_bytes)
+    return data
@@ -2,7 +2,7 @@
 Application configuration
 """
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -16,22 +16,111 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Require a bearer token on node, security and intelligence routes
+    AUTH_ENABLED: bool = False
+    # Additional signing keys by kid (JSON object); SECRET_KEY is kid "default"
+    JWT_KEYS: Dict[str, str] = {}
+    JWT_ACTIVE_KID: str = ""
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL: int = 300
+    
+    # Password Hashing (bcrypt on a "thread" or "process" pool; ROUNDS=0 calibrates to TARGET_MS)
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    PASSWORD_HASH_ROUNDS: int = 0
+    PASSWORD_HASH_TARGET_MS: float = 250
+    PASSWORD_HASH_MIN_ROUNDS: int = 10
+    PASSWORD_HASH_MAX_ROUNDS: int = 16
+    
+    # Access Policy (default deny; rules are read from POLICY_FILE)
+    POLICY_ENABLED: bool = False
+    POLICY_FILE: str = "policy.json"
+    POLICY_CACHE_SIZE: int = 10000
+    POLICY_CACHE_TTL: int = 60
+    POLICY_RELOAD_INTERVAL: float = 5.0
+    
+    # Push Hub (WebSocket/SSE updates, coalesced and sent every PUSH_TICK seconds)
+    PUSH_TICK: float = 1.0
+    PUSH_QUEUE_SIZE: int = 8
+    PUSH_MAX_CLIENTS: int = 5000
+    PUSH_MAX_OVERFLOWS: int = 3
+    PUSH_KEEPALIVE: float = 15.0
     
     # CORS
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
     
-    # Edge Nodes
+    # Edge Nodes (MAX_EDGE_NODES=0 allows any number)
     MAX_EDGE_NODES: int = 100
     NODE_HEARTBEAT_INTERVAL: int = 30
+    # Missed intervals before a node is reported stale, then offline
+    NODE_STALE_AFTER_INTERVALS: float = 3
+    NODE_OFFLINE_AFTER_INTERVALS: float = 10
+    NODE_LIVENESS_EVENTS: int = 1000
+    HEARTBEAT_BATCH_MAX_SIZE: int = 50000
+    HEARTBEAT_BATCH_MAX_BYTES: int = 16 * 1024 * 1024
+    # Accepted heartbeat sample times: up to this old (edge agents replay buffered samples) or this far ahead
+    HEARTBEAT_MAX_AGE_SECONDS: int = 7 * 86400
+    HEARTBEAT_MAX_CLOCK_SKEW: int = 300
+    
+    # Metric History (raw ring plus {resolution seconds: buckets} rollups per node)
+    METRIC_HISTORY_RAW_SAMPLES: int = 240
+    METRIC_HISTORY_ROLLUPS: Dict[int, int] = {60: 180, 300: 288, 3600: 168}
+    METRIC_HISTORY_DIR: str = "data/metric_history"
+    # Seconds between snapshots to METRIC_HISTORY_DIR; 0 keeps history in memory only
+    METRIC_HISTORY_SNAPSHOT_INTERVAL: float = 300
+    
+    # Threat Store
+    THREAT_STORE_MAX_ALERTS: int = 10000
+    THREAT_STORE_MAX_AGE_SECONDS: int = 86400
+    
+    # Threat Forecasting (per-type counts in buckets, seasonal cycle and horizon in buckets)
+    FORECAST_BUCKET_SECONDS: int = 3600
+    FORECAST_SEASON_BUCKETS: int = 24
+    FORECAST_HORIZON_BUCKETS: int = 24
+    FORECAST_REFRESH_INTERVAL: float = 60
+    
+    # Load Rebalancing (load is max(cpu, memory); a plan is reused until a node drifts by the tolerance)
+    REBALANCE_HIGH_WATERMARK: float = 80.0
+    REBALANCE_LOW_WATERMARK: float = 30.0
+    REBALANCE_TOLERANCE: float = 5.0
+    REBALANCE_MIN_MOVE: float = 1.0
+    
+    # Response Cache (serialized GET /nodes/, /security/threats and /security/posture bodies)
+    RESPONSE_CACHE_MAX_ENTRIES: int = 256
+    
+    # Anomaly Detection
+    ANOMALY_EWMA_ALPHA: float = 0.05
+    ANOMALY_THRESHOLD: float = 4.0
+    ANOMALY_WARMUP_SAMPLES: int = 10
+    ANOMALY_MIN_STD: float = 1.0
+    ANOMALY_MAX_AGE_SECONDS: int = 300
+    
+    # Analytics Ingest
+    INGEST_DIR: str = "data/events"
+    INGEST_QUEUE_SIZE: int = 10000
+    INGEST_BATCH_SIZE: int = 500
+    INGEST_FLUSH_INTERVAL: float = 1.0
+    INGEST_BATCH_MAX_EVENTS: int = 1000
+    INGEST_BATCH_MAX_BYTES: int = 4 * 1024 * 1024
+    INGEST_SEGMENT_MAX_BYTES: int = 64 * 1024 * 1024
+    INGEST_SEGMENT_MAX_AGE_SECONDS: int = 3600
+    INGEST_MAX_TOTAL_BYTES: int = 1024 * 1024 * 1024
+    
+    # Storage ("memory" for a single process, "redis" for shared state)
+    STORAGE_BACKEND: str = "memory"
     
     # Redis
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_KEY_PREFIX: str = "hh"
     
     # Monitoring
     METRICS_ENABLED: bool = True
     LOG_LEVEL: str = "INFO"
+    HEALTH_SAMPLE_INTERVAL: float = 5.0
     
     # Zero-Trust
     ENABLE_MTLS: bool = True
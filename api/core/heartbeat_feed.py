@@ -0,0 +1,82 @@
+"""
+In-process fan-out of accepted heartbeats to analytics consumers
+"""
+import logging
+from typing import List, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatListener:
+    """Interface for consumers of heartbeat batches"""
+
+    def ingest(
+        self,
+        node_ids: Sequence[str],
+        cpu: np.ndarray,
+        memory: np.ndarray,
+        timestamps: np.ndarray
+    ):
+        """Consume samples for known nodes (NaN metrics mean unchanged)"""
+
+    def forget(self, node_id: str):
+        """Drop any state held for a deregistered node"""
+
+
+class HeartbeatFeed:
+    """
+    Delivers heartbeats accepted by the storage backend to in-process
+    listeners such as the anomaly detector.
+
+    Listeners run inline on the event loop and must stay O(batch); a
+    failing listener is logged and does not affect the others or the
+    request. With several workers each process sees only the heartbeats
+    it served.
+    """
+
+    def __init__(self):
+        self._listeners: List[HeartbeatListener] = []
+
+    def subscribe(self, listener: HeartbeatListener):
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: HeartbeatListener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def publish(
+        self,
+        node_ids: Sequence[str],
+        cpu: np.ndarray,
+        memory: np.ndarray,
+        timestamps: np.ndarray,
+        unknown: Sequence[str] = ()
+    ):
+        """Forward a batch, minus the ids the backend did not recognise"""
+        if not self._listeners or not len(node_ids):
+            return
+        if unknown:
+            rejected = set(unknown)
+            keep = np.fromiter((n not in rejected for n in node_ids), dtype=bool, count=len(node_ids))
+            if not keep.any():
+                return
+            node_ids = [n for n, k in zip(node_ids, keep.tolist()) if k]
+            cpu, memory, timestamps = cpu[keep], memory[keep], timestamps[keep]
+        for listener in self._listeners:
+            try:
+                listener.ingest(node_ids, cpu, memory, timestamps)
+            except Exception as e:
+                logger.error(f"Heartbeat listener {type(listener).__name__} failed: {e}")
+
+    def node_removed(self, node_id: str):
+        for listener in self._listeners:
+            try:
+                listener.forget(node_id)
+            except Exception as e:
+                logger.error(f"Heartbeat listener {type(listener).__name__} failed: {e}")
+
+
+heartbeat_feed = HeartbeatFeed()
@@ -0,0 +1,390 @@
+"""
+Bounded ingest pipeline for analytics events
+"""
+import asyncio
+import gzip
+import json
+import logging
+import mmap
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "events-"
+# (event_type, data, epoch timestamp)
+Event = Tuple[str, dict, float]
+
+
+class IngestQueueFull(Exception):
+    """The pipeline cannot accept more events right now (HTTP 429)"""
+
+
+class IngestUnavailable(Exception):
+    """The pipeline is stopped or cannot write to disk (HTTP 503)"""
+
+
+def encode_batch(events: List[Event]) -> bytes:
+    """
+    Micro-aggregate a batch into one JSON line per event type.
+
+    Each line holds the type once with parallel timestamp and data lists,
+    so the type string and envelope are not repeated for every event.
+    """
+    groups: Dict[str, Tuple[List[float], List[dict]]] = {}
+    for event_type, data, ts in events:
+        group = groups.get(event_type)
+        if group is None:
+            group = groups[event_type] = ([], [])
+        group[0].append(ts)
+        group[1].append(data)
+    lines = [
+        json.dumps(
+            {"event_type": t, "count": len(ts), "timestamps": ts, "data": data},
+            separators=(",", ":")
+        )
+        for t, (ts, data) in groups.items()
+    ]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _writer_gone(path: Path) -> bool:
+    """True if the process named in an active segment's file name has exited"""
+    try:
+        pid = int(path.name[len(SEGMENT_PREFIX):-len(".jsonl")].split("-")[1])
+    except (IndexError, ValueError):
+        return True
+    if pid == os.getpid():
+        # A previous process with our pid (common in containers); our own
+        # active segment is excluded by the caller
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def _complete_length(path: Path, chunk: int = 64 * 1024) -> int:
+    """Length of path up to and including its last newline"""
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(end - chunk, 0)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+class SegmentWriter:
+    """
+    Append-only JSONL segments, rotated by size and age.
+
+    Sealed segments are gzipped and the oldest are deleted once the
+    directory exceeds max_total_bytes. Segment names start with their
+    creation time, so lexical order is chronological and carry the
+    writer's pid, so recover() can seal what a crashed worker left
+    behind. All methods block and are meant to run in a worker thread.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age_seconds: float = 3600,
+        max_total_bytes: int = 1024 * 1024 * 1024
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.max_total_bytes = max_total_bytes
+        self._file = None
+        self._path: Optional[Path] = None
+        self._opened_at = 0.0
+        self._size = 0
+        self._seq = 0
+
+    def _open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._seq += 1
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        self._path = self.directory / f"{SEGMENT_PREFIX}{stamp}-{os.getpid()}-{self._seq:06d}.jsonl"
+        self._file = open(self._path, "ab")
+        self._opened_at = time.monotonic()
+        self._size = 0
+
+    def write(self, payload: bytes):
+        if self._file is not None and (
+            self._size >= self.max_bytes
+            or time.monotonic() - self._opened_at >= self.max_age_seconds
+        ):
+            self.seal()
+        if self._file is None:
+            self._open()
+        self._file.write(payload)
+        self._file.flush()
+        self._size += len(payload)
+
+    def seal(self):
+        """Close the active segment, compress it and apply retention"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        self._compress(self._path, self._size)
+        self._prune()
+
+    def recover(self):
+        """Seal active segments whose writer process is gone and apply retention"""
+        if not self.directory.exists():
+            return
+        for path in sorted(self.directory.glob(f"{SEGMENT_PREFIX}*.jsonl")):
+            if path == self._path or not _writer_gone(path):
+                continue
+            try:
+                length = _complete_length(path)
+                self._compress(path, length)
+            except FileNotFoundError:
+                # Another worker recovered it first
+                continue
+            logger.warning(f"Sealed event segment {path.name} left by a stopped writer")
+        self._prune()
+
+    def _compress(self, path: Path, length: int):
+        """Gzip the first length bytes of path next to it and remove path"""
+        if length:
+            staging = Path(f"{path}.gz.{os.getpid()}.tmp")
+            with open(path, "rb") as src, gzip.open(staging, "wb") as dst:
+                # A crashed writer may have left a partial last line
+                remaining = length
+                while remaining:
+                    block = src.read(min(remaining, 1024 * 1024))
+                    if not block:
+                        break
+                    dst.write(block)
+                    remaining -= len(block)
+            os.replace(staging, f"{path}.gz")
+        path.unlink()
+
+    def _prune(self):
+        sealed = sorted(self.directory.glob(f"{SEGMENT_PREFIX}*.jsonl.gz"))
+        sizes = [p.stat().st_size for p in sealed]
+        total = sum(sizes)
+        for path, size in zip(sealed, sizes):
+            if total <= self.max_total_bytes:
+                break
+            path.unlink()
+            total -= size
+            logger.info(f"Removed event segment {path.name} (retention)")
+
+
+class IngestPipeline:
+    """
+    Accepts analytics events into a bounded asyncio queue and persists
+    them in batches from a background task.
+
+    submit() never waits: it raises IngestQueueFull when the queue cannot
+    take the whole request and IngestUnavailable when the pipeline is not
+    running or the last disk write failed. Batches are grouped by event
+    type and written through a SegmentWriter off the event loop.
+    """
+
+    def __init__(
+        self,
+        writer: SegmentWriter,
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0
+    ):
+        self.writer = writer
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.accepted = 0
+        self.written = 0
+        self.by_type: Counter = Counter()
+        self.healthy = True
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, events: List[Event]) -> int:
+        """Enqueue events all-or-nothing and return the total accepted"""
+        if self._task is None or self._stopping or not self.healthy:
+            raise IngestUnavailable()
+        if self.queue_size - self._queue.qsize() < len(events):
+            raise IngestQueueFull()
+        for event in events:
+            self._queue.put_nowait(event)
+        self.accepted += len(events)
+        return self.accepted
+
+    async def _write(self, batch: List[Event]):
+        payload = encode_batch(batch)
+        while True:
+            try:
+                await asyncio.to_thread(self.writer.write, payload)
+                break
+            except OSError as e:
+                if self._stopping:
+                    logger.error(f"Dropping {len(batch)} events on shutdown: {e}")
+                    return
+                # Keep the batch; new submissions get 503 until disk recovers
+                if self.healthy:
+                    logger.error(f"Writing event segment failed: {e}")
+                self.healthy = False
+                await asyncio.sleep(self.flush_interval)
+        self.healthy = True
+        self.written += len(batch)
+        for event_type, _, _ in batch:
+            self.by_type[event_type] += 1
+
+    def _take(self, batch: List[Event]):
+        while len(batch) < self.batch_size and not self._queue.empty():
+            event = self._queue.get_nowait()
+            if event is not None:
+                batch.append(event)
+
+    async def _run(self):
+        try:
+            await asyncio.to_thread(self.writer.recover)
+        except OSError as e:
+            logger.error(f"Recovering event segments failed: {e}")
+        while not (self._stopping and self._queue.empty()):
+            # None is the wake-up sentinel put by stop()
+            event = await self._queue.get()
+            batch = [event] if event is not None else []
+            # Give a trickle of events up to flush_interval to fill a batch
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                self._take(batch)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or self._stopping or remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if event is not None:
+                    batch.append(event)
+            if batch:
+                await self._write(batch)
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush what is queued, then seal the active segment"""
+        if self._task is None:
+            return
+        self._stopping = True
+        try:
+            self._queue.put_nowait(None)
+        except asyncio.QueueFull:
+            # The writer is busy draining and will see the flag
+            pass
+        await self._task
+        self._task = None
+        await asyncio.to_thread(self.writer.seal)
+
+    def stats(self) -> Dict:
+        return {
+            "queue_depth": self.depth,
+            "queue_capacity": self.queue_size,
+            "accepted": self.accepted,
+            "written": self.written,
+            "healthy": self.healthy,
+            "by_event_type": dict(self.by_type)
+        }
+
+
+def _iter_lines(path: Path) -> Iterator[bytes]:
+    if path.suffix == ".gz":
+        with gzip.open(path, "rb") as f:
+            yield from f
+        return
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            while True:
+                line = mapped.readline()
+                # A partially written last line is left for the next read
+                if not line.endswith(b"\n"):
+                    return
+                yield line
+
+
+def iter_segments(directory: Union[str, Path]) -> List[Path]:
+    """Segment files oldest first, sealed (.jsonl.gz) and active (.jsonl)"""
+    directory = Path(directory)
+    if not directory.exists():
+        return []
+    return sorted(
+        p for p in directory.iterdir()
+        if p.name.startswith(SEGMENT_PREFIX) and p.name.endswith((".jsonl", ".jsonl.gz"))
+    )
+
+
+def iter_events(
+    directory: Union[str, Path],
+    event_type: Optional[str] = None,
+    since: Optional[float] = None
+) -> Iterator[Dict]:
+    """
+    Stream events back out of the segments, one dict at a time.
+
+    Sealed segments are decompressed incrementally and active ones are
+    memory-mapped, so memory use does not grow with history size.
+    """
+    for path in iter_segments(directory):
+        try:
+            lines = _iter_lines(path)
+            for line in lines:
+                group = json.loads(line)
+                if event_type is not None and group["event_type"] != event_type:
+                    continue
+                for ts, data in zip(group["timestamps"], group["data"]):
+                    if since is not None and ts < since:
+                        continue
+                    yield {
+                        "event_type": group["event_type"],
+                        "data": data,
+                        "timestamp": datetime.utcfromtimestamp(ts).isoformat()
+                    }
+        except FileNotFoundError:
+            # Sealed or pruned while we were listing; the .gz is picked up
+            # on the next pass
+            continue
+
+
+ingest_pipeline = IngestPipeline(
+    SegmentWriter(
+        settings.INGEST_DIR,
+        max_bytes=settings.INGEST_SEGMENT_MAX_BYTES,
+        max_age_seconds=settings.INGEST_SEGMENT_MAX_AGE_SECONDS,
+        max_total_bytes=settings.INGEST_MAX_TOTAL_BYTES
+    ),
+    queue_size=settings.INGEST_QUEUE_SIZE,
+    batch_size=settings.INGEST_BATCH_SIZE,
+    flush_interval=settings.INGEST_FLUSH_INTERVAL
+)
@@ -0,0 +1,266 @@
+"""
+Node liveness tracking on a hashed timer wheel
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.heartbeat_feed import HeartbeatListener
+from core.node_store import NODE_STATUSES, epoch_to_iso
+
+logger = logging.getLogger(__name__)
+
+ACTIVE, STALE, OFFLINE = NODE_STATUSES
+
+LivenessCallback = Callable[[dict], None]
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel of `slots` buckets, each `tick` seconds wide.
+
+    schedule() is O(1) and advance() only visits the buckets whose ticks
+    have passed, so the work per tick is proportional to the timers that
+    fire. Deadlines beyond one revolution are parked in the furthest
+    bucket; the owner re-schedules them when they fire early.
+    """
+
+    def __init__(self, tick: float, slots: int, now: float):
+        self.tick = tick
+        self.buckets: List[List[Tuple[int, str]]] = [[] for _ in range(slots)]
+        self.current = int(now // tick)
+
+    def schedule(self, key: str, deadline: float) -> int:
+        """File key under the tick covering deadline and return that tick"""
+        size = len(self.buckets)
+        due = min(max(math.ceil(deadline / self.tick), self.current + 1), self.current + size)
+        self.buckets[due % size].append((due, key))
+        return due
+
+    def advance(self, now: float) -> List[Tuple[int, str]]:
+        """Pop every (tick, key) due by now"""
+        target = int(now // self.tick)
+        fired = []
+        if target <= self.current:
+            return fired
+        size = len(self.buckets)
+        # After a long pause every bucket is due, but each is visited once
+        for tick in range(max(self.current + 1, target - size + 1), target + 1):
+            bucket = self.buckets[tick % size]
+            if not bucket:
+                continue
+            later = [entry for entry in bucket if entry[0] > target]
+            if len(later) < len(bucket):
+                fired.extend(entry for entry in bucket if entry[0] <= target)
+            self.buckets[tick % size] = later
+        self.current = target
+        return fired
+
+
+class LivenessTracker(HeartbeatListener):
+    """
+    Moves nodes active -> stale -> offline as heartbeats stop arriving.
+
+    Each node keeps its last arrival time on the monotonic clock and at
+    most one live timer. A heartbeat only refreshes that time; when the
+    timer fires the node is either rescheduled (it was heard from since)
+    or moves on, so steady heartbeats cost O(1) and each tick costs
+    O(timers fired). Transitions are written to storage, guarded by the
+    backend's last-seen time so a node heard by another worker is left
+    alone, and published to subscribers and a bounded event history.
+    """
+
+    def __init__(
+        self,
+        interval: float = 30,
+        stale_after: float = 90,
+        offline_after: float = 300,
+        tick: Optional[float] = None,
+        history: int = 1000
+    ):
+        self.interval = interval
+        self.stale_after = stale_after
+        self.offline_after = offline_after
+        self.tick = tick if tick is not None else max(interval / 10, 0.5)
+        slots = math.ceil(offline_after / self.tick) + 1
+        self.wheel = TimerWheel(self.tick, slots, time.monotonic())
+        # node_id -> [last seen (monotonic), status, tick of its live timer]
+        self._nodes: Dict[str, list] = {}
+        self.events: Deque[dict] = deque(maxlen=history)
+        self.seq = 0
+        self._listeners: List[LivenessCallback] = []
+        self._storage = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def subscribe(self, callback: LivenessCallback):
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback: LivenessCallback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def status(self, node_id: str) -> Optional[str]:
+        state = self._nodes.get(node_id)
+        return state[1] if state is not None else None
+
+    def _schedule(self, node_id: str, state: list, deadline: float):
+        state[2] = self.wheel.schedule(node_id, deadline)
+
+    def track(self, node_id: str, last_seen: Optional[float] = None, status: str = ACTIVE):
+        """Start tracking a node, last heard from at last_seen (monotonic)"""
+        last_seen = time.monotonic() if last_seen is None else last_seen
+        state = [last_seen, status, None]
+        self._nodes[node_id] = state
+        if status != OFFLINE:
+            self._schedule(node_id, state, last_seen + (self.stale_after if status == ACTIVE else self.offline_after))
+
+    def forget(self, node_id: str):
+        # Its timer, if any, is skipped when it fires
+        self._nodes.pop(node_id, None)
+
+    def ingest(self, node_ids, cpu, memory, timestamps):
+        # Liveness follows arrival time, not sample time: replayed buffers
+        # carry old timestamps but prove the node is up now
+        now = time.monotonic()
+        nodes = self._nodes
+        for node_id in node_ids:
+            state = nodes.get(node_id)
+            if state is None:
+                self.track(node_id, now)
+                continue
+            state[0] = now
+            if state[1] != ACTIVE:
+                # The backend marked it active when it stored the heartbeat
+                self._publish(node_id, state[1], ACTIVE)
+                state[1] = ACTIVE
+                self._schedule(node_id, state, now + self.stale_after)
+
+    def _publish(self, node_id: str, previous: str, status: str):
+        self.seq += 1
+        event = {
+            "seq": self.seq,
+            "node_id": node_id,
+            "previous": previous,
+            "status": status,
+            "timestamp": epoch_to_iso(time.time())
+        }
+        self.events.append(event)
+        for callback in self._listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Liveness subscriber failed: {e}")
+
+    def advance(self, now: Optional[float] = None) -> Dict[str, List[str]]:
+        """
+        Fire due timers and return the nodes that should change status,
+        grouped by new status. Statuses are updated by apply().
+        """
+        now = time.monotonic() if now is None else now
+        changes: Dict[str, List[str]] = {STALE: [], OFFLINE: []}
+        for tick, node_id in self.wheel.advance(now):
+            state = self._nodes.get(node_id)
+            if state is None or state[2] != tick:
+                continue
+            silent = now - state[0]
+            if silent >= self.offline_after:
+                status = OFFLINE
+                state[2] = None
+            elif silent >= self.stale_after:
+                status = STALE
+                self._schedule(node_id, state, state[0] + self.offline_after)
+            else:
+                status = ACTIVE
+                self._schedule(node_id, state, state[0] + self.stale_after)
+            if status != state[1] and status != ACTIVE:
+                changes[status].append(node_id)
+        return changes
+
+    async def apply(self, changes: Dict[str, List[str]], storage):
+        """Persist transitions from advance() and publish those that took"""
+        now = time.monotonic()
+        for status, node_ids in changes.items():
+            if not node_ids:
+                continue
+            threshold = self.offline_after if status == OFFLINE else self.stale_after
+            updated, missing = await storage.set_node_status(node_ids, status, seen_before=time.time() - threshold)
+            for node_id in missing:
+                self.forget(node_id)
+            updated = set(updated)
+            for node_id in node_ids:
+                state = self._nodes.get(node_id)
+                if state is None:
+                    continue
+                if node_id in updated:
+                    self._publish(node_id, state[1], status)
+                    state[1] = status
+                elif node_id not in missing:
+                    # Another worker heard from it recently
+                    state[0] = now
+                    self._schedule(node_id, state, now + self.stale_after)
+
+    async def seed(self, storage):
+        """Track every stored node, dating its last contact from its last heartbeat"""
+        columns = await storage.node_columns()
+        now, wall = time.monotonic(), time.time()
+        for node_id, heartbeat, status in zip(
+            columns["node_id"],
+            columns["last_heartbeat"].tolist(),
+            columns["status"].tolist()
+        ):
+            if node_id not in self._nodes:
+                self.track(node_id, now - max(wall - heartbeat, 0.0), NODE_STATUSES[status])
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                await self.apply(self.advance(), self._storage)
+            except Exception as e:
+                logger.error(f"Liveness tick failed: {e}")
+
+    async def start(self, storage):
+        """Seed from storage and start the background tick task"""
+        if self._task is not None:
+            return
+        self._storage = storage
+        try:
+            await self.seed(storage)
+        except Exception as e:
+            logger.error(f"Could not seed liveness tracker: {e}")
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Liveness tracker started ({len(self)} nodes, stale after {self.stale_after}s, "
+            f"offline after {self.offline_after}s)"
+        )
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def events_since(self, cursor: int = 0, limit: int = 100) -> Tuple[List[dict], int]:
+        """Transitions with seq > cursor, oldest first, and the next cursor"""
+        events = [e for e in self.events if e["seq"] > cursor][:limit]
+        return events, events[-1]["seq"] if events else cursor
+
+
+liveness_tracker = LivenessTracker(
+    interval=settings.NODE_HEARTBEAT_INTERVAL,
+    stale_after=settings.NODE_HEARTBEAT_INTERVAL * settings.NODE_STALE_AFTER_INTERVALS,
+    offline_after=settings.NODE_HEARTBEAT_INTERVAL * settings.NODE_OFFLINE_AFTER_INTERVALS,
+    history=settings.NODE_LIVENESS_EVENTS
+)
@@ -0,0 +1,253 @@
+"""
+Prometheus instrumentation for the API and edge node fleet
+"""
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import REGISTRY, generate_latest
+
+# Request latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+class Histogram:
+    """
+    Cumulative-on-export histogram.
+
+    observe() is a bisect and two increments. Recording happens on the
+    event loop thread only, so no lock is needed; exporters work on a
+    snapshot taken on the loop.
+    """
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        # One slot per bucket plus +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        return list(self.counts), self.sum
+
+
+class RequestMetrics:
+    """Per-route request counters, latency histograms and in-flight gauge"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.in_flight = 0
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+
+    def record(self, method: str, route: str, status_code: int, duration: float):
+        key = (method, route)
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram(self.buckets)
+        histogram.observe(duration)
+        key = (method, route, status_code)
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "latency": {key: h.snapshot() for key, h in self.latency.items()},
+            "requests": dict(self.requests)
+        }
+
+
+request_metrics = RequestMetrics()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording every HTTP request.
+
+    Requests are labelled with the matched route template rather than the
+    raw path, so /nodes/{node_id} is one series however many nodes exist.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics = self.metrics
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            metrics.in_flight -= 1
+            route = scope.get("route")
+            metrics.record(
+                scope["method"],
+                getattr(route, "path", UNMATCHED_ROUTE),
+                status_code,
+                duration
+            )
+
+
+def _escape(value: Optional[str]) -> str:
+    value = "" if value is None else str(value)
+    if "\\" in value or '"' in value or "\n" in value:
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return value
+
+
+def render_requests(snapshot: dict, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> List[str]:
+    lines = [
+        "# HELP hackerhardware_http_requests_in_progress HTTP requests currently being served",
+        "# TYPE hackerhardware_http_requests_in_progress gauge",
+        f"hackerhardware_http_requests_in_progress {snapshot['in_flight']}",
+        "# HELP hackerhardware_http_requests_total HTTP requests by route and status",
+        "# TYPE hackerhardware_http_requests_total counter"
+    ]
+    for (method, route, code), count in sorted(snapshot["requests"].items()):
+        lines.append(
+            f'hackerhardware_http_requests_total{{method="{method}",route="{_escape(route)}",'
+            f'status="{code}"}} {count}'
+        )
+    lines += [
+        "# HELP hackerhardware_http_request_duration_seconds HTTP request latency by route",
+        "# TYPE hackerhardware_http_request_duration_seconds histogram"
+    ]
+    bounds = [repr(float(b)) for b in buckets] + ["+Inf"]
+    for (method, route), (counts, total) in sorted(snapshot["latency"].items()):
+        labels = f'method="{method}",route="{_escape(route)}"'
+        cumulative = 0
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            lines.append(
+                f'hackerhardware_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+            )
+        lines.append(f"hackerhardware_http_request_duration_seconds_sum{{{labels}}} {total!r}")
+        lines.append(f"hackerhardware_http_request_duration_seconds_count{{{labels}}} {cumulative}")
+    return lines
+
+
+def render_store_sizes(sizes: Dict[str, int]) -> List[str]:
+    lines = []
+    for name, value in sizes.items():
+        lines += [
+            f"# HELP hackerhardware_{name} Records currently held in the {name.replace('_', ' ')} store",
+            f"# TYPE hackerhardware_{name} gauge",
+            f"hackerhardware_{name} {value}"
+        ]
+    return lines
+
+
+def render_ingest(stats: Dict) -> List[str]:
+    lines = [
+        "# HELP hackerhardware_ingest_queue_depth Analytics events waiting to be written",
+        "# TYPE hackerhardware_ingest_queue_depth gauge",
+        f"hackerhardware_ingest_queue_depth {stats['queue_depth']}",
+        "# HELP hackerhardware_ingest_events_total Analytics events written to segments by type",
+        "# TYPE hackerhardware_ingest_events_total counter"
+    ]
+    for event_type, count in sorted(stats["by_event_type"].items()):
+        lines.append(f'hackerhardware_ingest_events_total{{event_type="{_escape(event_type)}"}} {count}')
+    return lines
+
+
+NODE_SERIES = (
+    ("node_cpu_usage_percent", "cpu_usage", "CPU usage reported by the node"),
+    ("node_memory_usage_percent", "memory_usage", "Memory usage reported by the node"),
+    ("node_last_heartbeat_timestamp_seconds", "last_heartbeat", "Time of the node's last heartbeat"),
+    ("node_up", "up", "1 if the node is active, 0 if stale or offline")
+)
+
+
+def select_target(columns: Dict[str, object], target: str) -> Dict[str, object]:
+    """
+    Restrict node columns to the node matching a Prometheus scrape target.
+
+    The target may be a node id, hostname or IP address, optionally with
+    a :port suffix as produced by the edge_nodes relabelling.
+    """
+    if target.startswith("["):
+        host = target[1:].split("]", 1)[0]
+    elif target.count(":") == 1:
+        host = target.split(":", 1)[0]
+    else:
+        host = target
+    for i, (node_id, hostname, ip) in enumerate(
+        zip(columns["node_id"], columns["hostname"], columns["ip_address"])
+    ):
+        if target == node_id or host in (hostname, ip):
+            return {key: values[i:i + 1] for key, values in columns.items()}
+    return {key: values[:0] for key, values in columns.items()}
+
+
+def render_nodes(columns: Dict[str, object]) -> List[str]:
+    """
+    Per-node gauges from node columns.
+
+    Label sets are built once per node and each metric is formatted from
+    a single tolist() of its column, which keeps tens of thousands of
+    series to a few list comprehensions.
+    """
+    labels = [
+        f'node_id="{_escape(n)}",hostname="{_escape(h)}",ip_address="{_escape(ip)}"'
+        for n, h, ip in zip(columns["node_id"], columns["hostname"], columns["ip_address"])
+    ]
+    values = {
+        "cpu_usage": np.round(columns["cpu_usage"].astype(np.float64), 2).tolist(),
+        "memory_usage": np.round(columns["memory_usage"].astype(np.float64), 2).tolist(),
+        "last_heartbeat": np.round(columns["last_heartbeat"], 3).tolist(),
+        "up": (columns["status"] == 0).astype(np.int8).tolist()
+    }
+    lines = []
+    for name, column, help_text in NODE_SERIES:
+        metric = f"hackerhardware_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        lines.extend([f"{metric}{{{label}}} {value}" for label, value in zip(labels, values[column])])
+    return lines
+
+
+def render(
+    requests: Optional[dict],
+    sizes: Optional[Dict[str, int]],
+    nodes: Dict[str, object],
+    ingest: Optional[Dict] = None
+) -> bytes:
+    """
+    Build the exposition text. CPU bound for large fleets, so callers run
+    it in a worker thread on snapshots taken on the event loop.
+    """
+    lines = []
+    if requests is not None:
+        lines += render_requests(requests)
+    if sizes is not None:
+        lines += render_store_sizes(sizes)
+    if ingest is not None:
+        lines += render_ingest(ingest)
+    lines += render_nodes(nodes)
+    body = ("\n".join(lines) + "\n").encode()
+    if requests is not None:
+        # Process, platform and GC collectors from prometheus_client
+        body = generate_latest(REGISTRY) + body
+    return body
@@ -0,0 +1,176 @@
+"""
+Columnar edge node metric store
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+NODE_STATUSES = ("active", "stale", "offline")
+
+
+def epoch_to_iso(ts: float) -> str:
+    return datetime.utcfromtimestamp(ts).isoformat()
+
+
+class NodeMetricStore:
+    """
+    Node registry backed by preallocated NumPy columns.
+
+    Each node owns a slot; cpu, memory, heartbeat time and status live in
+    parallel arrays indexed by slot, so a batch of heartbeats is a handful
+    of vectorised assignments instead of one model mutation per node.
+    Slots freed by deregistration are reused.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._index: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+        self.node_ids: List[Optional[str]] = []
+        self.hostnames: List[Optional[str]] = []
+        self.ip_addresses: List[Optional[str]] = []
+        self.cpu = np.zeros(capacity, dtype=np.float32)
+        self.memory = np.zeros(capacity, dtype=np.float32)
+        self.last_heartbeat = np.zeros(capacity, dtype=np.float64)
+        self.status = np.zeros(capacity, dtype=np.int8)
+        self.used = np.zeros(capacity, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._index
+
+    @property
+    def capacity(self) -> int:
+        return len(self.used)
+
+    def _grow(self):
+        capacity = self.capacity * 2
+        for name in ("cpu", "memory", "last_heartbeat", "status", "used"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def add(self, node_id: str, hostname: str, ip_address: str, registered_at: float) -> int:
+        """Register a node and return its slot"""
+        if node_id in self._index:
+            slot = self._index[node_id]
+        elif self._free:
+            slot = self._free.pop()
+        else:
+            if self._size == self.capacity:
+                self._grow()
+            slot = self._size
+            self._size += 1
+            self.node_ids.append(None)
+            self.hostnames.append(None)
+            self.ip_addresses.append(None)
+        self._index[node_id] = slot
+        self.node_ids[slot] = node_id
+        self.hostnames[slot] = hostname
+        self.ip_addresses[slot] = ip_address
+        self.cpu[slot] = 0.0
+        self.memory[slot] = 0.0
+        self.last_heartbeat[slot] = registered_at
+        self.status[slot] = 0
+        self.used[slot] = True
+        return slot
+
+    def remove(self, node_id: str) -> bool:
+        slot = self._index.pop(node_id, None)
+        if slot is None:
+            return False
+        self.used[slot] = False
+        self.node_ids[slot] = None
+        self.hostnames[slot] = None
+        self.ip_addresses[slot] = None
+        self._free.append(slot)
+        return True
+
+    def slot(self, node_id: str) -> Optional[int]:
+        return self._index.get(node_id)
+
+    def slots(self, node_ids: Sequence[str]) -> np.ndarray:
+        """Map node ids to slots, -1 for unknown ids"""
+        get = self._index.get
+        return np.fromiter((get(n, -1) for n in node_ids), dtype=np.int64, count=len(node_ids))
+
+    def ingest(
+        self,
+        slots: np.ndarray,
+        cpu: np.ndarray,
+        memory: np.ndarray,
+        timestamps: np.ndarray
+    ):
+        """
+        Apply a batch of heartbeat samples to known slots.
+
+        Samples older than the stored heartbeat are ignored so replayed
+        buffers cannot roll a node back, though any sample marks the node
+        active. NaN metrics mean "unchanged".
+        """
+        self.status[slots] = 0
+        fresh = timestamps >= self.last_heartbeat[slots]
+        slots, cpu, memory, timestamps = slots[fresh], cpu[fresh], memory[fresh], timestamps[fresh]
+        self.last_heartbeat[slots] = timestamps
+        has_cpu = ~np.isnan(cpu)
+        self.cpu[slots[has_cpu]] = cpu[has_cpu]
+        has_memory = ~np.isnan(memory)
+        self.memory[slots[has_memory]] = memory[has_memory]
+
+    def set_status(self, slots: np.ndarray, status: str):
+        self.status[slots] = NODE_STATUSES.index(status)
+
+    def _row(self, slot: int, cpu: float, memory: float, heartbeat: float, status: int) -> dict:
+        return {
+            "node_id": self.node_ids[slot],
+            "hostname": self.hostnames[slot],
+            "ip_address": self.ip_addresses[slot],
+            "status": NODE_STATUSES[status],
+            "cpu_usage": round(cpu, 2),
+            "memory_usage": round(memory, 2),
+            "last_heartbeat": epoch_to_iso(heartbeat)
+        }
+
+    def get(self, node_id: str) -> Optional[dict]:
+        slot = self._index.get(node_id)
+        if slot is None:
+            return None
+        return self._row(
+            slot,
+            float(self.cpu[slot]),
+            float(self.memory[slot]),
+            float(self.last_heartbeat[slot]),
+            int(self.status[slot])
+        )
+
+    def columns(self) -> Dict[str, object]:
+        """Copies of the registered nodes' columns, in slot order"""
+        slots = np.flatnonzero(self.used[:self._size])
+        slot_list = slots.tolist()
+        return {
+            "node_id": [self.node_ids[s] for s in slot_list],
+            "hostname": [self.hostnames[s] for s in slot_list],
+            "ip_address": [self.ip_addresses[s] for s in slot_list],
+            "cpu_usage": self.cpu[slots],
+            "memory_usage": self.memory[slots],
+            "last_heartbeat": self.last_heartbeat[slots],
+            "status": self.status[slots]
+        }
+
+    def rows(self) -> List[dict]:
+        """All registered nodes as dicts, in slot order"""
+        slots = np.flatnonzero(self.used[:self._size])
+        return [
+            self._row(slot, cpu, memory, heartbeat, status)
+            for slot, cpu, memory, heartbeat, status in zip(
+                slots.tolist(),
+                self.cpu[slots].tolist(),
+                self.memory[slots].tolist(),
+                self.last_heartbeat[slots].tolist(),
+                self.status[slots].tolist()
+            )
+        ]
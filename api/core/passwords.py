@@ -0,0 +1,188 @@
+"""
+Password hashing off the event loop
+"""
+import asyncio
+import logging
+import math
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Cost factors bcrypt accepts
+BCRYPT_MIN_ROUNDS = 4
+BCRYPT_MAX_ROUNDS = 31
+DEFAULT_ROUNDS = 12
+# Cost used to time the host before extrapolating to the target
+PROBE_ROUNDS = 8
+
+
+@lru_cache(maxsize=8)
+def make_context(rounds: int) -> CryptContext:
+    """
+    bcrypt context hashing at `rounds`. Hashes made with fewer rounds, or
+    with another scheme, need updating, so they are rehashed on login.
+    """
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds
+    )
+
+
+# Module-level so they can be sent to worker processes
+
+def _hash(password: str, rounds: int) -> str:
+    return make_context(rounds).hash(password)
+
+
+def _verify(password: str, hashed: str, rounds: int) -> bool:
+    return make_context(rounds).verify(password, hashed)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return make_context(rounds).verify_and_update(password, hashed)
+
+
+def _warm(rounds: int) -> bool:
+    make_context(rounds)
+    return True
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords on a dedicated, size-capped pool.
+
+    bcrypt is deliberately slow (hundreds of milliseconds), so hashing
+    inline stalls every other request on the event loop. Work goes to
+    `workers` threads instead (bcrypt releases the GIL while hashing),
+    or to processes with executor="process" for a backend that does
+    not. At most max_pending operations may be running or waiting;
+    beyond that calls fail fast with HasherBusy rather than queueing
+    logins behind each other until clients time out. The cost factor
+    can be calibrated once at startup so a hash takes about target_ms
+    on this host.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_pending: int = 32,
+        executor: str = "thread",
+        rounds: int = DEFAULT_ROUNDS
+    ):
+        if executor not in ("process", "thread"):
+            raise ValueError(f"Password hash executor must be 'process' or 'thread', not {executor!r}")
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self.executor_kind = executor
+        self.rounds = rounds
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+
+    @property
+    def context(self) -> CryptContext:
+        """Context at the current cost, for synchronous callers"""
+        return make_context(self.rounds)
+
+    def _pool(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                # Spawned, not forked: workers must not inherit the loop, sockets or threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HasherBusy(f"{self.pending} password operations already pending")
+        self.pending += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._pool(), fn, *args)
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(_verify, password, hashed, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new hash); the new hash is set when the stored one is outdated and should be replaced"""
+        return await self._run(_verify_and_update, password, hashed, self.rounds)
+
+    def calibrate(self, target_ms: float, min_rounds: int = 10, max_rounds: int = 16) -> int:
+        """
+        Set the cost so one hash takes about target_ms here. Each extra
+        round doubles the work, so a single probe at a low cost is enough
+        to extrapolate; the result is kept within [min_rounds, max_rounds].
+        """
+        context = make_context(PROBE_ROUNDS)
+        context.hash("calibration")
+        start = time.perf_counter()
+        context.hash("calibration")
+        probe_ms = max((time.perf_counter() - start) * 1000, 1e-3)
+        rounds = PROBE_ROUNDS + math.floor(math.log2(target_ms / probe_ms))
+        low = max(min_rounds, BCRYPT_MIN_ROUNDS)
+        high = min(max_rounds, BCRYPT_MAX_ROUNDS)
+        self.rounds = min(max(rounds, low), max(low, high))
+        logger.info(
+            f"Password hashing calibrated to {self.rounds} rounds "
+            f"(~{probe_ms * 2 ** (self.rounds - PROBE_ROUNDS):.0f}ms, target {target_ms:.0f}ms)"
+        )
+        return self.rounds
+
+    async def start(self, target_ms: float = 0, min_rounds: int = 10, max_rounds: int = 16):
+        """Calibrate (when target_ms is set) and spin up the workers"""
+        if target_ms > 0:
+            await asyncio.to_thread(self.calibrate, target_ms, min_rounds, max_rounds)
+        pool = self._pool()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(pool, _warm, self.rounds) for _ in range(self.workers)))
+
+    async def stop(self):
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        await asyncio.to_thread(executor.shutdown, True)
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "executor": self.executor_kind,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+    rounds=settings.PASSWORD_HASH_ROUNDS or DEFAULT_ROUNDS
+)
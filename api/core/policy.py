@@ -0,0 +1,298 @@
+"""
+Compiled access policy with a decision cache
+"""
+import ipaddress
+import json
+import logging
+import os
+import socket
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from fastapi import Depends, HTTPException, Request, status
+
+from core.config import settings
+from core.security import require_token
+
+logger = logging.getLogger(__name__)
+
+ALLOW = "allow"
+DENY = "deny"
+# Claim value that matches any token carrying the claim
+ANY_VALUE = "*"
+
+
+def parse_address(text: Optional[str]) -> Optional[Tuple[int, int]]:
+    """(IP version, integer value) of an address, or None if it is not one"""
+    try:
+        if ":" in text:
+            return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, text), "big")
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+    except (OSError, TypeError):
+        return None
+
+
+def _freeze(value):
+    if isinstance(value, list):
+        return tuple(value)
+    if isinstance(value, dict):
+        return json.dumps(value, sort_keys=True)
+    return value
+
+
+class PolicyRule:
+    """
+    One allow or deny rule. Every condition that is set must match:
+    the source address is in one of `sources`, the endpoint is one of
+    `endpoints` or below it, and each claim has one of the listed values.
+    """
+
+    __slots__ = ("name", "effect", "networks", "paths", "prefixes", "claims")
+
+    def __init__(
+        self,
+        effect: str,
+        sources: Iterable[str] = (),
+        endpoints: Iterable[str] = (),
+        claims: Optional[Dict[str, Union[str, List[str]]]] = None,
+        name: Optional[str] = None
+    ):
+        if effect not in (ALLOW, DENY):
+            raise ValueError(f"Rule effect must be {ALLOW!r} or {DENY!r}, not {effect!r}")
+        self.name = name
+        self.effect = effect
+        # version -> ((network, mask), ...); None means any source
+        networks: Dict[int, List[Tuple[int, int]]] = {}
+        for source in sources:
+            network = ipaddress.ip_network(source, strict=False)
+            mask = int(network.netmask)
+            networks.setdefault(network.version, []).append((int(network.network_address), mask))
+        self.networks = {v: tuple(n) for v, n in networks.items()} if networks else None
+        # "/api/v1/nodes" covers the path itself and everything below it
+        endpoints = [e.rstrip("/") for e in endpoints]
+        self.paths = frozenset(e or "/" for e in endpoints) if endpoints else None
+        self.prefixes = tuple(e + "/" for e in endpoints) if endpoints else None
+        self.claims = None
+        if claims:
+            self.claims = tuple(
+                (claim, None if ANY_VALUE in values else frozenset(values))
+                for claim, values in (
+                    (c, [str(v) for v in (vs if isinstance(vs, list) else [vs])])
+                    for c, vs in claims.items()
+                )
+            )
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PolicyRule":
+        return cls(
+            data.get("effect", ALLOW),
+            sources=data.get("sources", ()),
+            endpoints=data.get("endpoints", ()),
+            claims=data.get("claims"),
+            name=data.get("name")
+        )
+
+    def applies(self, endpoint: str, claims: Dict) -> bool:
+        """Endpoint and claim conditions (the source is matched through the engine's index)"""
+        if self.prefixes is not None and endpoint not in self.paths and not endpoint.startswith(self.prefixes):
+            return False
+        if self.claims is not None:
+            for claim, allowed in self.claims:
+                value = claims.get(claim)
+                if value is None:
+                    return False
+                if allowed is None:
+                    continue
+                if isinstance(value, list):
+                    if allowed.isdisjoint(map(str, value)):
+                        return False
+                elif str(value) not in allowed:
+                    return False
+        return True
+
+
+class _RuleIndex:
+    """
+    Rules grouped by source network: one hash table per distinct netmask,
+    so finding the rules covering an address costs one lookup per mask
+    length in use rather than a scan of every rule.
+    """
+
+    def __init__(self, rules: List[PolicyRule]):
+        tables: Dict[int, Dict[int, Dict[int, List[PolicyRule]]]] = {}
+        self.any_source: List[PolicyRule] = []
+        for rule in rules:
+            if rule.networks is None:
+                self.any_source.append(rule)
+                continue
+            for version, networks in rule.networks.items():
+                for network, mask in networks:
+                    tables.setdefault(version, {}).setdefault(mask, {}).setdefault(network, []).append(rule)
+        # Longest masks first so host rules are tried before broad ones
+        self.by_source = {
+            version: sorted(by_mask.items(), reverse=True) for version, by_mask in tables.items()
+        }
+
+    def first(self, address: Optional[Tuple[int, int]], endpoint: str, claims: Dict) -> Optional[PolicyRule]:
+        if address is not None:
+            version, value = address
+            for mask, table in self.by_source.get(version, ()):
+                rules = table.get(value & mask)
+                if rules is not None:
+                    for rule in rules:
+                        if rule.applies(endpoint, claims):
+                            return rule
+        for rule in self.any_source:
+            if rule.applies(endpoint, claims):
+                return rule
+        return None
+
+
+class PolicyEngine:
+    """
+    Policy decision point with default deny.
+
+    Rules are compiled once into per-netmask hash tables, endpoint prefix
+    tuples and claim value sets. A request is denied if any deny rule
+    matches, allowed if an allow rule matches, and denied otherwise.
+    Decisions are cached per (principal, ip, endpoint) in a bounded LRU
+    for at most cache_ttl seconds; the principal is the token's sub plus
+    the values of every claim the policy looks at, so tokens with
+    different roles never share an entry. Loading new rules clears the
+    cache.
+    """
+
+    def __init__(
+        self,
+        rules: Iterable[Union[PolicyRule, Dict]] = (),
+        path: Optional[Union[str, Path]] = None,
+        cache_size: int = 10000,
+        cache_ttl: float = 60,
+        reload_interval: float = 5
+    ):
+        self.path = Path(path) if path is not None else None
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.reload_interval = reload_interval
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[tuple, Tuple[bool, float]]" = OrderedDict()
+        self._mtime: Optional[int] = None
+        self._next_check = 0.0
+        self.load(rules)
+        if self.path is not None:
+            self.reload()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def load(self, rules: Iterable[Union[PolicyRule, Dict]]):
+        """Replace the policy; raises ValueError and keeps the old one if a rule is invalid"""
+        compiled = []
+        for i, rule in enumerate(rules):
+            if isinstance(rule, PolicyRule):
+                compiled.append(rule)
+                continue
+            try:
+                compiled.append(PolicyRule.from_dict(rule))
+            except (ValueError, TypeError, AttributeError) as e:
+                raise ValueError(f"Invalid policy rule {rule.get('name', i) if isinstance(rule, dict) else i}: {e}")
+        self._deny = _RuleIndex([r for r in compiled if r.effect == DENY])
+        self._allow = _RuleIndex([r for r in compiled if r.effect == ALLOW])
+        self._size = len(compiled)
+        names = []
+        for rule in compiled:
+            for claim, _ in rule.claims or ():
+                if claim not in names:
+                    names.append(claim)
+        self.claim_names = tuple(names)
+        self.version += 1
+        self._cache.clear()
+
+    def reload(self) -> bool:
+        """Load rules from the policy file; on error the current policy stays in force"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            data = json.loads(self.path.read_text())
+            self.load(data["rules"] if isinstance(data, dict) else data)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Could not load access policy from {self.path}: {e}")
+            return False
+        self._mtime = mtime
+        logger.info(f"Loaded access policy v{self.version} from {self.path} ({len(self)} rules)")
+        return True
+
+    def maybe_reload(self, now: Optional[float] = None) -> bool:
+        """Reload if the policy file changed, checking at most every reload_interval seconds"""
+        if self.path is None or self.reload_interval <= 0:
+            return False
+        now = time.monotonic() if now is None else now
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.reload_interval
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        return mtime != self._mtime and self.reload()
+
+    def principal(self, claims: Dict) -> tuple:
+        sub = claims.get("sub")
+        if not self.claim_names:
+            return (sub,)
+        return (sub,) + tuple(_freeze(claims.get(name)) for name in self.claim_names)
+
+    def evaluate(self, claims: Dict, source_ip: Optional[str], endpoint: str) -> Tuple[bool, Optional[str]]:
+        """Uncached decision and the name of the rule that made it (None for the default)"""
+        address = parse_address(source_ip)
+        rule = self._deny.first(address, endpoint, claims)
+        if rule is not None:
+            return False, rule.name
+        rule = self._allow.first(address, endpoint, claims)
+        if rule is not None:
+            return True, rule.name
+        return False, None
+
+    def decide(self, claims: Dict, source_ip: Optional[str], endpoint: str, now: Optional[float] = None) -> bool:
+        """Whether the principal in claims may reach endpoint from source_ip"""
+        now = time.monotonic() if now is None else now
+        key = (self.principal(claims), source_ip, endpoint)
+        cached = self._cache.get(key)
+        if cached is not None and now < cached[1]:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached[0]
+        self.misses += 1
+        allowed, _ = self.evaluate(claims, source_ip, endpoint)
+        self._cache[key] = (allowed, now + self.cache_ttl)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return allowed
+
+
+policy_engine = PolicyEngine(
+    path=settings.POLICY_FILE if settings.POLICY_ENABLED else None,
+    cache_size=settings.POLICY_CACHE_SIZE,
+    cache_ttl=settings.POLICY_CACHE_TTL,
+    reload_interval=settings.POLICY_RELOAD_INTERVAL
+)
+
+
+async def require_access(request: Request, claims: dict = Depends(require_token)) -> dict:
+    """
+    FastAPI dependency that applies the access policy to the request.
+
+    Returns the token claims, raising HTTP 403 when the policy denies the
+    request. A no-op unless POLICY_ENABLED is on.
+    """
+    if not settings.POLICY_ENABLED:
+        return claims
+    policy_engine.maybe_reload()
+    client = request.client
+    if not policy_engine.decide(claims, client.host if client else None, request.scope["path"]):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied by policy")
+    return claims
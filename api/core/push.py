@@ -0,0 +1,427 @@
+"""
+Real-time push hub for WebSocket and SSE clients
+"""
+import asyncio
+import json
+import logging
+import math
+from collections import Counter, deque
+from functools import partial
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from core.config import settings
+from core.heartbeat_feed import HeartbeatListener
+from core.node_store import NODE_STATUSES, epoch_to_iso
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ("heartbeats", "nodes", "threats")
+# Topics whose state a snapshot can restore
+NODE_TOPICS = frozenset(("heartbeats", "nodes"))
+
+_dumps = partial(json.dumps, separators=(",", ":"))
+_encode_string = json.encoder.encode_basestring
+
+
+class HubFull(Exception):
+    """Raised when the hub already has max_clients connections"""
+
+
+def _metric(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class Subscription:
+    """
+    Topics a client wants, optionally narrowed to some nodes (heartbeats
+    and node events) and threat severities. Equal subscriptions share
+    one serialized frame per tick.
+    """
+
+    __slots__ = ("topics", "node_ids", "severities", "key")
+
+    def __init__(
+        self,
+        topics: Iterable[str] = TOPICS,
+        node_ids: Optional[Iterable[str]] = None,
+        severities: Optional[Iterable[str]] = None
+    ):
+        topics = frozenset(topics)
+        unknown = topics.difference(TOPICS)
+        if unknown or not topics:
+            raise ValueError(f"Topics must be among {', '.join(TOPICS)}")
+        self.topics = topics
+        self.node_ids = frozenset(node_ids) if node_ids else None
+        self.severities = frozenset(severities) if severities else None
+        self.key = (self.topics, self.node_ids, self.severities)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Subscription":
+        """Build from {"topics": [...], "node_ids": [...], "severities": [...]}"""
+        if not isinstance(data, dict):
+            raise ValueError("Subscription must be an object")
+        return cls(
+            topics=data.get("topics") or TOPICS,
+            node_ids=data.get("node_ids"),
+            severities=data.get("severities")
+        )
+
+
+class PushClient:
+    """
+    One connected WebSocket or SSE consumer and its bounded frame queue.
+
+    The hub only ever appends whole frames; a full queue means the client
+    has fallen more than queue_size ticks behind.
+    """
+
+    def __init__(self, subscription: Subscription, queue_size: int):
+        self.subscription = subscription
+        self.queue_size = queue_size
+        # (frame, last threat seq it carries)
+        self.queue: Deque[Tuple[str, Optional[int]]] = deque()
+        self.ready = asyncio.Event()
+        self.needs_snapshot = False
+        self.resync = False
+        self.overflows = 0
+        self.dropped = 0
+        self.threat_cursor = 0
+        self.closed = False
+
+    def offer(self, frame: str, threat_seq: Optional[int] = None) -> bool:
+        if len(self.queue) >= self.queue_size:
+            # Slow consumer: discard what it has not read and catch it up
+            # with a snapshot instead of letting frames pile up
+            self.dropped += len(self.queue)
+            self.queue.clear()
+            self.overflows += 1
+            self.needs_snapshot = True
+            self.resync = True
+            return False
+        self.queue.append((frame, threat_seq))
+        self.ready.set()
+        return True
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+    async def frames(self, keepalive: Optional[float] = None):
+        """Yield frames as they are queued, or None after keepalive idle seconds"""
+        while not self.closed:
+            if not self.queue:
+                self.ready.clear()
+                self.overflows = 0
+                try:
+                    await asyncio.wait_for(self.ready.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                continue
+            frame, threat_seq = self.queue.popleft()
+            if threat_seq is not None:
+                self.threat_cursor = threat_seq
+            yield frame
+
+
+class PushHub(HeartbeatListener):
+    """
+    Pub/sub fan-out of heartbeats, node lifecycle events and threat
+    reports to connected dashboards.
+
+    Publishing only records the latest change: heartbeats and node events
+    are coalesced per node until the next tick, so a publisher never
+    waits on a client. Every tick each change is serialized once, frames
+    are assembled once per distinct subscription and shared by every
+    client holding it, then appended to each client's bounded queue. A
+    client whose queue is full loses its backlog and is sent a snapshot
+    of current node state on the next tick (read once from storage for
+    all such clients); one that overflows max_overflows ticks in a row
+    without catching up is disconnected. With several workers each
+    process pushes the events it served.
+    """
+
+    def __init__(
+        self,
+        tick: float = 1.0,
+        queue_size: int = 8,
+        max_clients: int = 5000,
+        max_overflows: int = 3
+    ):
+        self.tick = tick
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self.max_overflows = max_overflows
+        self.ticks = 0
+        self.frames_sent = 0
+        self.disconnected_slow = 0
+        self._clients: Set[PushClient] = set()
+        self._topics: Counter = Counter()
+        # node_id -> (cpu, memory, timestamp) / latest node event, for this tick
+        self._heartbeats: Dict[str, Tuple[Optional[float], Optional[float], float]] = {}
+        self._node_events: Dict[str, dict] = {}
+        self._threats: List[Tuple[int, dict]] = []
+        self._storage = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    # Clients
+
+    def connect(self, subscription: Subscription, snapshot: bool = True) -> PushClient:
+        """Register a client; with snapshot it first gets the current node state"""
+        if len(self._clients) >= self.max_clients:
+            raise HubFull(f"Push hub is at its limit of {self.max_clients} clients")
+        client = PushClient(subscription, self.queue_size)
+        client.needs_snapshot = snapshot and bool(subscription.topics & NODE_TOPICS)
+        self._clients.add(client)
+        self._topics.update(subscription.topics)
+        return client
+
+    def resubscribe(self, client: PushClient, subscription: Subscription, snapshot: bool = True):
+        if client not in self._clients:
+            return
+        self._topics.subtract(client.subscription.topics)
+        self._topics.update(subscription.topics)
+        client.subscription = subscription
+        if snapshot and subscription.topics & NODE_TOPICS:
+            client.needs_snapshot = True
+
+    def disconnect(self, client: PushClient):
+        if client in self._clients:
+            self._clients.discard(client)
+            self._topics.subtract(client.subscription.topics)
+        client.close()
+
+    # Publishers
+
+    def ingest(self, node_ids, cpu, memory, timestamps):
+        if not self._topics["heartbeats"]:
+            return
+        pending = self._heartbeats
+        for node_id, c, m, t in zip(node_ids, cpu.tolist(), memory.tolist(), timestamps.tolist()):
+            # NaN means unchanged: keep a value seen earlier in the tick, else send null
+            c = None if c != c else c
+            m = None if m != m else m
+            previous = pending.get(node_id)
+            if previous is not None:
+                c = previous[0] if c is None else c
+                m = previous[1] if m is None else m
+            pending[node_id] = (c, m, t)
+
+    def forget(self, node_id: str):
+        self._heartbeats.pop(node_id, None)
+        self.node_event({"event": "removed", "node_id": node_id})
+
+    def node_event(self, event: dict):
+        """Queue a node lifecycle event; a later event for the same node replaces it"""
+        if not self._topics["nodes"]:
+            return
+        node_id = event["node_id"]
+        self._node_events.pop(node_id, None)
+        self._node_events[node_id] = event
+
+    def node_registered(self, node: dict):
+        self.node_event({"event": "registered", **node})
+
+    def status_changed(self, event: dict):
+        """Liveness tracker callback"""
+        self.node_event({"event": "status", **event})
+
+    def publish_threat(self, seq: int, alert: dict):
+        if self._topics["threats"]:
+            self._threats.append((seq, alert))
+
+    # Delivery
+
+    @staticmethod
+    def _update_frame(
+        tick: int,
+        subscription: Subscription,
+        heartbeats: Dict[str, str],
+        node_events: Dict[str, str],
+        threats: List[Tuple[int, str, str]],
+        include_nodes: bool = True
+    ) -> Tuple[Optional[str], Optional[int]]:
+        """Join pre-serialized entries into one frame; (None, None) if nothing applies"""
+        parts = []
+        topics = subscription.topics
+        node_ids = subscription.node_ids
+        if include_nodes and "heartbeats" in topics and heartbeats:
+            if node_ids is None:
+                entries = heartbeats.values()
+            elif len(node_ids) < len(heartbeats):
+                entries = [heartbeats[n] for n in node_ids if n in heartbeats]
+            else:
+                entries = [e for n, e in heartbeats.items() if n in node_ids]
+            if entries:
+                parts.append('"heartbeats":[' + ",".join(entries) + "]")
+        if include_nodes and "nodes" in topics and node_events:
+            entries = [e for n, e in node_events.items() if node_ids is None or n in node_ids]
+            if entries:
+                parts.append('"nodes":[' + ",".join(entries) + "]")
+        last_seq = None
+        if "threats" in topics and threats:
+            severities = subscription.severities
+            entries = [(s, e) for s, severity, e in threats if severities is None or severity in severities]
+            if entries:
+                parts.append('"threats":[' + ",".join(e for _, e in entries) + "]")
+                last_seq = entries[-1][0]
+        if not parts:
+            return None, None
+        return f'{{"type":"update","tick":{tick},' + ",".join(parts) + "}", last_seq
+
+    @staticmethod
+    def _heartbeat_entries(heartbeats: Dict[str, Tuple[Optional[float], Optional[float], float]]) -> Dict[str, str]:
+        """JSON object per heartbeat, formatted directly (a batch shares few distinct timestamps)"""
+        stamps: Dict[float, str] = {}
+        entries = {}
+        for node_id, (c, m, t) in heartbeats.items():
+            stamp = stamps.get(t)
+            if stamp is None:
+                stamp = stamps[t] = epoch_to_iso(t)
+            entries[node_id] = (
+                f'{{"node_id":{_encode_string(node_id)},"cpu_usage":{"null" if c is None else repr(c)},'
+                f'"memory_usage":{"null" if m is None else repr(m)},"timestamp":"{stamp}"}}'
+            )
+        return entries
+
+    @staticmethod
+    def _snapshot_body(subscription: Subscription, columns: Optional[Dict[str, object]]) -> str:
+        """Shared part of a snapshot frame: current state of the subscribed nodes"""
+        if columns is None or not subscription.topics & NODE_TOPICS:
+            return '"nodes":[]'
+        node_ids = subscription.node_ids
+        statuses = columns["status"].tolist()
+        entries = [
+            {
+                "node_id": node_id,
+                "hostname": hostname,
+                "ip_address": ip,
+                "status": NODE_STATUSES[status],
+                "cpu_usage": _metric(cpu),
+                "memory_usage": _metric(memory),
+                "last_heartbeat": epoch_to_iso(heartbeat)
+            }
+            for node_id, hostname, ip, cpu, memory, heartbeat, status in zip(
+                columns["node_id"],
+                columns["hostname"],
+                columns["ip_address"],
+                columns["cpu_usage"].tolist(),
+                columns["memory_usage"].tolist(),
+                columns["last_heartbeat"].tolist(),
+                statuses
+            )
+            if node_ids is None or node_id in node_ids
+        ]
+        return '"nodes":' + _dumps(entries)
+
+    async def flush(self, storage=None):
+        """Send one tick's coalesced changes (and any due snapshots) to every client"""
+        self.ticks += 1
+        tick = self.ticks
+        heartbeats, self._heartbeats = self._heartbeats, {}
+        node_events, self._node_events = self._node_events, {}
+        threats, self._threats = self._threats, []
+        clients = list(self._clients)
+        if not clients:
+            return
+
+        # Each change is serialized once, whatever the number of clients
+        heartbeat_json = self._heartbeat_entries(heartbeats)
+        node_json = {node_id: _dumps(event) for node_id, event in node_events.items()}
+        threat_json = [(seq, alert.get("severity"), _dumps(alert)) for seq, alert in threats]
+
+        columns = None
+        if storage is not None and any(c.needs_snapshot for c in clients):
+            try:
+                columns = await storage.node_columns()
+            except Exception as e:
+                logger.error(f"Push hub could not read node snapshot: {e}")
+
+        updates: Dict[tuple, Tuple[Optional[str], Optional[int]]] = {}
+        threat_only: Dict[tuple, Tuple[Optional[str], Optional[int]]] = {}
+        snapshots: Dict[tuple, str] = {}
+        for client in clients:
+            if client.closed:
+                continue
+            subscription = client.subscription
+            key = subscription.key
+            if client.needs_snapshot and (columns is not None or storage is None):
+                body = snapshots.get(key)
+                if body is None:
+                    body = snapshots[key] = self._snapshot_body(subscription, columns)
+                frame = (
+                    f'{{"type":"snapshot","tick":{tick},"resync":{"true" if client.resync else "false"},'
+                    f'"threat_cursor":{client.threat_cursor},{body}}}'
+                )
+                client.needs_snapshot = client.resync = False
+                self._deliver(client, frame, None)
+                # The snapshot already reflects this tick's node changes
+                cached = threat_only.get(key)
+                if cached is None:
+                    cached = threat_only[key] = self._update_frame(
+                        tick, subscription, heartbeat_json, node_json, threat_json, include_nodes=False
+                    )
+            else:
+                cached = updates.get(key)
+                if cached is None:
+                    cached = updates[key] = self._update_frame(
+                        tick, subscription, heartbeat_json, node_json, threat_json
+                    )
+            frame, threat_seq = cached
+            if frame is not None:
+                self._deliver(client, frame, threat_seq)
+
+    def _deliver(self, client: PushClient, frame: str, threat_seq: Optional[int]):
+        if client.offer(frame, threat_seq):
+            self.frames_sent += 1
+        elif client.overflows >= self.max_overflows:
+            logger.info(f"Disconnecting push client after {client.overflows} overflowing ticks")
+            self.disconnected_slow += 1
+            self.disconnect(client)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                await self.flush(self._storage)
+            except Exception as e:
+                logger.error(f"Push hub tick failed: {e}")
+
+    def start(self, storage):
+        """Start the background tick task"""
+        if self._task is not None:
+            return
+        self._storage = storage
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Push hub started (tick={self.tick}s, queue={self.queue_size} frames per client)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        for client in list(self._clients):
+            self.disconnect(client)
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._clients),
+            "ticks": self.ticks,
+            "frames_sent": self.frames_sent,
+            "disconnected_slow": self.disconnected_slow,
+            "subscriptions": {topic: self._topics[topic] for topic in TOPICS}
+        }
+
+
+push_hub = PushHub(
+    tick=settings.PUSH_TICK,
+    queue_size=settings.PUSH_QUEUE_SIZE,
+    max_clients=settings.PUSH_MAX_CLIENTS,
+    max_overflows=settings.PUSH_MAX_OVERFLOWS
+)
@@ -0,0 +1,177 @@
+"""
+Edge node load rebalancing
+"""
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.node_store import NODE_STATUSES, epoch_to_iso
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = NODE_STATUSES.index("active")
+
+
+def solve(
+    load: np.ndarray,
+    high_watermark: float,
+    low_watermark: float,
+    fill: float,
+    min_move: float = 0.0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Greedy transport plan from nodes above high_watermark to nodes below low_watermark.
+
+    Sources, hottest first, shed down to fill and receivers, idlest first,
+    take up to fill (low_watermark <= fill <= high_watermark). Walking the
+    two cumulative sums together (the northwest-corner rule) pairs them in
+    at most sources + receivers - 1 moves using a sort, a union of the
+    breakpoints and two binary searches. Returns (source, target, amount)
+    with indices into load.
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    sources = np.flatnonzero(load > high_watermark)
+    receivers = np.flatnonzero(load < low_watermark)
+    if not len(sources) or not len(receivers):
+        return empty, empty, np.zeros(0)
+    sources = sources[np.argsort(-load[sources], kind="stable")]
+    receivers = receivers[np.argsort(load[receivers], kind="stable")]
+    supply = np.cumsum(load[sources] - fill, dtype=np.float64)
+    demand = np.cumsum(fill - load[receivers], dtype=np.float64)
+    total = min(supply[-1], demand[-1])
+    edges = np.concatenate(([0.0], np.union1d(supply[supply < total], demand[demand < total]), [total]))
+    amount = np.diff(edges)
+    middle = edges[:-1] + amount / 2
+    keep = amount > max(min_move, 1e-9)
+    return (
+        sources[np.searchsorted(supply, middle[keep])],
+        receivers[np.searchsorted(demand, middle[keep])],
+        amount[keep]
+    )
+
+
+class LoadRebalancer:
+    """
+    Plans workload moves from overloaded to idle edge nodes.
+
+    A node's load is the larger of its CPU and memory usage. Active nodes
+    above high_watermark shed work to active nodes below low_watermark,
+    both meeting at the fleet's mean load clamped to the watermarks. Each
+    move names the share of the source's current work to hand over and the
+    CPU and memory points that share is expected to carry.
+
+    The plan is cached until a node registers, leaves or changes status,
+    or some node's load drifts by more than tolerance points from the
+    value the plan was computed with.
+    """
+
+    def __init__(
+        self,
+        high_watermark: float = 80.0,
+        low_watermark: float = 30.0,
+        tolerance: float = 5.0,
+        min_move: float = 1.0
+    ):
+        if not 0 <= low_watermark <= high_watermark:
+            raise ValueError("Need 0 <= low_watermark <= high_watermark")
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.tolerance = tolerance
+        self.min_move = min_move
+        self._plan: Optional[dict] = None
+        self._node_ids: List[str] = []
+        self._status = np.zeros(0, dtype=np.int8)
+        self._load = np.zeros(0, dtype=np.float32)
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _changed(self, node_ids: List[str], status: np.ndarray, load: np.ndarray) -> bool:
+        if self._plan is None or node_ids != self._node_ids or not np.array_equal(status, self._status):
+            return True
+        return bool(len(load)) and float(np.abs(load - self._load).max()) > self.tolerance
+
+    def compute(self, columns: Dict[str, object]) -> dict:
+        """Solve for a node_columns() snapshot"""
+        started = time.perf_counter()
+        node_ids = columns["node_id"]
+        cpu = np.asarray(columns["cpu_usage"], dtype=np.float64)
+        memory = np.asarray(columns["memory_usage"], dtype=np.float64)
+        load = np.maximum(cpu, memory)
+        # Only active nodes take part; the others look idle but are not reachable
+        active = np.flatnonzero(np.asarray(columns["status"]) == ACTIVE)
+        active_load = load[active]
+        mean = float(active_load.mean()) if len(active) else 0.0
+        fill = min(max(mean, self.low_watermark), self.high_watermark)
+        source, target, amount = solve(active_load, self.high_watermark, self.low_watermark, fill, self.min_move)
+        source, target = active[source], active[target]
+
+        projected = load.copy()
+        np.subtract.at(projected, source, amount)
+        np.add.at(projected, target, amount)
+        overloaded = active[active_load > self.high_watermark]
+        share = amount / load[source]
+        moves = [
+            {
+                "source": node_ids[s],
+                "target": node_ids[t],
+                "share": round(f, 3),
+                "cpu_usage": round(c, 2),
+                "memory_usage": round(m, 2)
+            }
+            for s, t, f, c, m in zip(
+                source.tolist(),
+                target.tolist(),
+                share.tolist(),
+                (share * cpu[source]).tolist(),
+                (share * memory[source]).tolist()
+            )
+        ]
+        self.version += 1
+        return {
+            "optimization_id": f"opt-{self.version}",
+            "timestamp": epoch_to_iso(time.time()),
+            "active_nodes": len(active),
+            "mean_load": round(mean, 2),
+            "target_load": round(fill, 2),
+            "overloaded_nodes": len(overloaded),
+            "idle_nodes": int(np.count_nonzero(active_load < self.low_watermark)),
+            "unresolved_nodes": int(np.count_nonzero(projected[overloaded] > self.high_watermark + 1e-6)),
+            "max_load_before": round(float(active_load.max()), 2) if len(active) else 0.0,
+            "max_load_after": round(float(projected[active].max()), 2) if len(active) else 0.0,
+            "load_moved": round(float(amount.sum()), 2),
+            "move_count": len(moves),
+            "moves": moves,
+            "solve_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    async def plan(self, storage) -> dict:
+        """The current plan, recomputed only if the fleet changed materially"""
+        columns = await storage.node_columns()
+        load = np.maximum(columns["cpu_usage"], columns["memory_usage"])
+        status = np.asarray(columns["status"], dtype=np.int8)
+        if not self._changed(columns["node_id"], status, load):
+            self.hits += 1
+            return self._plan
+        self.misses += 1
+        self._plan = self.compute(columns)
+        self._node_ids, self._status, self._load = columns["node_id"], status, load
+        logger.info(
+            f"Rebalance plan {self._plan['optimization_id']}: {self._plan['move_count']} moves "
+            f"for {self._plan['overloaded_nodes']} overloaded nodes in {self._plan['solve_ms']}ms"
+        )
+        return self._plan
+
+    def stats(self) -> Dict[str, int]:
+        return {"version": self.version, "hits": self.hits, "misses": self.misses}
+
+
+load_rebalancer = LoadRebalancer(
+    high_watermark=settings.REBALANCE_HIGH_WATERMARK,
+    low_watermark=settings.REBALANCE_LOW_WATERMARK,
+    tolerance=settings.REBALANCE_TOLERANCE,
+    min_move=settings.REBALANCE_MIN_MOVE
+)
@@ -0,0 +1,401 @@
+"""
+Redis storage backend for multi-worker and multi-replica deployments
+
+Key layout (all keys share the configured prefix):
+
+    {p}:seq:{name}                    INCR counters for id allocation
+    {p}:version:{collection}          INCR counters bumped after each change to "nodes" or "threats"
+    {p}:version:epoch                 random id, recreated if the data (and counters) are lost
+    {p}:nodes                         zset of node ids scored by registration time
+    {p}:node:{node_id}                hash of node fields; "heartbeat_ts" is the newest
+                                      sample time and "seen_ts" the last arrival (epoch)
+    {p}:threats                       zset of alert sequence numbers (score = seq)
+    {p}:threats:time                  zset of alert sequence numbers by creation time
+    {p}:threats:idx:{field}:{value}   zset per indexed field value (score = seq)
+    {p}:threats:counts                hash of running counters ("active", "active:{severity}")
+    {p}:threat:{seq}                  hash of alert fields
+"""
+import logging
+import math
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+import redis.asyncio as redis
+
+from core.config import settings
+from core.node_store import NODE_STATUSES, epoch_to_iso
+from core.storage import StorageBackend
+from core.threat_store import INDEXED_FIELDS, to_epoch
+
+logger = logging.getLogger(__name__)
+
+NODE_FLOAT_FIELDS = ("cpu_usage", "memory_usage")
+
+# Apply a heartbeat only to an existing node hash (so a heartbeat racing a
+# deregistration cannot resurrect a half-populated node). Any heartbeat
+# marks the node seen and active; its sample is applied only if it is not
+# older than the stored one. Empty metric arguments mean unchanged.
+_HEARTBEAT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'seen_ts', ARGV[4], 'status', 'active')
+local last = tonumber(redis.call('HGET', KEYS[1], 'heartbeat_ts') or '0')
+if tonumber(ARGV[1]) < last then
+    return 1
+end
+redis.call('HSET', KEYS[1], 'heartbeat_ts', ARGV[1])
+if ARGV[2] ~= '' then
+    redis.call('HSET', KEYS[1], 'cpu_usage', ARGV[2])
+end
+if ARGV[3] ~= '' then
+    redis.call('HSET', KEYS[1], 'memory_usage', ARGV[3])
+end
+return 1
+"""
+
+# Register a node unless ARGV[1] (> 0) nodes already exist
+_ADD_NODE = """
+local limit = tonumber(ARGV[1])
+if limit > 0 and not redis.call('ZSCORE', KEYS[1], ARGV[2]) and redis.call('ZCARD', KEYS[1]) >= limit then
+    return 0
+end
+redis.call('HSET', KEYS[2], unpack(ARGV, 4))
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2])
+redis.call('INCR', KEYS[3])
+return 1
+"""
+
+# Set a liveness status unless some worker saw the node after ARGV[2];
+# -1 if the node is gone
+_SET_STATUS = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+if ARGV[2] ~= '' and tonumber(redis.call('HGET', KEYS[1], 'seen_ts') or '0') > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'status', ARGV[1])
+return 1
+"""
+
+# Move an alert to status ARGV[1], keeping the status index and active
+# counters in step. 0 once eviction has popped the alert from KEYS[2].
+# ARGV[3] is the status index key prefix (the old status is only known here).
+_SET_THREAT_STATUS = """
+if not redis.call('ZSCORE', KEYS[2], ARGV[2]) then
+    return 0
+end
+local old = redis.call('HGET', KEYS[1], 'status') or ''
+if old == ARGV[1] then
+    return 1
+end
+local severity = redis.call('HGET', KEYS[1], 'severity') or ''
+redis.call('ZREM', ARGV[3] .. old, ARGV[2])
+redis.call('ZADD', ARGV[3] .. ARGV[1], ARGV[2], ARGV[2])
+if old == 'active' then
+    redis.call('HINCRBY', KEYS[3], 'active', -1)
+    redis.call('HINCRBY', KEYS[3], 'active:' .. severity, -1)
+end
+if ARGV[1] == 'active' then
+    redis.call('HINCRBY', KEYS[3], 'active', 1)
+    redis.call('HINCRBY', KEYS[3], 'active:' .. severity, 1)
+end
+redis.call('HSET', KEYS[1], 'status', ARGV[1])
+redis.call('INCR', KEYS[4])
+return 1
+"""
+
+# Pop exactly the overflow beyond the cap, atomically across workers
+_POP_OVERFLOW = """
+local overflow = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[1])
+if overflow > 0 then
+    return redis.call('ZPOPMIN', KEYS[1], overflow)
+end
+return {}
+"""
+
+
+class RedisBackend(StorageBackend):
+    """Storage backend on a pooled asyncio Redis client"""
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        max_connections: int = 50,
+        prefix: str = "hh",
+        client: Optional[redis.Redis] = None
+    ):
+        if client is None:
+            pool = redis.ConnectionPool(
+                host=host,
+                port=port,
+                db=db,
+                max_connections=max_connections,
+                decode_responses=True
+            )
+            client = redis.Redis(connection_pool=pool)
+        self.client = client
+        self.prefix = prefix
+        self.max_alerts = settings.THREAT_STORE_MAX_ALERTS
+        self.max_age_seconds = settings.THREAT_STORE_MAX_AGE_SECONDS
+        self._heartbeat = client.register_script(_HEARTBEAT)
+        self._add_node = client.register_script(_ADD_NODE)
+        self._set_status = client.register_script(_SET_STATUS)
+        self._set_threat_status = client.register_script(_SET_THREAT_STATUS)
+        self._pop_overflow = client.register_script(_POP_OVERFLOW)
+
+    def _key(self, *parts) -> str:
+        return ":".join((self.prefix,) + tuple(str(p) for p in parts))
+
+    async def connect(self):
+        await self.client.ping()
+        logger.info("Connected to Redis storage backend")
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def next_id(self, name: str) -> int:
+        return await self.client.incr(self._key("seq", name))
+
+    async def version(self, collection: str) -> str:
+        epoch_key = self._key("version", "epoch")
+        epoch, counter = await self.client.mget(epoch_key, self._key("version", collection))
+        if epoch is None:
+            # First use or a flushed database: the first worker to get here picks the epoch
+            await self.client.set(epoch_key, uuid.uuid4().hex[:12], nx=True)
+            epoch = await self.client.get(epoch_key)
+        return f"{epoch}.{int(counter or 0)}"
+
+    # Nodes
+
+    @staticmethod
+    def _encode(fields: dict) -> dict:
+        return {k: v for k, v in fields.items() if v is not None}
+
+    @staticmethod
+    def _decode_node(raw: dict) -> Optional[dict]:
+        if not raw:
+            return None
+        raw.pop("seen_ts", None)
+        heartbeat = raw.pop("heartbeat_ts", None)
+        if heartbeat is not None:
+            raw["last_heartbeat"] = epoch_to_iso(float(heartbeat))
+        for field in NODE_FLOAT_FIELDS:
+            if field in raw:
+                raw[field] = float(raw[field])
+        return raw
+
+    async def add_node(self, node: dict, limit: Optional[int] = None) -> bool:
+        fields = self._encode(node)
+        # Times are stored as epoch numbers and rendered on read
+        fields["heartbeat_ts"] = to_epoch(datetime.fromisoformat(fields.pop("last_heartbeat")))
+        fields["seen_ts"] = time.time()
+        added = await self._add_node(
+            keys=[self._key("nodes"), self._key("node", node["node_id"]), self._key("version", "nodes")],
+            args=[limit or 0, node["node_id"], time.time()] + [x for item in fields.items() for x in item]
+        )
+        return bool(added)
+
+    async def get_node(self, node_id: str) -> Optional[dict]:
+        return self._decode_node(await self.client.hgetall(self._key("node", node_id)))
+
+    async def list_nodes(self) -> List[dict]:
+        node_ids = await self.client.zrange(self._key("nodes"), 0, -1)
+        if not node_ids:
+            return []
+        async with self.client.pipeline(transaction=False) as pipe:
+            for node_id in node_ids:
+                pipe.hgetall(self._key("node", node_id))
+            rows = await pipe.execute()
+        return [node for node in map(self._decode_node, rows) if node is not None]
+
+    async def record_heartbeats(self, node_ids, cpu, memory, timestamps):
+        now = time.time()
+        async with self.client.pipeline(transaction=False) as pipe:
+            for node_id, c, m, ts in zip(node_ids, cpu.tolist(), memory.tolist(), timestamps.tolist()):
+                await self._heartbeat(
+                    keys=[self._key("node", node_id)],
+                    args=[
+                        ts,
+                        "" if math.isnan(c) else c,
+                        "" if math.isnan(m) else m,
+                        now
+                    ],
+                    client=pipe
+                )
+            # Queued after the samples so the new version never precedes them
+            pipe.incr(self._key("version", "nodes"))
+            applied = await pipe.execute()
+        return [node_id for node_id, ok in zip(node_ids, applied) if not ok]
+
+    async def delete_node(self, node_id: str) -> bool:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(self._key("node", node_id))
+            pipe.zrem(self._key("nodes"), node_id)
+            pipe.incr(self._key("version", "nodes"))
+            deleted, _, _ = await pipe.execute()
+        return bool(deleted)
+
+    async def set_node_status(self, node_ids, status, seen_before=None):
+        async with self.client.pipeline(transaction=False) as pipe:
+            for node_id in node_ids:
+                await self._set_status(
+                    keys=[self._key("node", node_id)],
+                    args=[status, "" if seen_before is None else seen_before],
+                    client=pipe
+                )
+            pipe.incr(self._key("version", "nodes"))
+            results = await pipe.execute()
+        updated = [n for n, r in zip(node_ids, results) if r == 1]
+        missing = [n for n, r in zip(node_ids, results) if r == -1]
+        return updated, missing
+
+    async def count_nodes(self) -> int:
+        return await self.client.zcard(self._key("nodes"))
+
+    async def node_columns(self):
+        node_ids = await self.client.zrange(self._key("nodes"), 0, -1)
+        async with self.client.pipeline(transaction=False) as pipe:
+            for node_id in node_ids:
+                pipe.hmget(
+                    self._key("node", node_id),
+                    "hostname", "ip_address", "cpu_usage", "memory_usage", "heartbeat_ts", "status"
+                )
+            rows = await pipe.execute() if node_ids else []
+        # Skip nodes deregistered between the ZRANGE and the HMGETs
+        present = [(n, r) for n, r in zip(node_ids, rows) if r[0] is not None]
+        return {
+            "node_id": [n for n, _ in present],
+            "hostname": [r[0] for _, r in present],
+            "ip_address": [r[1] for _, r in present],
+            "cpu_usage": np.array([float(r[2] or 0) for _, r in present], dtype=np.float32),
+            "memory_usage": np.array([float(r[3] or 0) for _, r in present], dtype=np.float32),
+            "last_heartbeat": np.array([float(r[4] or 0) for _, r in present], dtype=np.float64),
+            "status": np.array(
+                [NODE_STATUSES.index(r[5]) if r[5] in NODE_STATUSES else 0 for _, r in present],
+                dtype=np.int8
+            )
+        }
+
+    # Threats
+
+    async def add_threat(self, seq: int, alert: dict, created_at: float):
+        counts = self._key("threats", "counts")
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(self._key("threat", seq), mapping=self._encode(alert))
+            pipe.zadd(self._key("threats"), {seq: seq})
+            pipe.zadd(self._key("threats", "time"), {seq: created_at})
+            for field in INDEXED_FIELDS:
+                pipe.zadd(self._key("threats", "idx", field, alert.get(field)), {seq: seq})
+            if alert.get("status") == "active":
+                pipe.hincrby(counts, "active", 1)
+                pipe.hincrby(counts, f"active:{alert.get('severity')}", 1)
+            pipe.incr(self._key("version", "threats"))
+            await pipe.execute()
+        await self._evict(created_at)
+
+    async def update_threat_status(self, seq: int, status: str) -> bool:
+        updated = await self._set_threat_status(
+            keys=[
+                self._key("threat", seq),
+                self._key("threats"),
+                self._key("threats", "counts"),
+                self._key("version", "threats")
+            ],
+            args=[status, seq, self._key("threats", "idx", "status", "")]
+        )
+        return bool(updated)
+
+    async def _evict(self, now: float):
+        popped = await self._pop_overflow(keys=[self._key("threats")], args=[self.max_alerts])
+        # ZPOPMIN replies alternate member and score
+        evicted = [int(m) for m in popped[::2]]
+
+        if self.max_age_seconds:
+            expired = await self.client.zrangebyscore(
+                self._key("threats", "time"), "-inf", now - self.max_age_seconds
+            )
+            if expired:
+                # Only the worker whose ZREM succeeds owns the cleanup
+                async with self.client.pipeline(transaction=False) as pipe:
+                    for seq in expired:
+                        pipe.zrem(self._key("threats"), seq)
+                    removed = await pipe.execute()
+                evicted.extend(int(s) for s, ok in zip(expired, removed) if ok)
+
+        if not evicted:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for seq in evicted:
+                pipe.hgetall(self._key("threat", seq))
+            alerts = await pipe.execute()
+
+        counts = self._key("threats", "counts")
+        async with self.client.pipeline(transaction=True) as pipe:
+            for seq, alert in zip(evicted, alerts):
+                pipe.delete(self._key("threat", seq))
+                pipe.zrem(self._key("threats", "time"), seq)
+                for field in INDEXED_FIELDS:
+                    pipe.zrem(self._key("threats", "idx", field, alert.get(field)), seq)
+                if alert.get("status") == "active":
+                    pipe.hincrby(counts, "active", -1)
+                    pipe.hincrby(counts, f"active:{alert.get('severity')}", -1)
+            pipe.incr(self._key("version", "threats"))
+            await pipe.execute()
+
+    async def query_threats(self, cursor=0, limit=100, since=None, **filters):
+        filters = {k: v for k, v in filters.items() if v is not None}
+        if since is not None:
+            first = await self.client.zrangebyscore(
+                self._key("threats", "time"), since, "+inf", start=0, num=1
+            )
+            if not first:
+                return [], None
+            cursor = max(cursor, int(first[0]) - 1)
+
+        index_key = self._key("threats")
+        if filters:
+            keys = [self._key("threats", "idx", f, v) for f, v in filters.items()]
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.zcard(key)
+                sizes = await pipe.execute()
+            if min(sizes) == 0:
+                return [], None
+            index_key = keys[sizes.index(min(sizes))]
+
+        results = []
+        last_seq = None
+        batch = max(limit + 1, 64)
+        while True:
+            seqs = await self.client.zrangebyscore(
+                index_key, f"({cursor}", "+inf", start=0, num=batch
+            )
+            if not seqs:
+                return results, None
+            async with self.client.pipeline(transaction=False) as pipe:
+                for seq in seqs:
+                    pipe.hgetall(self._key("threat", seq))
+                alerts = await pipe.execute()
+            for seq, alert in zip(seqs, alerts):
+                if not alert or any(alert.get(f) != v for f, v in filters.items()):
+                    continue
+                if len(results) == limit:
+                    return results, last_seq
+                results.append(alert)
+                last_seq = int(seq)
+            cursor = int(seqs[-1])
+
+    async def active_threat_count(self, severity: Optional[str] = None) -> int:
+        field = "active" if severity is None else f"active:{severity}"
+        value = await self.client.hget(self._key("threats", "counts"), field)
+        return int(value or 0)
+
+    async def count_threats(self) -> int:
+        return await self.client.zcard(self._key("threats"))
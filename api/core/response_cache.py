@@ -0,0 +1,101 @@
+"""
+Versioned response caching and conditional GET
+"""
+import zlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from core.config import settings
+
+# Builds the body (and any extra headers) for a cache miss
+Builder = Callable[[], Awaitable[Tuple[bytes, Optional[Dict[str, str]]]]]
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag
+        for tag in if_none_match.split(",")
+    )
+
+
+class ResponseCache:
+    """
+    Serialized GET responses keyed by (collection, version, query).
+
+    Storage bumps a collection's version on every change to it, and the
+    version carries the store's epoch, so a response stays valid for as
+    long as the version it was built at is current, across restarts too.
+    The ETag is derived from the version and query alone: a matching
+    If-None-Match gets a 304 without touching the collection or the
+    cache, and an unchanged poll without one gets the stored bytes back
+    without re-validating or re-serializing anything.
+
+    Only the latest version of each (collection, query) is kept, and at
+    most max_entries queries, least recently used first out.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def etag(collection: str, version: str, query: str) -> str:
+        return f'"{collection}-{version}-{zlib.crc32(query.encode()):08x}"'
+
+    async def respond(
+        self,
+        request: Request,
+        collection: str,
+        version: str,
+        query: str,
+        build: Builder
+    ) -> Response:
+        """
+        Answer a GET for collection at version.
+
+        Read the version before the data that build() serializes: a change
+        landing in between then yields a body newer than its ETag, which
+        the next version replaces, never an ETag newer than its body.
+        """
+        etag = self.etag(collection, version, query)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _matches(if_none_match, etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        key = (collection, query)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            _, body, extra = entry
+        else:
+            self.misses += 1
+            body, extra = await build()
+            self._entries[key] = (version, body, extra)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if extra:
+            headers.update(extra)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified
+        }
+
+
+response_cache = ResponseCache(max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES)
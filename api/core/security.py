@@ -1,15 +1,153 @@
 """
 Zero-trust security implementation
 """
+import hashlib
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Set, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import HTTPException, status
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from core.config import settings
+from core.passwords import HasherBusy, password_hasher
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+DEFAULT_KID = "default"
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+class KeySet:
+    """
+    Signing keys by key id (kid).
+
+    New tokens are signed with the active key and carry its kid in the
+    header; tokens without a kid are checked against the default key.
+    Rotating means adding the new key, making it active, and removing the
+    old one once its tokens have expired.
+    """
+
+    def __init__(self, keys: Dict[str, str], active_kid: str = DEFAULT_KID):
+        self.keys = dict(keys)
+        self.active_kid = active_kid
+        if active_kid not in self.keys:
+            raise ValueError(f"Active key id {active_kid!r} is not in the key set")
+
+    @property
+    def active_key(self) -> str:
+        return self.keys[self.active_kid]
+
+    def get(self, kid: Optional[str]) -> Optional[str]:
+        return self.keys.get(kid or DEFAULT_KID)
+
+
+class TokenVerifier:
+    """
+    JWT verification with a bounded LRU cache of verified payloads.
+
+    Entries are keyed on the SHA-256 digest of the token, so raw tokens are
+    not retained, and live until the earlier of the token's exp and
+    max_ttl. Each entry remembers which kid verified it, so removing a key
+    only evicts tokens signed with that key.
+    """
+
+    def __init__(
+        self,
+        keyset: KeySet,
+        algorithm: str = "HS256",
+        max_entries: int = 10000,
+        max_ttl: float = 300
+    ):
+        self.keyset = keyset
+        self.algorithm = algorithm
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._cache: "OrderedDict[bytes, Tuple[dict, float, str]]" = OrderedDict()
+        self._by_kid: Dict[str, Set[bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def add_key(self, kid: str, key: str, activate: bool = False):
+        """Add a key; cached verifications for other keys stay valid"""
+        self.keyset.keys[kid] = key
+        if activate:
+            self.keyset.active_kid = kid
+
+    def remove_key(self, kid: str):
+        """Retire a key and forget every token it verified"""
+        if kid == self.keyset.active_kid:
+            raise ValueError("Cannot remove the active signing key")
+        self.keyset.keys.pop(kid, None)
+        for digest in self._by_kid.pop(kid, ()):
+            self._cache.pop(digest, None)
+
+    def clear(self):
+        self._cache.clear()
+        self._by_kid.clear()
+
+    def _forget(self, digest: bytes):
+        _, _, kid = self._cache.pop(digest)
+        self._by_kid.get(kid, set()).discard(digest)
+
+    def verify(self, token: str) -> dict:
+        """Return the token's claims, raising HTTP 401 if it is invalid"""
+        digest = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        cached = self._cache.get(digest)
+        if cached is not None:
+            payload, expires_at, _ = cached
+            if now < expires_at:
+                self._cache.move_to_end(digest)
+                self.hits += 1
+                return dict(payload)
+            self._forget(digest)
+        self.misses += 1
+
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+            key = self.keyset.get(kid)
+            if key is None:
+                raise _credentials_exception()
+            payload = jwt.decode(token, key, algorithms=[self.algorithm])
+        except JWTError:
+            raise _credentials_exception()
+
+        if "nbf" in payload and payload["nbf"] > now:
+            # Not yet valid tokens are rejected by decode; never cache them
+            return payload
+        expires_at = now + self.max_ttl
+        if "exp" in payload:
+            expires_at = min(expires_at, float(payload["exp"]))
+        kid = kid or DEFAULT_KID
+        self._cache[digest] = (payload, expires_at, kid)
+        self._by_kid.setdefault(kid, set()).add(digest)
+        if len(self._cache) > self.max_entries:
+            self._forget(next(iter(self._cache)))
+        return dict(payload)
+
+
+def _build_keyset() -> KeySet:
+    keys = dict(settings.JWT_KEYS)
+    keys.setdefault(DEFAULT_KID, settings.SECRET_KEY)
+    return KeySet(keys, settings.JWT_ACTIVE_KID or DEFAULT_KID)
+
+
+token_verifier = TokenVerifier(
+    _build_keyset(),
+    algorithm=settings.ALGORITHM,
+    max_entries=settings.TOKEN_CACHE_SIZE,
+    max_ttl=settings.TOKEN_CACHE_TTL
+)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -19,30 +157,76 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    
+
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    keyset = token_verifier.keyset
+    encoded_jwt = jwt.encode(
+        to_encode,
+        keyset.active_key,
+        algorithm=settings.ALGORITHM,
+        headers={"kid": keyset.active_kid}
+    )
     return encoded_jwt
 
 
 def verify_token(token: str) -> dict:
     """Verify JWT token"""
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    return token_verifier.verify(token)
+
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def require_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> dict:
+    """
+    FastAPI dependency that authenticates the request's bearer token.
+
+    Returns the token claims, or an empty dict when AUTH_ENABLED is off.
+    """
+    if not settings.AUTH_ENABLED:
+        return {}
+    if credentials is None:
+        raise _credentials_exception()
+    return verify_token(credentials.credentials)
 
 
 def hash_password(password: str) -> str:
-    """Hash a password"""
-    return pwd_context.hash(password)
+    """Hash a password (blocks; use hash_password_async from request handlers)"""
+    return password_hasher.context.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify a password against hash (blocks; use verify_password_async from request handlers)"""
+    return password_hasher.context.verify(plain_password, hashed_password)
+
+
+def _busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent password operations",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the hashing pool; HTTP 503 when its queue is full"""
+    try:
+        return await password_hasher.hash(password)
+    except HasherBusy:
+        raise _busy_exception()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password on the hashing pool; HTTP 503 when its queue is full.
+
+    Returns (valid, new_hash). new_hash is set when the stored hash uses
+    an outdated scheme or a lower cost than the current one; the caller
+    should store it in place of the old hash.
+    """
+    try:
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except HasherBusy:
+        raise _busy_exception()
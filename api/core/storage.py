@@ -0,0 +1,245 @@
+"""
+Pluggable storage backends for shared API state
+"""
+import itertools
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.node_store import NodeMetricStore
+from core.threat_store import ThreatStore, to_epoch
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend:
+    """Interface for node and threat state shared by the routers"""
+
+    async def connect(self):
+        """Open connections (called from the application lifespan)"""
+
+    async def close(self):
+        """Release connections (called from the application lifespan)"""
+
+    async def next_id(self, name: str) -> int:
+        """Allocate the next unique id in the named sequence"""
+        raise NotImplementedError
+
+    async def version(self, collection: str) -> str:
+        """
+        Version of a collection ("nodes" or "threats") as "{epoch}.{counter}".
+        The counter increases after every change to the collection and the
+        epoch is random per store, so a restart or data loss that resets the
+        counter still yields new versions. Responses built from a
+        collection can be cached under its version.
+        """
+        raise NotImplementedError
+
+    async def epoch(self) -> str:
+        """Identifies this store's data; changes when it is recreated or lost"""
+        return (await self.version("nodes")).split(".", 1)[0]
+
+    # Nodes
+
+    async def add_node(self, node: dict, limit: Optional[int] = None) -> bool:
+        """Store a new node; False (and nothing stored) if limit nodes exist"""
+        raise NotImplementedError
+
+    async def get_node(self, node_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def list_nodes(self) -> List[dict]:
+        raise NotImplementedError
+
+    async def record_heartbeats(
+        self,
+        node_ids: Sequence[str],
+        cpu: np.ndarray,
+        memory: np.ndarray,
+        timestamps: np.ndarray
+    ) -> List[str]:
+        """
+        Apply a batch of heartbeat samples (epoch timestamps, NaN metrics
+        meaning unchanged) and return the ids of unknown nodes.
+        """
+        raise NotImplementedError
+
+    async def delete_node(self, node_id: str) -> bool:
+        raise NotImplementedError
+
+    async def set_node_status(
+        self,
+        node_ids: Sequence[str],
+        status: str,
+        seen_before: Optional[float] = None
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Set the status of nodes that no worker has heard from since
+        seen_before (epoch). Returns the ids updated and the ids of nodes
+        that no longer exist.
+        """
+        raise NotImplementedError
+
+    async def count_nodes(self) -> int:
+        raise NotImplementedError
+
+    async def node_columns(self) -> Dict[str, object]:
+        """
+        All nodes as parallel columns: node_id, hostname and ip_address
+        lists; cpu_usage, memory_usage and last_heartbeat (epoch) arrays;
+        and status as an int8 array of NODE_STATUSES indexes.
+        """
+        raise NotImplementedError
+
+    # Threats
+
+    async def add_threat(self, seq: int, alert: dict, created_at: float):
+        raise NotImplementedError
+
+    async def update_threat_status(self, seq: int, status: str) -> bool:
+        """Change an alert's status; False if there is no such (or no longer an) alert"""
+        raise NotImplementedError
+
+    async def query_threats(
+        self,
+        cursor: int = 0,
+        limit: int = 100,
+        since: Optional[float] = None,
+        **filters: Optional[str]
+    ) -> Tuple[List[dict], Optional[int]]:
+        """Return a page of alerts and the cursor for the next page"""
+        raise NotImplementedError
+
+    async def active_threat_count(self, severity: Optional[str] = None) -> int:
+        raise NotImplementedError
+
+    async def count_threats(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryBackend(StorageBackend):
+    """Process-local backend, suitable for a single worker and for tests"""
+
+    def __init__(self):
+        self._sequences: Dict[str, itertools.count] = defaultdict(lambda: itertools.count(1))
+        self.nodes = NodeMetricStore(capacity=settings.MAX_EDGE_NODES or 1024)
+        self.threats = ThreatStore(
+            max_alerts=settings.THREAT_STORE_MAX_ALERTS,
+            max_age_seconds=settings.THREAT_STORE_MAX_AGE_SECONDS
+        )
+        self._epoch = uuid.uuid4().hex[:12]
+        self._versions: Dict[str, int] = defaultdict(int)
+
+    async def next_id(self, name: str) -> int:
+        return next(self._sequences[name])
+
+    async def epoch(self) -> str:
+        return self._epoch
+
+    async def version(self, collection: str) -> str:
+        return f"{self._epoch}.{self._versions[collection]}"
+
+    def _bump(self, collection: str):
+        self._versions[collection] += 1
+
+    async def add_node(self, node: dict, limit: Optional[int] = None) -> bool:
+        if limit and node["node_id"] not in self.nodes and len(self.nodes) >= limit:
+            return False
+        self.nodes.add(
+            node["node_id"],
+            node["hostname"],
+            node["ip_address"],
+            to_epoch(datetime.fromisoformat(node["last_heartbeat"]))
+        )
+        self._bump("nodes")
+        return True
+
+    async def get_node(self, node_id: str) -> Optional[dict]:
+        return self.nodes.get(node_id)
+
+    async def list_nodes(self) -> List[dict]:
+        return self.nodes.rows()
+
+    async def record_heartbeats(self, node_ids, cpu, memory, timestamps):
+        slots = self.nodes.slots(node_ids)
+        known = slots >= 0
+        if known.all():
+            self.nodes.ingest(slots, cpu, memory, timestamps)
+            self._bump("nodes")
+            return []
+        if known.any():
+            self.nodes.ingest(slots[known], cpu[known], memory[known], timestamps[known])
+            self._bump("nodes")
+        return [node_ids[i] for i in np.flatnonzero(~known).tolist()]
+
+    async def delete_node(self, node_id: str) -> bool:
+        if not self.nodes.remove(node_id):
+            return False
+        self._bump("nodes")
+        return True
+
+    async def set_node_status(self, node_ids, status, seen_before=None):
+        # The liveness tracker in this process sees every heartbeat, so
+        # seen_before needs no check here
+        slots = self.nodes.slots(node_ids)
+        known = slots >= 0
+        self.nodes.set_status(slots[known], status)
+        if known.any():
+            self._bump("nodes")
+        updated = [n for n, k in zip(node_ids, known.tolist()) if k]
+        missing = [n for n, k in zip(node_ids, known.tolist()) if not k]
+        return updated, missing
+
+    async def count_nodes(self) -> int:
+        return len(self.nodes)
+
+    async def node_columns(self) -> Dict[str, object]:
+        return self.nodes.columns()
+
+    async def add_threat(self, seq: int, alert: dict, created_at: float):
+        self.threats.add(seq, dict(alert), created_at=created_at)
+        self._bump("threats")
+
+    async def update_threat_status(self, seq: int, status: str) -> bool:
+        if not self.threats.update_status(seq, status):
+            return False
+        self._bump("threats")
+        return True
+
+    async def query_threats(self, cursor=0, limit=100, since=None, **filters):
+        return self.threats.query(cursor=cursor, limit=limit, since=since, **filters)
+
+    async def active_threat_count(self, severity: Optional[str] = None) -> int:
+        return self.threats.active_count(severity)
+
+    async def count_threats(self) -> int:
+        return len(self.threats)
+
+
+def create_backend(name: str) -> StorageBackend:
+    """Build the storage backend selected by STORAGE_BACKEND"""
+    if name == "memory":
+        return MemoryBackend()
+    if name == "redis":
+        from core.redis_storage import RedisBackend
+        return RedisBackend(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            prefix=settings.REDIS_KEY_PREFIX
+        )
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+storage = create_backend(settings.STORAGE_BACKEND)
+
+
+def get_storage() -> StorageBackend:
+    """FastAPI dependency returning the configured storage backend"""
+    return storage
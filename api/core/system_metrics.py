@@ -0,0 +1,82 @@
+"""
+Background system metrics sampler
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import psutil
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SystemMetricsSampler:
+    """Samples host CPU, memory and disk usage off the request path"""
+
+    def __init__(self, interval: float = 5.0, disk_path: str = "/"):
+        self.interval = interval
+        self.disk_path = disk_path
+        self._snapshot = {
+            "cpu_percent": None,
+            "memory_percent": None,
+            "disk_percent": None
+        }
+        self._sampled_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _sample(self) -> dict:
+        """Read current usage figures (runs in a worker thread)"""
+        return {
+            # interval=None compares against the previous call instead of sleeping
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory_percent": psutil.virtual_memory().percent,
+            "disk_percent": psutil.disk_usage(self.disk_path).percent
+        }
+
+    async def refresh(self):
+        """Take a new sample and publish it as the current snapshot"""
+        snapshot = await asyncio.to_thread(self._sample)
+        # Rebinding the dict is atomic, readers never see a partial sample
+        self._snapshot = snapshot
+        self._sampled_at = time.monotonic()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"System metrics sampling failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the background sampling task"""
+        if self._task is not None:
+            return
+        # Prime the CPU counter so the first real sample covers a full window
+        psutil.cpu_percent(interval=None)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"System metrics sampler started (interval={self.interval}s)")
+
+    async def stop(self):
+        """Stop the background sampling task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def snapshot(self) -> dict:
+        """Return the latest sample together with its age in seconds"""
+        age = None
+        if self._sampled_at is not None:
+            age = round(time.monotonic() - self._sampled_at, 3)
+        return {**self._snapshot, "sample_age_seconds": age}
+
+
+system_sampler = SystemMetricsSampler(interval=settings.HEALTH_SAMPLE_INTERVAL)
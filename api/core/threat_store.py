@@ -0,0 +1,208 @@
+"""
+Indexed, bounded threat alert store
+"""
+import itertools
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+INDEXED_FIELDS = ("severity", "status", "threat_type", "source_ip")
+
+
+def to_epoch(value: datetime) -> float:
+    """Convert a datetime to epoch seconds, treating naive values as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class _SeqIndex:
+    """Ascending list of alert sequence numbers with cheap front eviction"""
+
+    __slots__ = ("seqs", "head")
+
+    def __init__(self):
+        self.seqs: List[int] = []
+        self.head = 0
+
+    def __len__(self) -> int:
+        return len(self.seqs) - self.head
+
+    def append(self, seq: int):
+        """Add seq in order; re-indexed alerts (status changes) may be older than the tail"""
+        if self.seqs and seq < self.seqs[-1]:
+            insort(self.seqs, seq, self.head)
+        else:
+            self.seqs.append(seq)
+
+    def remove(self, seq: int):
+        pos = bisect_left(self.seqs, seq, self.head)
+        if pos < len(self.seqs) and self.seqs[pos] == seq:
+            if pos == self.head:
+                self._advance()
+            else:
+                del self.seqs[pos]
+
+    def _advance(self):
+        self.head += 1
+        # Compact once the dead prefix dominates, keeping eviction amortised O(1)
+        if self.head > 1024 and self.head * 2 > len(self.seqs):
+            del self.seqs[:self.head]
+            self.head = 0
+
+    def after(self, cursor: int) -> int:
+        """Position of the first sequence number greater than cursor"""
+        return bisect_right(self.seqs, cursor, self.head)
+
+
+class ThreatStore:
+    """Ring-buffered threat log with secondary indexes and running counters"""
+
+    def __init__(self, max_alerts: int = 10000, max_age_seconds: float = 0):
+        self.max_alerts = max_alerts
+        self.max_age_seconds = max_age_seconds
+        self._ids = itertools.count(1)
+        self._records: Dict[int, dict] = {}
+        self._order = _SeqIndex()
+        self._times: List[float] = []
+        self._indexes: Dict[str, Dict[str, _SeqIndex]] = {f: {} for f in INDEXED_FIELDS}
+        self._counts: Dict[str, Counter] = {f: Counter() for f in INDEXED_FIELDS}
+        self._active_by_severity: Counter = Counter()
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def next_seq(self) -> int:
+        """Allocate a unique alert sequence number"""
+        return next(self._ids)
+
+    def add(self, seq: int, alert: dict, created_at: Optional[float] = None):
+        """Insert an alert under a sequence number from next_seq()"""
+        if created_at is None:
+            created_at = time.time()
+        self._records[seq] = alert
+        self._order.append(seq)
+        self._times.append(created_at)
+        for field in INDEXED_FIELDS:
+            self._index_add(field, alert.get(field), seq)
+        if alert.get("status") == "active":
+            self._active_by_severity[alert.get("severity")] += 1
+        self._evict(created_at)
+
+    def get(self, seq: int) -> Optional[dict]:
+        return self._records.get(seq)
+
+    def update_status(self, seq: int, new_status: str) -> bool:
+        """Change an alert's status, keeping indexes and counters in step"""
+        alert = self._records.get(seq)
+        if alert is None:
+            return False
+        old_status = alert.get("status")
+        if old_status == new_status:
+            return True
+        self._index_remove("status", old_status, seq)
+        self._index_add("status", new_status, seq)
+        if old_status == "active":
+            self._active_by_severity[alert.get("severity")] -= 1
+        if new_status == "active":
+            self._active_by_severity[alert.get("severity")] += 1
+        alert["status"] = new_status
+        return True
+
+    def counts(self, field: str) -> Dict[str, int]:
+        """Current per-value counts for an indexed field"""
+        return {k: v for k, v in self._counts[field].items() if v}
+
+    def active_count(self, severity: Optional[str] = None) -> int:
+        """Number of active alerts, optionally restricted to one severity"""
+        if severity is None:
+            return self._counts["status"]["active"]
+        return self._active_by_severity[severity]
+
+    def query(
+        self,
+        cursor: int = 0,
+        limit: int = 100,
+        since: Optional[float] = None,
+        **filters: Optional[str]
+    ) -> Tuple[List[dict], Optional[int]]:
+        """
+        Return up to limit alerts with sequence number above cursor.
+
+        Filters on indexed fields are answered from the most selective index.
+        The second element is the cursor for the next page, or None when
+        there are no further matches.
+        """
+        filters = {k: v for k, v in filters.items() if v is not None}
+        if since is not None:
+            cursor = max(cursor, self._last_seq_before(since))
+
+        index = self._order
+        for field, value in filters.items():
+            candidate = self._indexes[field].get(value)
+            if candidate is None:
+                return [], None
+            if len(candidate) < len(index):
+                index = candidate
+
+        results = []
+        last_seq = None
+        seqs = index.seqs
+        for pos in range(index.after(cursor), len(seqs)):
+            seq = seqs[pos]
+            alert = self._records[seq]
+            if all(alert.get(f) == v for f, v in filters.items()):
+                if len(results) == limit:
+                    return results, last_seq
+                results.append(alert)
+                last_seq = seq
+        return results, None
+
+    def _last_seq_before(self, since: float) -> int:
+        """Largest sequence number created strictly before since (0 if none)"""
+        pos = bisect_left(self._times, since, self._order.head)
+        if pos == self._order.head:
+            return 0
+        return self._order.seqs[pos - 1]
+
+    def _evict(self, now: float):
+        order = self._order
+        while len(order) > self.max_alerts or (
+            self.max_age_seconds and len(order)
+            and now - self._times[order.head] > self.max_age_seconds
+        ):
+            seq = order.seqs[order.head]
+            head_before = order.head
+            order._advance()
+            if order.head == 0:
+                # _advance compacted the sequence list, mirror it on the times
+                del self._times[:head_before + 1]
+            self._drop(seq)
+
+    def _drop(self, seq: int):
+        alert = self._records.pop(seq)
+        for field in INDEXED_FIELDS:
+            self._index_remove(field, alert.get(field), seq)
+        if alert.get("status") == "active":
+            self._active_by_severity[alert.get("severity")] -= 1
+        self.evicted += 1
+
+    def _index_add(self, field: str, value, seq: int):
+        index = self._indexes[field].get(value)
+        if index is None:
+            index = self._indexes[field][value] = _SeqIndex()
+        index.append(seq)
+        self._counts[field][value] += 1
+
+    def _index_remove(self, field: str, value, seq: int):
+        index = self._indexes[field].get(value)
+        if index is None:
+            return
+        index.remove(seq)
+        self._counts[field][value] -= 1
+        if not len(index):
+            del self._indexes[field][value]
+            del self._counts[field][value]
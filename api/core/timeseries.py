@@ -0,0 +1,519 @@
+"""
+Multi-resolution per-node metric history
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from core.anomaly import METRICS, occurrence_rank
+from core.config import settings
+from core.heartbeat_feed import HeartbeatListener
+from core.node_store import epoch_to_iso
+
+logger = logging.getLogger(__name__)
+
+# Metrics are percentages; p95 is read from a histogram of 1-point bins
+P95_BINS = 101
+SNAPSHOT_FORMAT = 1
+
+
+class Rollup:
+    """
+    Fixed-width buckets (min, max, sum, count, p95 per metric) for one
+    resolution, in a ring of `size` buckets per node, plus the bucket
+    currently being filled.
+
+    Bucket n covers [n * resolution, (n + 1) * resolution) and lives at
+    ring index n % size, so a node's ring always holds its latest `size`
+    buckets and memory per node never changes. The open bucket keeps a
+    histogram for its p95 and is written to the ring when a later sample
+    arrives. A late sample for a closed bucket still in the ring updates
+    its min/max/avg; its p95 is left as it was closed.
+    """
+
+    ARRAYS = (
+        "bucket", "min", "max", "sum", "count", "p95",
+        "open_bucket", "open_min", "open_max", "open_sum", "open_count", "open_hist"
+    )
+
+    def __init__(self, resolution: int, size: int, capacity: int):
+        self.resolution = resolution
+        self.size = size
+        metrics = len(METRICS)
+        self.bucket = np.full((capacity, size), -1, dtype=np.int64)
+        self.min = np.full((capacity, size, metrics), np.nan, dtype=np.float32)
+        self.max = np.full((capacity, size, metrics), np.nan, dtype=np.float32)
+        self.sum = np.zeros((capacity, size, metrics), dtype=np.float32)
+        self.count = np.zeros((capacity, size, metrics), dtype=np.uint32)
+        self.p95 = np.full((capacity, size, metrics), np.nan, dtype=np.float32)
+        self.open_bucket = np.full(capacity, -1, dtype=np.int64)
+        self.open_min = np.full((capacity, metrics), np.inf, dtype=np.float32)
+        self.open_max = np.full((capacity, metrics), -np.inf, dtype=np.float32)
+        self.open_sum = np.zeros((capacity, metrics), dtype=np.float64)
+        self.open_count = np.zeros((capacity, metrics), dtype=np.uint32)
+        self.open_hist = np.zeros((capacity, metrics, P95_BINS), dtype=np.uint16)
+
+    @staticmethod
+    def percentile(hist: np.ndarray, count: np.ndarray, q: float = 0.95) -> np.ndarray:
+        """Bin value of the q-th percentile for histograms along the last axis"""
+        target = np.maximum(np.ceil(count * q), 1)
+        reached = hist.cumsum(axis=-1, dtype=np.uint32) >= target[..., None]
+        return np.where(count > 0, reached.argmax(axis=-1), np.nan).astype(np.float32)
+
+    def _reset_open(self, slots: np.ndarray, buckets: np.ndarray):
+        self.open_bucket[slots] = buckets
+        self.open_min[slots] = np.inf
+        self.open_max[slots] = -np.inf
+        self.open_sum[slots] = 0
+        self.open_count[slots] = 0
+        self.open_hist[slots] = 0
+
+    def _open_stats(self, slots) -> Tuple[np.ndarray, ...]:
+        """(min, max, sum, count, p95) of the open buckets, NaN where empty"""
+        count = self.open_count[slots]
+        empty = count == 0
+        return (
+            np.where(empty, np.nan, self.open_min[slots]),
+            np.where(empty, np.nan, self.open_max[slots]),
+            self.open_sum[slots].astype(np.float32),
+            count,
+            self.percentile(self.open_hist[slots], count)
+        )
+
+    def _close(self, slots: np.ndarray):
+        buckets = self.open_bucket[slots]
+        index = buckets % self.size
+        self.bucket[slots, index] = buckets
+        (
+            self.min[slots, index],
+            self.max[slots, index],
+            self.sum[slots, index],
+            self.count[slots, index],
+            self.p95[slots, index]
+        ) = self._open_stats(slots)
+
+    def add(self, slots: np.ndarray, timestamps: np.ndarray, values: np.ndarray):
+        """Fold samples in; each slot appears at most once"""
+        buckets = np.floor_divide(timestamps, self.resolution).astype(np.int64)
+        newer = buckets > self.open_bucket[slots]
+        if newer.any():
+            moving = slots[newer]
+            started = moving[self.open_bucket[moving] >= 0]
+            if len(started):
+                self._close(started)
+            self._reset_open(moving, buckets[newer])
+        current = buckets == self.open_bucket[slots]
+        if current.all():
+            self._fold_open(slots, values)
+            return
+        self._fold_open(slots[current], values[current])
+        late = ~current
+        self._fold_closed(slots[late], buckets[late], values[late])
+
+    def _fold_open(self, slots: np.ndarray, values: np.ndarray):
+        for m in range(values.shape[1]):
+            x = values[:, m]
+            present = ~np.isnan(x)
+            s, x = slots[present], x[present]
+            if not len(s):
+                continue
+            self.open_min[s, m] = np.minimum(self.open_min[s, m], x)
+            self.open_max[s, m] = np.maximum(self.open_max[s, m], x)
+            self.open_sum[s, m] += x
+            self.open_count[s, m] += 1
+            bins = np.clip(np.rint(x), 0, P95_BINS - 1).astype(np.int64)
+            self.open_hist[s, m, bins] += 1
+
+    def _fold_closed(self, slots: np.ndarray, buckets: np.ndarray, values: np.ndarray):
+        index = buckets % self.size
+        existing = self.bucket[slots, index]
+        # Older than anything the ring still holds
+        keep = (buckets > self.open_bucket[slots] - self.size) & (existing <= buckets)
+        slots, buckets, index, values = slots[keep], buckets[keep], index[keep], values[keep]
+        fresh = self.bucket[slots, index] != buckets
+        if fresh.any():
+            s, i = slots[fresh], index[fresh]
+            self.bucket[s, i] = buckets[fresh]
+            self.min[s, i] = self.max[s, i] = self.p95[s, i] = np.nan
+            self.sum[s, i] = 0
+            self.count[s, i] = 0
+        for m in range(values.shape[1]):
+            x = values[:, m]
+            present = ~np.isnan(x)
+            s, i, x = slots[present], index[present], x[present]
+            if not len(s):
+                continue
+            self.min[s, i, m] = np.fmin(self.min[s, i, m], x)
+            self.max[s, i, m] = np.fmax(self.max[s, i, m], x)
+            self.sum[s, i, m] += x
+            self.count[s, i, m] += 1
+            self.p95[s, i, m] = np.where(np.isnan(self.p95[s, i, m]), x, self.p95[s, i, m])
+
+    def clear(self, slot: int):
+        self.bucket[slot] = -1
+        self.min[slot] = self.max[slot] = self.p95[slot] = np.nan
+        self.sum[slot] = 0
+        self.count[slot] = 0
+        self._reset_open(np.array([slot]), np.array([-1]))
+
+    def oldest(self, slot: int) -> Optional[float]:
+        """Start of the oldest bucket the ring can still hold, None before any sample"""
+        newest = self.open_bucket[slot]
+        if newest < 0:
+            return None
+        return float((newest - self.size + 1) * self.resolution)
+
+    def query(self, slot: int, start: float, end: float) -> List[dict]:
+        first = math.floor(start / self.resolution)
+        last = math.floor(end / self.resolution)
+        row = self.bucket[slot]
+        hits = np.flatnonzero((row >= first) & (row <= last))
+        hits = hits[np.argsort(row[hits])]
+        stats = [
+            (self.min[slot, hits], self.max[slot, hits], self.sum[slot, hits],
+             self.count[slot, hits], self.p95[slot, hits])
+        ]
+        buckets = row[hits].tolist()
+        open_bucket = int(self.open_bucket[slot])
+        if first <= open_bucket <= last:
+            stats.append(tuple(a[None] for a in self._open_stats(slot)))
+            buckets.append(open_bucket)
+        low, high, total, count, p95 = (np.concatenate(parts) for parts in zip(*stats))
+        mean = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+        points = []
+        for k, bucket in enumerate(buckets):
+            point = {"timestamp": epoch_to_iso(bucket * self.resolution)}
+            for m, metric in enumerate(METRICS):
+                point[metric] = None if count[k, m] == 0 else {
+                    "min": round(float(low[k, m]), 2),
+                    "max": round(float(high[k, m]), 2),
+                    "avg": round(float(mean[k, m]), 2),
+                    "p95": round(float(p95[k, m]), 2),
+                    "count": int(count[k, m])
+                }
+            points.append(point)
+        return points
+
+
+class MetricHistory(HeartbeatListener):
+    """
+    Per-node CPU/memory history: the latest raw_samples samples plus
+    rollups at each (resolution, buckets) pair.
+
+    Like the anomaly detector, nodes own a slot in preallocated arrays,
+    so a heartbeat batch is a handful of vectorised writes and memory per
+    node is fixed (bytes_per_node). Queries pick the coarsest resolution
+    no wider than the requested step whose retention reaches back to the
+    start of the range. Snapshots are directories of .npy files that are
+    memory-mapped (copy-on-write) on restart, so loading is immediate and
+    pages are read as nodes are touched.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        raw_samples: int = 240,
+        rollups: Sequence[Tuple[int, int]] = ((60, 180), (300, 288), (3600, 168))
+    ):
+        self.raw_samples = raw_samples
+        self.rollups = [Rollup(res, size, capacity) for res, size in sorted(rollups)]
+        self._index: Dict[str, int] = {}
+        self._free: List[int] = []
+        self.node_ids: List[Optional[str]] = []
+        metrics = len(METRICS)
+        self.raw_ts = np.full((capacity, raw_samples), np.nan)
+        self.raw_values = np.full((capacity, raw_samples, metrics), np.nan, dtype=np.float32)
+        self.raw_count = np.zeros(capacity, dtype=np.int64)
+        self.epoch: Optional[str] = None
+        self.snapshot_dir: Optional[Path] = None
+        self.snapshot_interval = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.raw_count)
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {"raw_ts": self.raw_ts, "raw_values": self.raw_values, "raw_count": self.raw_count}
+        for rollup in self.rollups:
+            for name in Rollup.ARRAYS:
+                arrays[f"r{rollup.resolution}_{name}"] = getattr(rollup, name)
+        return arrays
+
+    def _set_array(self, key: str, array: np.ndarray):
+        if key.startswith("raw_"):
+            setattr(self, key, array)
+            return
+        resolution, name = key[1:].split("_", 1)
+        for rollup in self.rollups:
+            if rollup.resolution == int(resolution):
+                setattr(rollup, name, array)
+
+    @property
+    def bytes_per_node(self) -> int:
+        """Memory held per node slot (raw ring, rollup rings and open buckets)"""
+        return sum(a.nbytes // max(len(a), 1) for a in self._arrays().values())
+
+    def _grow(self):
+        capacity = max(self.capacity * 2, 1)
+        # A fresh instance supplies correctly initialised rows for the new slots
+        blank = MetricHistory(capacity, self.raw_samples, [(r.resolution, r.size) for r in self.rollups])
+        for key, column in self._arrays().items():
+            grown = blank._arrays()[key]
+            grown[:len(column)] = column
+            self._set_array(key, grown)
+
+    def _slots(self, node_ids: Sequence[str]) -> np.ndarray:
+        slots = np.empty(len(node_ids), dtype=np.int64)
+        index = self._index
+        for i, node_id in enumerate(node_ids):
+            slot = index.get(node_id)
+            if slot is None:
+                if self._free:
+                    slot = self._free.pop()
+                    self.node_ids[slot] = node_id
+                else:
+                    slot = len(self.node_ids)
+                    if slot == self.capacity:
+                        self._grow()
+                    self.node_ids.append(node_id)
+                index[node_id] = slot
+            slots[i] = slot
+        return slots
+
+    def forget(self, node_id: str):
+        slot = self._index.pop(node_id, None)
+        if slot is None:
+            return
+        self.node_ids[slot] = None
+        self.raw_ts[slot] = np.nan
+        self.raw_values[slot] = np.nan
+        self.raw_count[slot] = 0
+        for rollup in self.rollups:
+            rollup.clear(slot)
+        self._free.append(slot)
+
+    def ingest(self, node_ids, cpu, memory, timestamps):
+        slots = self._slots(node_ids)
+        values = np.column_stack((cpu, memory)).astype(np.float32)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        rank = occurrence_rank(slots)
+        if not rank.any():
+            self._add(slots, timestamps, values)
+            return
+        # Replayed buffers repeat a node; add its samples in order
+        for r in range(int(rank.max()) + 1):
+            step = rank == r
+            self._add(slots[step], timestamps[step], values[step])
+
+    def _add(self, slots: np.ndarray, timestamps: np.ndarray, values: np.ndarray):
+        if self.raw_samples:
+            position = self.raw_count[slots] % self.raw_samples
+            self.raw_ts[slots, position] = timestamps
+            self.raw_values[slots, position] = values
+            self.raw_count[slots] += 1
+        for rollup in self.rollups:
+            rollup.add(slots, timestamps, values)
+
+    def _raw_oldest(self, slot: int) -> Optional[float]:
+        """None while the raw ring has not wrapped (it holds everything)"""
+        if self.raw_count[slot] <= self.raw_samples:
+            return None
+        return float(np.nanmin(self.raw_ts[slot]))
+
+    def resolution_for(self, node_id: str, start: float, step: float) -> int:
+        """Coarsest resolution <= step that reaches back to start (0 means raw samples)"""
+        slot = self._index.get(node_id)
+        if slot is None:
+            return 0
+        candidates = []
+        if self.raw_samples:
+            oldest = self._raw_oldest(slot)
+            candidates.append((0, oldest is None or oldest <= start))
+        for rollup in self.rollups:
+            oldest = rollup.oldest(slot)
+            candidates.append((rollup.resolution, oldest is None or oldest <= start))
+        covering = [res for res, covers in candidates if covers]
+        fine_enough = [res for res in covering if res <= step]
+        if fine_enough:
+            return max(fine_enough)
+        if covering:
+            return min(covering)
+        return max(res for res, _ in candidates)
+
+    def query(
+        self,
+        node_id: str,
+        start: float,
+        end: float,
+        step: Optional[float] = None,
+        max_points: int = 500
+    ) -> Optional[dict]:
+        """Samples or rollup buckets for node_id in [start, end]; None for an unknown node"""
+        slot = self._index.get(node_id)
+        if slot is None:
+            return None
+        if step is None:
+            step = (end - start) / max_points
+        resolution = self.resolution_for(node_id, start, step)
+        if resolution == 0:
+            ts = self.raw_ts[slot]
+            hits = np.flatnonzero((ts >= start) & (ts <= end))
+            hits = hits[np.argsort(ts[hits], kind="stable")]
+            values = self.raw_values[slot, hits]
+            points = [
+                {
+                    "timestamp": epoch_to_iso(t),
+                    **{metric: None if math.isnan(v[m]) else round(float(v[m]), 2) for m, metric in enumerate(METRICS)}
+                }
+                for t, v in zip(ts[hits].tolist(), values)
+            ]
+        else:
+            rollup = next(r for r in self.rollups if r.resolution == resolution)
+            points = rollup.query(slot, start, end)
+        return {
+            "node_id": node_id,
+            "from": epoch_to_iso(start),
+            "to": epoch_to_iso(end),
+            "resolution": resolution if resolution else "raw",
+            "points": points
+        }
+
+    # Snapshots
+
+    def _layout(self) -> dict:
+        return {
+            "format": SNAPSHOT_FORMAT,
+            "raw_samples": self.raw_samples,
+            "rollups": [[r.resolution, r.size] for r in self.rollups]
+        }
+
+    def snapshot(self) -> Tuple[dict, Dict[str, np.ndarray]]:
+        """Copy of the used rows, safe to write from another thread"""
+        used = len(self.node_ids)
+        meta = {
+            **self._layout(),
+            "epoch": self.epoch,
+            "node_ids": list(self.node_ids),
+            "saved_at": time.time()
+        }
+        return meta, {key: array[:used].copy() for key, array in self._arrays().items()}
+
+    @staticmethod
+    def write_snapshot(directory: Union[str, Path], meta: dict, arrays: Dict[str, np.ndarray]) -> Path:
+        """Write a new snapshot directory, point CURRENT at it and remove older ones"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"history-{time.time_ns()}"
+        staging = directory / f".{name}.tmp"
+        staging.mkdir()
+        for key, array in arrays.items():
+            np.save(staging / f"{key}.npy", array)
+        (staging / "meta.json").write_text(json.dumps(meta))
+        target = directory / name
+        os.rename(staging, target)
+        pointer = directory / ".CURRENT.tmp"
+        pointer.write_text(name)
+        os.replace(pointer, directory / "CURRENT")
+        for old in directory.glob("history-*"):
+            if old.name != name:
+                shutil.rmtree(old, ignore_errors=True)
+        return target
+
+    def save(self, directory: Union[str, Path]) -> Path:
+        meta, arrays = self.snapshot()
+        return self.write_snapshot(directory, meta, arrays)
+
+    def load(self, directory: Union[str, Path], epoch: Optional[str] = None) -> bool:
+        """
+        Map the current snapshot in directory; False if there is none or it
+        does not fit. With epoch, a snapshot taken against another store is
+        skipped: its node ids may since have been given to other nodes.
+        """
+        directory = Path(directory)
+        try:
+            current = directory / (directory / "CURRENT").read_text().strip()
+            meta = json.loads((current / "meta.json").read_text())
+        except (OSError, ValueError) as e:
+            logger.info(f"No metric history snapshot in {directory}: {e}")
+            return False
+        if epoch is not None and meta.get("epoch") != epoch:
+            logger.info(f"Metric history snapshot {current} is from another store, starting empty")
+            return False
+        layout = {k: meta.get(k) for k in self._layout()}
+        if layout != self._layout():
+            logger.warning(f"Metric history snapshot {current} has a different layout, starting empty")
+            return False
+        try:
+            arrays = {key: np.load(current / f"{key}.npy", mmap_mode="c") for key in self._arrays()}
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load metric history snapshot {current}: {e}")
+            return False
+        for key, array in arrays.items():
+            self._set_array(key, array)
+        self.node_ids = list(meta["node_ids"])
+        self._index = {node_id: slot for slot, node_id in enumerate(self.node_ids) if node_id is not None}
+        self._free = [slot for slot, node_id in enumerate(self.node_ids) if node_id is None]
+        logger.info(f"Mapped metric history for {len(self)} nodes from {current}")
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                meta, arrays = self.snapshot()
+                await asyncio.to_thread(self.write_snapshot, self.snapshot_dir, meta, arrays)
+            except Exception as e:
+                logger.error(f"Metric history snapshot failed: {e}")
+
+    async def start(self, storage, directory: Optional[Union[str, Path]], interval: float):
+        """
+        Restore the last snapshot taken against storage, drop nodes it no
+        longer has and save a new snapshot every interval seconds.
+        """
+        if self._task is not None or directory is None or interval <= 0:
+            return
+        self.snapshot_dir = Path(directory)
+        self.snapshot_interval = interval
+        try:
+            self.epoch = await storage.epoch()
+            if self.load(self.snapshot_dir, self.epoch):
+                known = {node["node_id"] for node in await storage.list_nodes()}
+                for node_id in [n for n in self._index if n not in known]:
+                    self.forget(node_id)
+        except Exception as e:
+            logger.error(f"Could not restore metric history: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            meta, arrays = self.snapshot()
+            await asyncio.to_thread(self.write_snapshot, self.snapshot_dir, meta, arrays)
+        except Exception as e:
+            logger.error(f"Final metric history snapshot failed: {e}")
+
+
+metric_history = MetricHistory(
+    capacity=settings.MAX_EDGE_NODES or 1024,
+    raw_samples=settings.METRIC_HISTORY_RAW_SAMPLES,
+    rollups=sorted(settings.METRIC_HISTORY_ROLLUPS.items())
+)
@@ -2,14 +2,26 @@
 HackerHardware.net - FastAPI Backend
 Main application entry point
 """
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
 
-from routers import health, nodes, security, intelligence
+from routers import health, nodes, security, intelligence, metrics, stream
+from core.anomaly import anomaly_detector
 from core.config import settings
-from core.security import verify_token
+from core.forecasting import threat_forecaster
+from core.heartbeat_feed import heartbeat_feed
+from core.ingest import ingest_pipeline
+from core.liveness import liveness_tracker
+from core.metrics import MetricsMiddleware
+from core.passwords import password_hasher
+from core.policy import require_access
+from core.push import push_hub
+from core.security import require_token
+from core.storage import storage
+from core.system_metrics import system_sampler
+from core.timeseries import metric_history
 
 # Configure logging
 logging.basicConfig(
@@ -18,11 +30,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+heartbeat_feed.subscribe(anomaly_detector)
+heartbeat_feed.subscribe(liveness_tracker)
+heartbeat_feed.subscribe(metric_history)
+heartbeat_feed.subscribe(push_hub)
+liveness_tracker.subscribe(push_hub.status_changed)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     logger.info("Starting HackerHardware.net API")
+    await storage.connect()
+    system_sampler.start()
+    ingest_pipeline.start()
+    await liveness_tracker.start(storage)
+    push_hub.start(storage)
+    await metric_history.start(storage, settings.METRIC_HISTORY_DIR, settings.METRIC_HISTORY_SNAPSHOT_INTERVAL)
+    await password_hasher.start(
+        target_ms=0 if settings.PASSWORD_HASH_ROUNDS else settings.PASSWORD_HASH_TARGET_MS,
+        min_rounds=settings.PASSWORD_HASH_MIN_ROUNDS,
+        max_rounds=settings.PASSWORD_HASH_MAX_ROUNDS
+    )
+    await threat_forecaster.start(storage)
     yield
+    await threat_forecaster.stop()
+    await password_hasher.stop()
+    await push_hub.stop()
+    await metric_history.stop()
+    await liveness_tracker.stop()
+    await ingest_pipeline.stop()
+    await system_sampler.stop()
+    await storage.close()
     logger.info("Shutting down HackerHardware.net API")
 
 # Initialize FastAPI app
@@ -42,11 +80,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(health.router, prefix="/api/v1", tags=["health"])
-app.include_router(nodes.router, prefix="/api/v1/nodes", tags=["nodes"])
-app.include_router(security.router, prefix="/api/v1/security", tags=["security"])
-app.include_router(intelligence.router, prefix="/api/v1/intelligence", tags=["intelligence"])
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router, tags=["metrics"])
+authenticated = [Depends(require_token), Depends(require_access)]
+app.include_router(nodes.router, prefix="/api/v1/nodes", tags=["nodes"], dependencies=authenticated)
+app.include_router(security.router, prefix="/api/v1/security", tags=["security"], dependencies=authenticated)
+app.include_router(
+    intelligence.router,
+    prefix="/api/v1/intelligence",
+    tags=["intelligence"],
+    dependencies=authenticated
+)
+# The WebSocket route authenticates itself; browsers cannot send its headers
+app.include_router(stream.router, prefix="/api/v1/stream", tags=["stream"])
 
 @app.get("/")
 async def root():
@@ -3,7 +3,8 @@ Health check endpoints
 """
 from fastapi import APIRouter
 from datetime import datetime
-import psutil
+
+from core.system_metrics import system_sampler
 
 router = APIRouter()
 
@@ -14,11 +15,7 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "system": {
-            "cpu_percent": psutil.cpu_percent(interval=1),
-            "memory_percent": psutil.virtual_memory().percent,
-            "disk_percent": psutil.disk_usage('/').percent
-        }
+        "system": system_sampler.snapshot()
     }
 
 
@@ -1,15 +1,20 @@
 """
 AI and intelligence endpoints
 """
-from fastapi import APIRouter
-from typing import List
-from datetime import datetime
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from typing import List, Optional
+from pydantic import BaseModel, ValidationError
+import time
 
-router = APIRouter()
+from core.anomaly import anomaly_detector
+from core.compression import read_body
+from core.config import settings
+from core.forecasting import threat_forecaster
+from core.ingest import IngestQueueFull, IngestUnavailable, ingest_pipeline
+from core.rebalance import load_rebalancer
+from core.storage import StorageBackend, get_storage
 
-# Analytics storage
-analytics_data = []
+router = APIRouter()
 
 
 class Anomaly(BaseModel):
@@ -23,6 +28,18 @@ class Anomaly(BaseModel):
     timestamp: str
 
 
+class LearningEvent(BaseModel):
+    """Single event in a learning batch"""
+    event_type: str
+    data: dict
+    timestamp: Optional[float] = None
+
+
+class LearningBatch(BaseModel):
+    """Bulk learning submission"""
+    events: List[LearningEvent]
+
+
 class Prediction(BaseModel):
     """Predictive analysis result"""
     prediction_id: str
@@ -33,62 +50,85 @@ class Prediction(BaseModel):
 
 
 @router.get("/anomalies", response_model=List[Anomaly])
-async def detect_anomalies():
+async def detect_anomalies(
+    node_id: Optional[str] = None,
+    metric_type: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=10000)
+):
     """Detect anomalies across the network"""
-    # Placeholder for AI-based anomaly detection
-    return []
+    return anomaly_detector.detect(node_id=node_id, metric_type=metric_type)[:limit]
 
 
 @router.get("/predict")
 async def predict_threats():
-    """Predict potential threats using AI"""
-    return {
-        "prediction_type": "threat_analysis",
-        "confidence": 0.85,
-        "threat_level": "low",
-        "timestamp": datetime.utcnow().isoformat(),
-        "recommendations": [
-            "Continue monitoring",
-            "Update security policies",
-            "Review access logs"
-        ]
-    }
+    """Forecast threat activity from recent per-type threat counts"""
+    return threat_forecaster.forecast()
 
 
 @router.get("/optimize")
-async def network_optimization():
-    """Get network optimization recommendations"""
-    return {
-        "optimization_id": f"opt-{datetime.utcnow().timestamp()}",
-        "recommendations": [
-            {
-                "type": "resource_allocation",
-                "target": "edge_nodes",
-                "action": "rebalance_load",
-                "priority": "medium"
-            },
-            {
-                "type": "security",
-                "target": "firewall_rules",
-                "action": "update_rules",
-                "priority": "high"
-            }
-        ],
-        "timestamp": datetime.utcnow().isoformat()
-    }
+async def network_optimization(
+    limit: int = Query(1000, ge=0, le=100000, description="Maximum moves to return"),
+    storage: StorageBackend = Depends(get_storage)
+):
+    """Plan workload moves from overloaded to idle edge nodes"""
+    plan = await load_rebalancer.plan(storage)
+    return {**plan, "moves": plan["moves"][:limit]}
+
+
+def _enqueue(events: List[tuple]) -> int:
+    """Hand events to the ingest pipeline, mapping back-pressure to HTTP"""
+    try:
+        return ingest_pipeline.submit(events)
+    except IngestQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Ingest queue is full",
+            headers={"Retry-After": str(max(1, round(settings.INGEST_FLUSH_INTERVAL)))}
+        )
+    except IngestUnavailable:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingest pipeline unavailable",
+            headers={"Retry-After": "5"}
+        )
 
 
 @router.post("/learn")
 async def submit_learning_data(event_type: str, data: dict):
     """Submit data for AI learning"""
-    analytics_data.append({
-        "event_type": event_type,
-        "data": data,
-        "timestamp": datetime.utcnow().isoformat()
-    })
-    
+    events_collected = _enqueue([(event_type, data, time.time())])
+
     return {
         "status": "accepted",
         "message": "Data submitted for analysis",
-        "events_collected": len(analytics_data)
+        "events_collected": events_collected
+    }
+
+
+@router.post("/learn/batch")
+async def submit_learning_batch(request: Request):
+    """Submit many learning events in one request (optionally gzip-encoded)"""
+    body = await read_body(request, settings.INGEST_BATCH_MAX_BYTES)
+    try:
+        batch = LearningBatch.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False, include_context=False, include_input=False)
+        )
+    if len(batch.events) > settings.INGEST_BATCH_MAX_EVENTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {settings.INGEST_BATCH_MAX_EVENTS} events"
+        )
+    now = time.time()
+    events_collected = _enqueue([
+        (event.event_type, event.data, event.timestamp or now)
+        for event in batch.events
+    ])
+
+    return {
+        "status": "accepted",
+        "accepted": len(batch.events),
+        "events_collected": events_collected
     }
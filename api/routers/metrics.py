@@ -0,0 +1,41 @@
+"""
+Prometheus metrics endpoint
+"""
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from core.ingest import ingest_pipeline
+from core.metrics import render, request_metrics, select_target
+from core.storage import StorageBackend, get_storage
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(
+    target: Optional[str] = None,
+    storage: StorageBackend = Depends(get_storage)
+):
+    """
+    Prometheus exposition for the API and edge nodes.
+
+    With ?target= (the edge_nodes scrape job) only that node's series are
+    returned.
+    """
+    columns = await storage.node_columns()
+    if target is not None:
+        requests = sizes = ingest = None
+        columns = select_target(columns, target)
+    else:
+        requests = request_metrics.snapshot()
+        sizes = {
+            "nodes": await storage.count_nodes(),
+            "threats": await storage.count_threats(),
+            "threats_active": await storage.active_threat_count()
+        }
+        ingest = ingest_pipeline.stats()
+    body = await asyncio.to_thread(render, requests, sizes, columns, ingest)
+    return Response(content=body, media_type=CONTENT_TYPE_LATEST)
@@ -1,16 +1,29 @@
 """
 Edge node management endpoints
 """
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
+import json
+import time
+
+import msgpack
+import numpy as np
+
+from core.compression import read_body
+from core.config import settings
+from core.heartbeat_feed import heartbeat_feed
+from core.liveness import liveness_tracker
+from core.node_store import epoch_to_iso
+from core.push import push_hub
+from core.response_cache import response_cache
+from core.storage import StorageBackend, get_storage
+from core.threat_store import to_epoch
+from core.timeseries import metric_history
 
 router = APIRouter()
 
-# In-memory storage (replace with database in production)
-edge_nodes = {}
-
 
 class EdgeNode(BaseModel):
     """Edge node model"""
@@ -23,6 +36,9 @@ class EdgeNode(BaseModel):
     last_heartbeat: str = None
 
 
+_node_list = TypeAdapter(List[EdgeNode])
+
+
 class NodeRegistration(BaseModel):
     """Node registration request"""
     hostname: str
@@ -30,62 +46,206 @@ class NodeRegistration(BaseModel):
 
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-async def register_node(node: NodeRegistration):
+async def register_node(
+    node: NodeRegistration,
+    storage: StorageBackend = Depends(get_storage)
+):
     """Register a new edge node"""
-    node_id = f"node-{len(edge_nodes) + 1}"
+    node_id = f"node-{await storage.next_id('node')}"
     new_node = EdgeNode(
         node_id=node_id,
         hostname=node.hostname,
         ip_address=node.ip_address,
-        last_heartbeat=datetime.utcnow().isoformat()
+        last_heartbeat=epoch_to_iso(time.time())
     )
-    edge_nodes[node_id] = new_node
+    if not await storage.add_node(new_node.model_dump(), limit=settings.MAX_EDGE_NODES):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Edge node limit of {settings.MAX_EDGE_NODES} reached"
+        )
+    liveness_tracker.track(node_id)
+    push_hub.node_registered(new_node.model_dump())
     return new_node
 
 
+def _parse_heartbeat_batch(body: bytes, content_type: str):
+    """
+    Decode a columnar heartbeat batch.
+
+    The payload is a JSON or msgpack object of parallel arrays:
+    {"node_ids": [...], "cpu_usage": [...], "memory_usage": [...],
+    "timestamps": [...]} where timestamps (epoch seconds) are optional and
+    null metrics leave the stored value unchanged.
+    """
+    try:
+        if content_type.startswith("application/msgpack"):
+            payload = msgpack.unpackb(body)
+        else:
+            payload = json.loads(body)
+        node_ids = payload["node_ids"]
+        if not isinstance(node_ids, list) or not all(isinstance(n, str) for n in node_ids):
+            raise TypeError("node_ids must be an array of strings")
+        count = len(node_ids)
+        cpu = np.asarray(payload["cpu_usage"], dtype=np.float64)
+        memory = np.asarray(payload["memory_usage"], dtype=np.float64)
+        if payload.get("timestamps") is None:
+            timestamps = np.full(count, time.time())
+        else:
+            timestamps = np.asarray(payload["timestamps"], dtype=np.float64)
+    except (ValueError, TypeError, KeyError, msgpack.UnpackException) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid heartbeat batch: {e}"
+        )
+    if not (cpu.shape == memory.shape == timestamps.shape == (count,)):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Heartbeat batch arrays must have equal length"
+        )
+    if count > settings.HEARTBEAT_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Heartbeat batch exceeds {settings.HEARTBEAT_BATCH_MAX_SIZE} samples"
+        )
+    _check_samples(cpu, memory, timestamps)
+    return node_ids, cpu, memory, timestamps
+
+
+def _check_samples(cpu: np.ndarray, memory: np.ndarray, timestamps: np.ndarray):
+    """
+    Reject metrics outside 0-100 (NaN still means unchanged) and sample
+    times that are not finite or fall outside the accepted window.
+    """
+    for name, values in (("cpu_usage", cpu), ("memory_usage", memory)):
+        if not (np.isnan(values) | ((values >= 0) & (values <= 100))).all():
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"{name} values must be between 0 and 100"
+            )
+    now = time.time()
+    earliest = now - settings.HEARTBEAT_MAX_AGE_SECONDS
+    latest = now + settings.HEARTBEAT_MAX_CLOCK_SKEW
+    if not ((timestamps >= earliest) & (timestamps <= latest)).all():
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"timestamps must be within {settings.HEARTBEAT_MAX_AGE_SECONDS}s before "
+                   f"and {settings.HEARTBEAT_MAX_CLOCK_SKEW}s after the server time"
+        )
+
+
+@router.post("/heartbeats")
+async def node_heartbeats(request: Request, storage: StorageBackend = Depends(get_storage)):
+    """Ingest a batch of heartbeats from many nodes in one request"""
+    body = await read_body(request, settings.HEARTBEAT_BATCH_MAX_BYTES)
+    node_ids, cpu, memory, timestamps = _parse_heartbeat_batch(
+        body,
+        request.headers.get("content-type", "application/json")
+    )
+    unknown = await storage.record_heartbeats(node_ids, cpu, memory, timestamps)
+    heartbeat_feed.publish(node_ids, cpu, memory, timestamps, unknown)
+    return {
+        "status": "ok",
+        "accepted": len(node_ids) - len(unknown),
+        "unknown_nodes": unknown
+    }
+
+
 @router.get("/", response_model=List[EdgeNode])
-async def list_nodes():
-    """List all registered edge nodes"""
-    return list(edge_nodes.values())
+async def list_nodes(request: Request, storage: StorageBackend = Depends(get_storage)):
+    """List all registered edge nodes (ETag / If-None-Match aware)"""
+    async def build():
+        return _node_list.dump_json(_node_list.validate_python(await storage.list_nodes())), None
+
+    return await response_cache.respond(request, "nodes", await storage.version("nodes"), "", build)
+
+
+@router.get("/events")
+async def liveness_events(cursor: int = 0, limit: int = 100):
+    """Node status transitions (active, stale, offline) after a cursor"""
+    events, next_cursor = liveness_tracker.events_since(cursor, max(1, min(limit, 1000)))
+    return {"events": events, "next_cursor": next_cursor}
 
 
 @router.get("/{node_id}", response_model=EdgeNode)
-async def get_node(node_id: str):
+async def get_node(node_id: str, storage: StorageBackend = Depends(get_storage)):
     """Get specific edge node details"""
-    if node_id not in edge_nodes:
+    node = await storage.get_node(node_id)
+    if node is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Node not found"
+        )
+    return node
+
+
+@router.get("/{node_id}/metrics")
+async def node_metrics(
+    node_id: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    step: Optional[int] = Query(None, ge=1, description="Widest acceptable resolution in seconds"),
+    storage: StorageBackend = Depends(get_storage)
+):
+    """CPU and memory history, from raw samples or the coarsest rollup that fits step"""
+    end_ts = to_epoch(end) if end else time.time()
+    start_ts = to_epoch(start) if start else end_ts - 3600
+    if start_ts > end_ts:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="from must not be after to"
+        )
+    if await storage.get_node(node_id) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Node not found"
         )
-    return edge_nodes[node_id]
+    history = metric_history.query(node_id, start_ts, end_ts, step)
+    if history is None:
+        # Registered, but no heartbeat has reached this worker yet
+        history = {
+            "node_id": node_id,
+            "from": epoch_to_iso(start_ts),
+            "to": epoch_to_iso(end_ts),
+            "resolution": "raw",
+            "points": []
+        }
+    return history
 
 
 @router.post("/{node_id}/heartbeat")
-async def node_heartbeat(node_id: str, cpu_usage: float, memory_usage: float):
+async def node_heartbeat(
+    node_id: str,
+    cpu_usage: float,
+    memory_usage: float,
+    storage: StorageBackend = Depends(get_storage)
+):
     """Update node heartbeat and metrics"""
-    if node_id not in edge_nodes:
+    sample = (
+        [node_id],
+        np.array([cpu_usage]),
+        np.array([memory_usage]),
+        np.array([time.time()])
+    )
+    _check_samples(*sample[1:])
+    unknown = await storage.record_heartbeats(*sample)
+    if unknown:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Node not found"
         )
-    
-    node = edge_nodes[node_id]
-    node.cpu_usage = cpu_usage
-    node.memory_usage = memory_usage
-    node.last_heartbeat = datetime.utcnow().isoformat()
-    node.status = "active"
+    heartbeat_feed.publish(*sample)
     
     return {"status": "ok", "node_id": node_id}
 
 
 @router.delete("/{node_id}")
-async def deregister_node(node_id: str):
+async def deregister_node(node_id: str, storage: StorageBackend = Depends(get_storage)):
     """Deregister an edge node"""
-    if node_id not in edge_nodes:
+    if not await storage.delete_node(node_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Node not found"
         )
+    heartbeat_feed.node_removed(node_id)
     
-    del edge_nodes[node_id]
     return {"status": "deleted", "node_id": node_id}
@@ -1,15 +1,18 @@
 """
 Security and threat monitoring endpoints
 """
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
+import json
 
-router = APIRouter()
+from core.push import push_hub
+from core.response_cache import response_cache
+from core.storage import StorageBackend, get_storage
+from core.threat_store import to_epoch
 
-# In-memory threat log (replace with proper storage)
-threat_log = []
+router = APIRouter()
 
 
 class ThreatAlert(BaseModel):
@@ -23,6 +26,9 @@ class ThreatAlert(BaseModel):
     status: str = "active"
 
 
+_alert_list = TypeAdapter(List[ThreatAlert])
+
+
 class SecurityScan(BaseModel):
     """Security scan request"""
     target: str
@@ -30,9 +36,33 @@ class SecurityScan(BaseModel):
 
 
 @router.get("/threats", response_model=List[ThreatAlert])
-async def get_threats():
-    """Get all threat alerts"""
-    return threat_log
+async def get_threats(
+    request: Request,
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    since: Optional[datetime] = None,
+    severity: Optional[str] = None,
+    threat_type: Optional[str] = None,
+    source_ip: Optional[str] = None,
+    alert_status: Optional[str] = Query(None, alias="status"),
+    storage: StorageBackend = Depends(get_storage)
+):
+    """Get threat alerts, oldest first, one page at a time (ETag / If-None-Match aware)"""
+    filters = {
+        "severity": severity,
+        "threat_type": threat_type,
+        "source_ip": source_ip,
+        "status": alert_status
+    }
+    since_ts = to_epoch(since) if since else None
+
+    async def build():
+        alerts, next_cursor = await storage.query_threats(cursor=cursor, limit=limit, since=since_ts, **filters)
+        body = _alert_list.dump_json(_alert_list.validate_python(alerts))
+        return body, None if next_cursor is None else {"X-Next-Cursor": str(next_cursor)}
+
+    query = repr((cursor, limit, since_ts, sorted(filters.items())))
+    return await response_cache.respond(request, "threats", await storage.version("threats"), query, build)
 
 
 @router.post("/threats", status_code=status.HTTP_201_CREATED)
@@ -40,22 +70,41 @@ async def report_threat(
     severity: str,
     threat_type: str,
     source_ip: str,
-    description: str
+    description: str,
+    storage: StorageBackend = Depends(get_storage)
 ):
     """Report a new threat"""
-    alert_id = f"threat-{len(threat_log) + 1}"
+    seq = await storage.next_id("threat")
+    now = datetime.utcnow()
     alert = ThreatAlert(
-        alert_id=alert_id,
+        alert_id=f"threat-{seq}",
         severity=severity,
         threat_type=threat_type,
         source_ip=source_ip,
-        timestamp=datetime.utcnow().isoformat(),
+        timestamp=now.isoformat(),
         description=description
     )
-    threat_log.append(alert)
+    await storage.add_threat(seq, alert.model_dump(), created_at=to_epoch(now))
+    push_hub.publish_threat(seq, alert.model_dump())
     return alert
 
 
+@router.post("/threats/{alert_id}/status")
+async def update_threat_status(
+    alert_id: str,
+    new_status: str = Query(..., alias="status", min_length=1, max_length=32),
+    storage: StorageBackend = Depends(get_storage)
+):
+    """Change a threat's status (e.g. resolved); only active threats count toward the posture"""
+    prefix, _, seq = alert_id.rpartition("-")
+    if prefix != "threat" or not seq.isdigit() or not await storage.update_threat_status(int(seq), new_status):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Threat not found"
+        )
+    return {"alert_id": alert_id, "status": new_status}
+
+
 @router.post("/scan")
 async def initiate_security_scan(scan: SecurityScan):
     """Initiate a security scan"""
@@ -71,15 +120,16 @@ async def initiate_security_scan(scan: SecurityScan):
 
 
 @router.get("/posture")
-async def security_posture():
-    """Get overall security posture"""
-    active_threats = [t for t in threat_log if (t.status if hasattr(t, 'status') else t.get('status')) == "active"]
-    critical_threats = [t for t in active_threats if (t.severity if hasattr(t, 'severity') else t.get('severity')) == "critical"]
-    
-    return {
-        "status": "monitoring",
-        "active_threats": len(active_threats),
-        "critical_threats": len(critical_threats),
-        "last_scan": datetime.utcnow().isoformat(),
-        "zero_trust_enabled": True
-    }
+async def security_posture(request: Request, storage: StorageBackend = Depends(get_storage)):
+    """Get overall security posture (ETag / If-None-Match aware)"""
+    async def build():
+        posture = {
+            "status": "monitoring",
+            "active_threats": await storage.active_threat_count(),
+            "critical_threats": await storage.active_threat_count("critical"),
+            "last_scan": datetime.utcnow().isoformat(),
+            "zero_trust_enabled": True
+        }
+        return json.dumps(posture, separators=(",", ":")).encode(), None
+
+    return await response_cache.respond(request, "posture", await storage.version("threats"), "", build)
@@ -0,0 +1,138 @@
+"""
+Real-time update streams (WebSocket and Server-Sent Events)
+"""
+import asyncio
+import json
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+
+from core.config import settings
+from core.policy import policy_engine, require_access
+from core.push import TOPICS, HubFull, Subscription, push_hub
+from core.security import require_token, verify_token
+
+router = APIRouter()
+
+# RFC 6455 close codes
+POLICY_VIOLATION = 1008
+TRY_AGAIN_LATER = 1013
+
+
+def _subscription(topics: Optional[str], node_ids: Optional[List[str]], severities: Optional[List[str]]) -> Subscription:
+    return Subscription(
+        topics=[t.strip() for t in topics.split(",") if t.strip()] if topics else TOPICS,
+        node_ids=node_ids,
+        severities=severities
+    )
+
+
+def _authorize_websocket(websocket: WebSocket) -> bool:
+    """Bearer token from the Authorization header or ?token=, then the access policy"""
+    if not settings.AUTH_ENABLED:
+        return True
+    header = websocket.headers.get("authorization", "")
+    token = header[7:] if header.lower().startswith("bearer ") else websocket.query_params.get("token")
+    if not token:
+        return False
+    try:
+        claims = verify_token(token)
+    except HTTPException:
+        return False
+    if settings.POLICY_ENABLED:
+        policy_engine.maybe_reload()
+        client = websocket.client
+        return policy_engine.decide(claims, client.host if client else None, websocket.scope["path"])
+    return True
+
+
+@router.websocket("/ws")
+async def stream_websocket(websocket: WebSocket):
+    """
+    Push updates over a WebSocket.
+
+    Query parameters as for GET /stream/events. The client may send
+    {"topics": [...], "node_ids": [...], "severities": [...]} at any time
+    to replace its subscription; it then gets a fresh snapshot.
+    """
+    if not _authorize_websocket(websocket):
+        await websocket.close(code=POLICY_VIOLATION)
+        return
+    params = websocket.query_params
+    try:
+        subscription = _subscription(
+            params.get("topics"),
+            params.getlist("node_id"),
+            params.getlist("severity")
+        )
+    except ValueError:
+        await websocket.close(code=POLICY_VIOLATION)
+        return
+    try:
+        client = push_hub.connect(subscription, snapshot=params.get("snapshot", "true").lower() != "false")
+    except HubFull:
+        await websocket.close(code=TRY_AGAIN_LATER)
+        return
+    await websocket.accept()
+
+    async def receive():
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                push_hub.resubscribe(client, Subscription.from_dict(message))
+            except (ValueError, TypeError, KeyError):
+                continue
+
+    async def send():
+        async for frame in client.frames():
+            await websocket.send_text(frame)
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        push_hub.disconnect(client)
+    # Still open if the hub dropped a slow client or is shutting down
+    try:
+        await websocket.close(code=TRY_AGAIN_LATER)
+    except (RuntimeError, WebSocketDisconnect):
+        pass
+
+
+@router.get("/events", dependencies=[Depends(require_token), Depends(require_access)])
+async def stream_events(
+    topics: Optional[str] = Query(None, description=f"Comma-separated subset of {', '.join(TOPICS)}"),
+    node_id: Optional[List[str]] = Query(None),
+    severity: Optional[List[str]] = Query(None),
+    snapshot: bool = True
+):
+    """Push updates as Server-Sent Events, one JSON frame per event"""
+    try:
+        subscription = _subscription(topics, node_id, severity)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    try:
+        client = push_hub.connect(subscription, snapshot=snapshot)
+    except HubFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"}
+        )
+
+    async def body():
+        try:
+            async for frame in client.frames(keepalive=settings.PUSH_KEEPALIVE):
+                yield ": keepalive\n\n" if frame is None else f"data: {frame}\n\n"
+        finally:
+            push_hub.disconnect(client)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
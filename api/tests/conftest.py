@@ -0,0 +1,32 @@
+"""
+Shared fixtures: run from api/ (``pytest``) or the repository root
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.storage import MemoryBackend  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(params=["memory", "redis"])
+async def storage(request):
+    """Each storage test runs against both backends (Redis via fakeredis)"""
+    if request.param == "memory":
+        yield MemoryBackend()
+        return
+    fakeredis = pytest.importorskip("fakeredis")
+    from core.redis_storage import RedisBackend
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    backend = RedisBackend(client=client, prefix="test")
+    await backend.connect()
+    yield backend
+    await client.flushall()
+    await backend.close()
@@ -0,0 +1,86 @@
+"""
+Heartbeat validation: one bad sample must not poison a node
+"""
+import json
+import time
+
+import httpx
+import pytest
+
+from core.storage import MemoryBackend, get_storage
+from main import app
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client():
+    backend = MemoryBackend()
+    app.dependency_overrides[get_storage] = lambda: backend
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+async def _register(client) -> str:
+    response = await client.post("/api/v1/nodes/register", json={"hostname": "rpi", "ip_address": "10.0.0.1"})
+    return response.json()["node_id"]
+
+
+async def _batch(client, body: str) -> httpx.Response:
+    return await client.post("/api/v1/nodes/heartbeats", content=body, headers={"content-type": "application/json"})
+
+
+@pytest.mark.parametrize("payload", [
+    '{"node_ids":["%s"],"cpu_usage":[1],"memory_usage":[1],"timestamps":[1e12]}',
+    '{"node_ids":["%s"],"cpu_usage":[1],"memory_usage":[1],"timestamps":[1.0]}',
+    '{"node_ids":["%s"],"cpu_usage":[Infinity],"memory_usage":[1]}',
+    '{"node_ids":["%s"],"cpu_usage":[1],"memory_usage":[-5000]}',
+    '{"node_ids":["%s"],"cpu_usage":[1],"memory_usage":[1],"timestamps":[NaN]}'
+])
+async def test_bad_samples_are_rejected_and_node_keeps_working(client, payload):
+    node_id = await _register(client)
+
+    assert (await _batch(client, payload % node_id)).status_code == 422
+
+    assert (await client.get("/api/v1/nodes/")).status_code == 200
+    assert (await client.get("/api/v1/intelligence/optimize")).status_code == 200
+    response = await client.post(f"/api/v1/nodes/{node_id}/heartbeat", params={"cpu_usage": 12.5, "memory_usage": 30})
+    assert response.status_code == 200
+    assert (await client.get(f"/api/v1/nodes/{node_id}")).json()["cpu_usage"] == 12.5
+
+
+async def test_non_string_node_ids_are_rejected(client):
+    response = await _batch(client, '{"node_ids":[[1]],"cpu_usage":[1],"memory_usage":[1]}')
+    assert response.status_code == 422
+
+
+async def test_single_heartbeat_rejects_out_of_range_metrics(client):
+    node_id = await _register(client)
+    response = await client.post(f"/api/v1/nodes/{node_id}/heartbeat", params={"cpu_usage": "inf", "memory_usage": 1})
+    assert response.status_code == 422
+
+
+async def test_null_metric_leaves_value_unchanged(client):
+    node_id = await _register(client)
+    body = json.dumps({"node_ids": [node_id], "cpu_usage": [None], "memory_usage": [33.0]})
+
+    response = await _batch(client, body)
+
+    assert response.status_code == 200 and response.json()["accepted"] == 1
+    node = (await client.get(f"/api/v1/nodes/{node_id}")).json()
+    assert node["cpu_usage"] == 0.0 and node["memory_usage"] == 33.0
+
+
+async def test_buffered_sample_within_max_age_is_accepted(client):
+    node_id = await _register(client)
+    body = json.dumps({
+        "node_ids": [node_id],
+        "cpu_usage": [10.0],
+        "memory_usage": [20.0],
+        "timestamps": [time.time() - 3 * 86400]
+    })
+
+    response = await _batch(client, body)
+
+    assert response.status_code == 200 and response.json()["unknown_nodes"] == []
@@ -0,0 +1,56 @@
+"""
+Event segments left behind by a stopped writer are sealed and retained
+"""
+import json
+import os
+import subprocess
+import sys
+
+from core.ingest import SegmentWriter, iter_events, iter_segments
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _group(event_type: str, count: int) -> bytes:
+    line = {"event_type": event_type, "count": count, "timestamps": [1.0] * count, "data": [{}] * count}
+    return (json.dumps(line) + "\n").encode()
+
+
+def test_recover_seals_orphaned_segment_without_its_partial_line(tmp_path):
+    orphan = tmp_path / f"events-20240101T000000-{_dead_pid()}-000001.jsonl"
+    orphan.write_bytes(_group("scan", 2) + _group("login", 1) + b'{"event_type": "tru')
+
+    SegmentWriter(tmp_path).recover()
+
+    assert [p.name for p in iter_segments(tmp_path)] == [f"{orphan.name}.gz"]
+    assert [e["event_type"] for e in iter_events(tmp_path)] == ["scan", "scan", "login"]
+
+
+def test_recover_leaves_live_writers_alone(tmp_path):
+    live = tmp_path / f"events-20240101T000000-{os.getppid()}-000001.jsonl"
+    live.write_bytes(_group("scan", 1))
+    writer = SegmentWriter(tmp_path)
+    writer.write(_group("login", 1))
+
+    writer.recover()
+
+    assert live.exists() and writer._path.exists()
+    writer.seal()
+
+
+def test_recovered_segments_count_toward_retention(tmp_path):
+    dead = _dead_pid()
+    for seq in range(3):
+        path = tmp_path / f"events-2024010{seq + 1}T000000-{dead}-{seq:06d}.jsonl"
+        path.write_bytes(os.urandom(4096).hex().encode() + b"\n")
+
+    SegmentWriter(tmp_path, max_total_bytes=12 * 1024).recover()
+
+    remaining = iter_segments(tmp_path)
+    assert len(remaining) == 2 and all(p.name.endswith(".jsonl.gz") for p in remaining)
+    assert sum(p.stat().st_size for p in remaining) <= 12 * 1024
+    assert remaining[-1].name.startswith("events-20240103")
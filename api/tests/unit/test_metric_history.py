@@ -0,0 +1,79 @@
+"""
+Metric history snapshots only come back for the store they were taken with
+"""
+import time
+
+import httpx
+import numpy as np
+import pytest
+
+from core.storage import MemoryBackend, get_storage
+from core.timeseries import MetricHistory, metric_history
+from main import app
+
+pytestmark = pytest.mark.anyio
+
+
+def _node(node_id: str) -> dict:
+    return {
+        "node_id": node_id,
+        "hostname": "rpi",
+        "ip_address": "10.0.0.1",
+        "status": "active",
+        "cpu_usage": 0.0,
+        "memory_usage": 0.0,
+        "last_heartbeat": "2024-11-08T10:00:00"
+    }
+
+
+def _history(node_ids, now) -> MetricHistory:
+    history = MetricHistory(capacity=4)
+    count = len(node_ids)
+    history.ingest(node_ids, np.full(count, 10.0), np.full(count, 20.0), np.full(count, now))
+    return history
+
+
+async def test_snapshot_from_another_store_is_not_restored(tmp_path):
+    now = time.time()
+    old = _history(["node-1"], now)
+    old.epoch = await MemoryBackend().epoch()
+    old.save(tmp_path)
+
+    # A restarted memory backend hands out node-1 again, to a new node
+    storage = MemoryBackend()
+    await storage.add_node(_node("node-1"))
+    restored = MetricHistory(capacity=4)
+    await restored.start(storage, tmp_path, 3600)
+    await restored.stop()
+
+    assert restored.query("node-1", now - 60, now + 60) is None
+
+
+async def test_restore_drops_nodes_storage_no_longer_has(tmp_path):
+    now = time.time()
+    storage = MemoryBackend()
+    await storage.add_node(_node("node-2"))
+    old = _history(["node-1", "node-2"], now)
+    old.epoch = await storage.epoch()
+    old.save(tmp_path)
+
+    restored = MetricHistory(capacity=4)
+    await restored.start(storage, tmp_path, 3600)
+    await restored.stop()
+
+    assert restored.query("node-1", now - 60, now + 60) is None
+    assert len(restored.query("node-2", now - 60, now + 60)["points"]) == 1
+
+
+async def test_metrics_endpoint_checks_storage_before_history():
+    now = time.time()
+    metric_history.ingest(["node-404"], np.array([10.0]), np.array([20.0]), np.array([now]))
+    app.dependency_overrides[get_storage] = MemoryBackend
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/api/v1/nodes/node-404/metrics")
+    finally:
+        app.dependency_overrides.clear()
+        metric_history.forget("node-404")
+
+    assert response.status_code == 404
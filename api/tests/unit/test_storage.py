@@ -0,0 +1,208 @@
+"""
+Behaviour shared by every storage backend
+"""
+import time
+
+import numpy as np
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def _node(node_id: str, hostname: str = "rpi", ip_address: str = "10.0.0.1") -> dict:
+    return {
+        "node_id": node_id,
+        "hostname": hostname,
+        "ip_address": ip_address,
+        "status": "active",
+        "cpu_usage": 0.0,
+        "memory_usage": 0.0,
+        "last_heartbeat": "2024-11-08T10:00:00"
+    }
+
+
+def _alert(seq: int, severity: str = "low", status: str = "active") -> dict:
+    return {
+        "alert_id": f"threat-{seq}",
+        "severity": severity,
+        "threat_type": "intrusion",
+        "source_ip": "203.0.113.7",
+        "timestamp": "2024-11-08T10:00:00",
+        "description": "test",
+        "status": status
+    }
+
+
+async def _heartbeat(storage, node_ids, cpu, memory, ts=None):
+    count = len(node_ids)
+    return await storage.record_heartbeats(
+        node_ids,
+        np.asarray(cpu, dtype=np.float64),
+        np.asarray(memory, dtype=np.float64),
+        np.full(count, time.time() if ts is None else ts)
+    )
+
+
+async def test_add_list_remove_nodes(storage):
+    assert await storage.add_node(_node("node-1", "a"))
+    assert await storage.add_node(_node("node-2", "b"))
+
+    assert await storage.count_nodes() == 2
+    assert {n["node_id"] for n in await storage.list_nodes()} == {"node-1", "node-2"}
+    node = await storage.get_node("node-1")
+    assert node["hostname"] == "a" and node["status"] == "active"
+
+    assert await storage.delete_node("node-1")
+    assert not await storage.delete_node("node-1")
+    assert await storage.get_node("node-1") is None
+    assert [n["node_id"] for n in await storage.list_nodes()] == ["node-2"]
+
+
+async def test_add_node_respects_limit(storage):
+    assert await storage.add_node(_node("node-1"), limit=1)
+    assert not await storage.add_node(_node("node-2"), limit=1)
+    # Re-registering an existing node is not a new node
+    assert await storage.add_node(_node("node-1"), limit=1)
+    assert await storage.count_nodes() == 1
+
+
+async def test_record_heartbeats_reports_unknown_ids(storage):
+    await storage.add_node(_node("node-1"))
+    unknown = await _heartbeat(storage, ["node-1", "ghost"], [42.0, 1.0], [55.0, 1.0])
+
+    assert unknown == ["ghost"]
+    node = await storage.get_node("node-1")
+    assert node["cpu_usage"] == 42.0 and node["memory_usage"] == 55.0
+    assert await storage.get_node("ghost") is None
+
+
+async def test_heartbeat_nan_keeps_value_and_older_sample_is_ignored(storage):
+    await storage.add_node(_node("node-1"))
+    now = time.time()
+    await _heartbeat(storage, ["node-1"], [40.0], [50.0], ts=now)
+    await _heartbeat(storage, ["node-1"], [float("nan")], [60.0], ts=now + 1)
+    await _heartbeat(storage, ["node-1"], [99.0], [99.0], ts=now - 60)
+
+    node = await storage.get_node("node-1")
+    assert node["cpu_usage"] == 40.0 and node["memory_usage"] == 60.0
+
+
+async def test_set_node_status(storage):
+    await storage.add_node(_node("node-1"))
+    updated, missing = await storage.set_node_status(["node-1", "ghost"], "offline")
+
+    assert updated == ["node-1"] and missing == ["ghost"]
+    assert (await storage.get_node("node-1"))["status"] == "offline"
+    columns = await storage.node_columns()
+    assert columns["node_id"] == ["node-1"] and columns["status"].tolist() == [2]
+
+
+async def test_threat_cursor_paging(storage):
+    for seq in range(1, 6):
+        await storage.add_threat(seq, _alert(seq), created_at=time.time())
+
+    pages = []
+    cursor = 0
+    while True:
+        alerts, cursor = await storage.query_threats(cursor=cursor, limit=2)
+        pages.append([a["alert_id"] for a in alerts])
+        if cursor is None:
+            break
+    assert pages == [["threat-1", "threat-2"], ["threat-3", "threat-4"], ["threat-5"]]
+
+
+async def test_threat_filters_and_counts(storage):
+    for seq, severity in enumerate(("low", "critical", "low", "critical"), start=1):
+        await storage.add_threat(seq, _alert(seq, severity), created_at=time.time())
+
+    alerts, next_cursor = await storage.query_threats(severity="critical")
+    assert [a["alert_id"] for a in alerts] == ["threat-2", "threat-4"] and next_cursor is None
+    assert await storage.query_threats(severity="medium") == ([], None)
+    assert await storage.active_threat_count() == 4
+    assert await storage.active_threat_count("critical") == 2
+    assert await storage.count_threats() == 4
+
+
+async def test_threat_store_evicts_beyond_cap(storage):
+    if hasattr(storage, "threats"):
+        storage.threats.max_alerts = 3
+    else:
+        storage.max_alerts = 3
+    for seq in range(1, 6):
+        await storage.add_threat(seq, _alert(seq), created_at=time.time())
+
+    alerts, _ = await storage.query_threats()
+    assert [a["alert_id"] for a in alerts] == ["threat-3", "threat-4", "threat-5"]
+    assert await storage.active_threat_count() == 3
+
+
+async def test_version_bumps_on_each_change(storage):
+    nodes = await storage.version("nodes")
+    threats = await storage.version("threats")
+    assert await storage.version("nodes") == nodes
+
+    await storage.add_node(_node("node-1"))
+    after_add = await storage.version("nodes")
+    assert after_add != nodes
+
+    await _heartbeat(storage, ["node-1"], [10.0], [10.0])
+    after_heartbeat = await storage.version("nodes")
+    assert after_heartbeat != after_add
+
+    await storage.delete_node("node-1")
+    assert await storage.version("nodes") != after_heartbeat
+    assert await storage.version("threats") == threats
+
+    await storage.add_threat(1, _alert(1), created_at=time.time())
+    assert await storage.version("threats") != threats
+
+
+async def test_versions_differ_between_store_instances(storage):
+    """A fresh store (restart, flushed Redis) must not reuse old versions"""
+    from core.storage import MemoryBackend
+
+    assert await MemoryBackend().version("nodes") != await storage.version("nodes")
+    if not hasattr(storage, "client"):
+        return
+    before = await storage.version("nodes")
+    await storage.client.flushall()
+    assert await storage.version("nodes") != before
+
+
+async def test_epoch_is_the_version_prefix(storage):
+    epoch = await storage.epoch()
+    await storage.add_node(_node("node-1"))
+    assert (await storage.version("nodes")).startswith(f"{epoch}.")
+    assert await storage.epoch() == epoch
+
+
+async def test_update_threat_status(storage):
+    for seq, severity in enumerate(("critical", "critical", "low"), start=1):
+        await storage.add_threat(seq, _alert(seq, severity), created_at=time.time())
+    version = await storage.version("threats")
+
+    assert await storage.update_threat_status(2, "resolved")
+    assert await storage.version("threats") != version
+    alerts, _ = await storage.query_threats(status="resolved")
+    assert [a["alert_id"] for a in alerts] == ["threat-2"] and alerts[0]["status"] == "resolved"
+    alerts, _ = await storage.query_threats(status="active")
+    assert [a["alert_id"] for a in alerts] == ["threat-1", "threat-3"]
+    assert await storage.active_threat_count() == 2
+    assert await storage.active_threat_count("critical") == 1
+
+    assert await storage.update_threat_status(2, "active")
+    assert await storage.active_threat_count("critical") == 2
+    assert not await storage.update_threat_status(99, "resolved")
+
+
+async def test_update_threat_status_after_eviction(storage):
+    if hasattr(storage, "threats"):
+        storage.threats.max_alerts = 2
+    else:
+        storage.max_alerts = 2
+    for seq in range(1, 4):
+        await storage.add_threat(seq, _alert(seq), created_at=time.time())
+
+    assert not await storage.update_threat_status(1, "resolved")
+    assert await storage.query_threats(status="resolved") == ([], None)
+    assert await storage.active_threat_count() == 2
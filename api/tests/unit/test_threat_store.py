@@ -0,0 +1,63 @@
+"""
+ThreatStore indexes under status changes and eviction, and the status endpoint
+"""
+import httpx
+import pytest
+
+from core.storage import MemoryBackend, get_storage
+from core.threat_store import ThreatStore
+from main import app
+
+
+def _fill(store: ThreatStore, seqs):
+    for seq in seqs:
+        store.add(seq, {"alert_id": f"threat-{seq}", "severity": "low", "status": "active"})
+
+
+def test_update_status_out_of_order_survives_eviction():
+    store = ThreatStore(max_alerts=3)
+    _fill(store, (1, 2, 3))
+    assert store.update_status(3, "resolved")
+    assert store.update_status(2, "resolved")
+    _fill(store, (4, 5))
+
+    alerts, next_cursor = store.query(status="resolved")
+    assert [a["alert_id"] for a in alerts] == ["threat-3"] and next_cursor is None
+    assert store.counts("status") == {"active": 2, "resolved": 1}
+    assert store.active_count() == 2
+
+
+def test_update_status_keeps_index_order_for_paging():
+    store = ThreatStore(max_alerts=10)
+    _fill(store, range(1, 6))
+    for seq in (5, 1, 3):
+        store.update_status(seq, "resolved")
+
+    first, cursor = store.query(status="resolved", limit=2)
+    rest, end = store.query(status="resolved", cursor=cursor, limit=2)
+    assert [a["alert_id"] for a in first + rest] == ["threat-1", "threat-3", "threat-5"]
+    assert end is None
+
+
+@pytest.mark.anyio
+async def test_status_endpoint_resolves_threat():
+    backend = MemoryBackend()
+    app.dependency_overrides[get_storage] = lambda: backend
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            alert_id = (await client.post("/api/v1/security/threats", params={
+                "severity": "critical",
+                "threat_type": "intrusion",
+                "source_ip": "203.0.113.7",
+                "description": "test"
+            })).json()["alert_id"]
+
+            response = await client.post(f"/api/v1/security/threats/{alert_id}/status", params={"status": "resolved"})
+            posture = (await client.get("/api/v1/security/posture")).json()
+            missing = await client.post("/api/v1/security/threats/threat-99/status", params={"status": "resolved"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200 and response.json() == {"alert_id": alert_id, "status": "resolved"}
+    assert posture["active_threats"] == 0 and posture["critical_threats"] == 0
+    assert missing.status_code == 404
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark full vs cached vs 304 responses for polled list endpoints
+
+Runs the API in-process over an ASGI transport (no sockets) against the
+in-memory backend with a 10k node fleet and a full threat log, then polls
+GET /nodes/, /security/threats and /security/posture three ways:
+  changed   a write lands between polls, so every poll rebuilds the body
+  cached    nothing changed, the stored bytes are sent again
+  304       nothing changed and the client sends If-None-Match
+
+Usage:
+    python benchmarks/bench_conditional_get.py [--nodes 10000] [--polls 50]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+# Registration is capped at MAX_EDGE_NODES; lift it for the fleet
+os.environ.setdefault("MAX_EDGE_NODES", "0")
+
+from main import app  # noqa: E402
+from core.storage import MemoryBackend, get_storage  # noqa: E402
+
+
+async def poll(client, path, params, polls, headers=None, between=None):
+    elapsed = 0.0
+    size = 0
+    for _ in range(polls):
+        if between is not None:
+            await between()
+        start = time.perf_counter()
+        response = await client.get(path, params=params, headers=headers)
+        elapsed += time.perf_counter() - start
+        size = len(response.content)
+    return elapsed / polls, size, response
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=10_000)
+    parser.add_argument("--threats", type=int, default=1_000)
+    parser.add_argument("--polls", type=int, default=50)
+    args = parser.parse_args()
+
+    backend = MemoryBackend()
+    app.dependency_overrides[get_storage] = lambda: backend
+    node_ids = [f"node-{i}" for i in range(args.nodes)]
+    for i, node_id in enumerate(node_ids):
+        await backend.add_node({
+            "node_id": node_id,
+            "hostname": f"rpi-{i}",
+            "ip_address": f"10.{i // 65536}.{i // 256 % 256}.{i % 256}",
+            "last_heartbeat": "2024-11-08T10:00:00"
+        })
+    rng = np.random.default_rng(1)
+    await backend.record_heartbeats(
+        node_ids,
+        rng.uniform(0, 100, args.nodes),
+        rng.uniform(0, 100, args.nodes),
+        np.full(args.nodes, time.time())
+    )
+    for seq in range(1, args.threats + 1):
+        await backend.add_threat(seq, {
+            "alert_id": f"threat-{seq}",
+            "severity": ("low", "medium", "high", "critical")[seq % 4],
+            "threat_type": "intrusion",
+            "source_ip": f"203.0.113.{seq % 256}",
+            "timestamp": "2024-11-08T10:00:00",
+            "description": "benchmark",
+            "status": "active"
+        }, created_at=time.time())
+
+    async def heartbeat():
+        await backend.record_heartbeats(node_ids[:1], np.array([50.0]), np.array([50.0]), np.array([time.time()]))
+
+    threat_seq = args.threats
+
+    async def threat():
+        nonlocal threat_seq
+        threat_seq += 1
+        await backend.add_threat(threat_seq, {
+            "alert_id": f"threat-{threat_seq}", "severity": "low", "threat_type": "intrusion",
+            "source_ip": "203.0.113.1", "timestamp": "2024-11-08T10:00:00",
+            "description": "benchmark", "status": "active"
+        }, created_at=time.time())
+
+    endpoints = (
+        ("GET /nodes/", "/api/v1/nodes/", None, heartbeat),
+        ("GET /security/threats", "/api/v1/security/threats", {"limit": 1000}, threat),
+        ("GET /security/posture", "/api/v1/security/posture", None, threat)
+    )
+    print(f"{args.nodes} nodes, {args.threats} threats, {args.polls} polls each")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, path, params, change in endpoints:
+            changed, size, _ = await poll(client, path, params, args.polls, between=change)
+            cached, _, response = await poll(client, path, params, args.polls)
+            etag = {"If-None-Match": response.headers["etag"]}
+            not_modified, _, response = await poll(client, path, params, args.polls, headers=etag)
+            assert response.status_code == 304
+            print(
+                f"  {label:<22} changed {changed * 1e3:8.2f} ms  cached {cached * 1e3:7.2f} ms  "
+                f"304 {not_modified * 1e3:6.2f} ms  ({size / 1024:,.0f} KiB body)"
+            )
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Backtest the threat forecaster on synthetic and replayed threat streams
+
+Walks the stream one bucket at a time. Before a bucket's threats are
+observed, the forecaster predicts its count per type; before each threat,
+it predicts that threat's type. Counts are scored by MAE/RMSE against
+last-bucket, same-bucket-last-season and running-mean baselines, and
+types by top-1 accuracy against majority-so-far and repeat-last. Also
+reports the update cost per observed threat and the cost of a refresh.
+
+The synthetic stream draws Poisson counts per type with a daily cycle, a
+linear trend and "sticky" runs of the same type. A replayed stream is a
+JSON-lines file with threat_type and timestamp (ISO or epoch seconds) per
+line, such as pages of GET /api/v1/security/threats.
+
+Usage (from the repository root):
+    python benchmarks/bench_forecasting.py [--days 28] [--types 8] [--rate 20] [--replay threats.jsonl]
+"""
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+
+from core.forecasting import ThreatForecaster, _alert_time  # noqa: E402
+
+
+def synthetic(days, type_count, rate, stickiness, bucket_seconds, seed):
+    """Time-ordered (timestamp, threat_type) pairs"""
+    rng = np.random.default_rng(seed)
+    buckets = int(days * 86400 // bucket_seconds)
+    hours = np.arange(buckets) * bucket_seconds / 3600
+    base = rng.uniform(0.2, 1.8, type_count) * rate
+    phase = rng.uniform(0, 2 * np.pi, type_count)
+    growth = rng.uniform(-0.5, 1.0, type_count)
+    rates = (
+        base[:, None]
+        * (1 + 0.6 * np.sin(2 * np.pi * hours[None, :] / 24 + phase[:, None]))
+        * (1 + growth[:, None] * hours[None, :] / hours[-1])
+    )
+    counts = rng.poisson(np.maximum(rates, 0))
+    names = [f"type-{i}" for i in range(type_count)]
+    start = time.time() - buckets * bucket_seconds
+    events = []
+    previous = None
+    for b in range(buckets):
+        total = int(counts[:, b].sum())
+        if not total:
+            continue
+        share = counts[:, b] / total
+        stamps = np.sort(rng.uniform(0, bucket_seconds, total)) + start + b * bucket_seconds
+        draws = rng.choice(type_count, size=total, p=share)
+        sticky = rng.random(total) < stickiness
+        for ts, draw, repeat in zip(stamps.tolist(), draws.tolist(), sticky.tolist()):
+            previous = previous if repeat and previous is not None else draw
+            events.append((ts, names[previous]))
+    return events
+
+
+def replayed(path):
+    events = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            threat = json.loads(line)
+            stamp = threat.get("timestamp")
+            ts = float(stamp) if isinstance(stamp, (int, float)) else _alert_time(threat)
+            events.append((ts, threat.get("threat_type") or "unknown"))
+    events.sort(key=lambda e: e[0])
+    return events
+
+
+def backtest(label, events, bucket_seconds, season, warmup):
+    if not events:
+        print(f"{label}: no threats")
+        return
+    names = sorted({t for _, t in events})
+    code = {name: i for i, name in enumerate(names)}
+    first = int(events[0][0] // bucket_seconds)
+    last = int(events[-1][0] // bucket_seconds)
+    actual = np.zeros((len(names), last - first + 1))
+    for ts, t in events:
+        actual[code[t], int(ts // bucket_seconds) - first] += 1
+
+    forecaster = ThreatForecaster(bucket_seconds=bucket_seconds, season_length=season, horizon=season or 24)
+    predicted = np.zeros_like(actual)
+    type_hits = majority_hits = repeat_hits = scored = 0
+    seen = Counter()
+    majority = previous = None
+    observe = close = 0.0
+    i = 0
+    for b in range(actual.shape[1]):
+        start = time.perf_counter()
+        forecaster.advance((first + b) * bucket_seconds)
+        close += time.perf_counter() - start
+        order = [code[t] for t in forecaster.types]
+        predicted[order, b] = forecaster.predict(1)[:, 0]
+        while i < len(events) and int(events[i][0] // bucket_seconds) == first + b:
+            ts, t = events[i]
+            if b >= warmup:
+                scored += 1
+                type_hits += forecaster.next_type()[0] == t
+                majority_hits += majority == t
+                repeat_hits += previous == t
+            start = time.perf_counter()
+            forecaster.observe(t, ts)
+            observe += time.perf_counter() - start
+            seen[t] += 1
+            if majority is None or seen[t] > seen[majority]:
+                majority = t
+            previous = t
+            i += 1
+
+    scored_buckets = slice(max(warmup, season, 1), None)
+    target = actual[:, scored_buckets]
+    baselines = {
+        "holt-winters": predicted[:, scored_buckets],
+        "last bucket": np.roll(actual, 1, axis=1)[:, scored_buckets],
+        "same bucket last season": np.roll(actual, season or 1, axis=1)[:, scored_buckets],
+        "running mean": (np.cumsum(actual, axis=1) / np.arange(1, actual.shape[1] + 1))[:, :-1][:, max(warmup, season, 1) - 1:]
+    }
+    print(
+        f"{label}: {len(events)} threats, {len(names)} types, {actual.shape[1]} buckets of {bucket_seconds}s "
+        f"(first {scored_buckets.start} not scored)"
+    )
+    if target.size:
+        for name, forecast in baselines.items():
+            error = forecast - target
+            print(
+                f"  counts {name:<24} MAE {np.abs(error).mean():7.2f}  RMSE {np.sqrt((error ** 2).mean()):7.2f}"
+                f"  per bucket and type"
+            )
+    if scored:
+        print(
+            f"  next type top-1    forecaster {type_hits / scored:6.1%}  majority {majority_hits / scored:6.1%}"
+            f"  repeat last {repeat_hits / scored:6.1%}"
+        )
+    print(
+        f"  update cost        {observe / len(events) * 1e6:6.2f} us per threat, "
+        f"{close / actual.shape[1] * 1e6:6.1f} us per bucket close"
+    )
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        forecaster.refresh(events[-1][0])
+    refresh = (time.perf_counter() - start) / rounds
+    start = time.perf_counter()
+    for _ in range(rounds * 100):
+        forecaster.forecast()
+    served = (time.perf_counter() - start) / (rounds * 100)
+    print(f"  refresh            {refresh * 1e3:6.2f} ms, cached forecast {served * 1e6:5.2f} us per request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=float, default=28)
+    parser.add_argument("--types", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=20, help="mean threats per type per hour")
+    parser.add_argument("--stickiness", type=float, default=0.5, help="chance a threat repeats the previous type")
+    parser.add_argument("--bucket", type=int, default=3600, help="bucket width in seconds")
+    parser.add_argument("--season", type=int, default=24, help="buckets per seasonal cycle")
+    parser.add_argument("--warmup", type=int, default=48, help="buckets before scoring starts")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--replay", help="JSON-lines file of threats to replay instead")
+    args = parser.parse_args()
+
+    if args.replay:
+        backtest(f"replay {args.replay}", replayed(args.replay), args.bucket, args.season, args.warmup)
+    else:
+        events = synthetic(args.days, args.types, args.rate, args.stickiness, args.bucket, args.seed)
+        backtest("synthetic", events, args.bucket, args.season, args.warmup)
+
+
+if __name__ == "__main__":
+    main()
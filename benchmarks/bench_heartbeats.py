@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-request vs batched heartbeat ingestion
+
+Runs the API in-process over an ASGI transport (no sockets) against the
+in-memory backend and reports heartbeats/sec for 1k and 10k nodes.
+
+Usage:
+    python benchmarks/bench_heartbeats.py
+"""
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import msgpack
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+# Registration is capped at MAX_EDGE_NODES; lift it for the largest fleet
+os.environ.setdefault("MAX_EDGE_NODES", "0")
+
+from main import app  # noqa: E402
+from core.storage import MemoryBackend, get_storage  # noqa: E402
+
+FLEET_SIZES = (1_000, 10_000)
+
+
+async def register_fleet(client: httpx.AsyncClient, size: int):
+    node_ids = []
+    for i in range(size):
+        response = await client.post(
+            "/api/v1/nodes/register",
+            json={"hostname": f"rpi-{i}", "ip_address": f"10.{i // 65536}.{i // 256 % 256}.{i % 256}"}
+        )
+        node_ids.append(response.json()["node_id"])
+    return node_ids
+
+
+async def per_request(client: httpx.AsyncClient, node_ids):
+    for node_id in node_ids:
+        await client.post(
+            f"/api/v1/nodes/{node_id}/heartbeat",
+            params={"cpu_usage": 42.0, "memory_usage": 55.0}
+        )
+
+
+async def batched_json(client: httpx.AsyncClient, node_ids):
+    await client.post("/api/v1/nodes/heartbeats", json={
+        "node_ids": node_ids,
+        "cpu_usage": [42.0] * len(node_ids),
+        "memory_usage": [55.0] * len(node_ids)
+    })
+
+
+async def batched_msgpack(client: httpx.AsyncClient, node_ids):
+    body = msgpack.packb({
+        "node_ids": node_ids,
+        "cpu_usage": [42.0] * len(node_ids),
+        "memory_usage": [55.0] * len(node_ids)
+    })
+    await client.post(
+        "/api/v1/nodes/heartbeats",
+        content=body,
+        headers={"content-type": "application/msgpack"}
+    )
+
+
+async def main():
+    transport = httpx.ASGITransport(app=app)
+    for size in FLEET_SIZES:
+        backend = MemoryBackend()
+        app.dependency_overrides[get_storage] = lambda: backend
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            node_ids = await register_fleet(client, size)
+            print(f"\n{size} nodes")
+            for name, fn in (
+                ("per-request", per_request),
+                ("batched json", batched_json),
+                ("batched msgpack", batched_msgpack)
+            ):
+                start = time.perf_counter()
+                await fn(client, node_ids)
+                elapsed = time.perf_counter() - start
+                print(f"  {name:<16} {elapsed * 1000:10.1f} ms  {size / elapsed:14,.0f} heartbeats/s")
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark metric history ingest, range queries and snapshot save/restore
+
+Usage (from the repository root):
+    python benchmarks/bench_metric_history.py [--nodes 10000] [--hours 2] [--interval 30]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+
+from core.timeseries import MetricHistory  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=10_000)
+    parser.add_argument("--hours", type=float, default=2)
+    parser.add_argument("--interval", type=int, default=30)
+    args = parser.parse_args()
+
+    history = MetricHistory(capacity=args.nodes)
+    node_ids = [f"node-{i}" for i in range(args.nodes)]
+    rng = np.random.default_rng(5)
+    batches = int(args.hours * 3600 / args.interval)
+    start_ts = time.time() - args.hours * 3600
+    print(
+        f"{args.nodes} nodes, {batches} heartbeat batches, "
+        f"{history.bytes_per_node / 1024:.1f} KiB per node ({history.bytes_per_node * args.nodes / 2**20:.0f} MiB)"
+    )
+
+    start = time.perf_counter()
+    for b in range(batches):
+        history.ingest(
+            node_ids,
+            rng.uniform(0, 100, args.nodes),
+            rng.uniform(0, 100, args.nodes),
+            np.full(args.nodes, start_ts + b * args.interval)
+        )
+    elapsed = time.perf_counter() - start
+    samples = batches * args.nodes
+    print(f"  ingest            {samples / elapsed:14,.0f} samples/s  ({elapsed / batches * 1e3:6.1f} ms per batch)")
+
+    end_ts = start_ts + args.hours * 3600
+    for step in (None, 60, 300, 3600):
+        start = time.perf_counter()
+        rounds = 200
+        for i in range(rounds):
+            result = history.query(node_ids[i % args.nodes], start_ts, end_ts, step)
+        elapsed = time.perf_counter() - start
+        print(
+            f"  query step={str(step):<5} {elapsed / rounds * 1e3:8.2f} ms  "
+            f"resolution={result['resolution']} points={len(result['points'])}"
+        )
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        meta, arrays = history.snapshot()
+        copied = time.perf_counter() - start
+        history.write_snapshot(directory, meta, arrays)
+        written = time.perf_counter() - start
+        restored = MetricHistory(capacity=1)
+        start = time.perf_counter()
+        restored.load(directory)
+        loaded = time.perf_counter() - start
+        print(
+            f"  snapshot          copy {copied * 1e3:.0f} ms, write {written * 1e3:.0f} ms, "
+            f"mmap restore {loaded * 1e3:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
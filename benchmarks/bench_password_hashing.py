@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark event loop latency while concurrent logins verify bcrypt hashes
+
+A ticker coroutine sleeps 10ms at a time and records how late it wakes
+up, while --logins coroutines each verify a password, either inline on
+the loop or through the hashing pool. Lateness is what every other
+request on the worker would have waited.
+
+Usage (from the repository root):
+    python benchmarks/bench_password_hashing.py [--logins 16] [--rounds 10] [--workers 2]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+
+from core.passwords import HasherBusy, PasswordHasher, make_context  # noqa: E402
+
+TICK = 0.01
+
+
+async def ticker(lags, done):
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run(name, login, logins):
+    lags, done = [], asyncio.Event()
+    task = asyncio.create_task(ticker(lags, done))
+    await asyncio.sleep(TICK * 3)
+    lags.clear()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    done.set()
+    await task
+    lags.sort()
+    ok = sum(1 for r in results if r is True)
+    busy = sum(1 for r in results if isinstance(r, HasherBusy))
+    p50 = lags[len(lags) // 2] if lags else 0.0
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0
+    worst = lags[-1] if lags else 0.0
+    print(
+        f"  {name:<18} {ok / elapsed:8.1f} logins/s  loop lag p50 {p50 * 1e3:7.1f}ms  "
+        f"p99 {p99 * 1e3:7.1f}ms  max {worst * 1e3:7.1f}ms  ok={ok} busy={busy}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    context = make_context(args.rounds)
+    hashed = context.hash("correct horse battery staple")
+    print(f"bcrypt rounds={args.rounds}, {args.logins} concurrent logins")
+
+    async def inline():
+        return context.verify("correct horse battery staple", hashed)
+
+    await run("inline", inline, args.logins)
+
+    for kind in ("thread", "process"):
+        hasher = PasswordHasher(
+            workers=args.workers, max_pending=args.logins, executor=kind, rounds=args.rounds
+        )
+        await hasher.start()
+
+        async def pooled():
+            valid, _ = await hasher.verify_and_update("correct horse battery staple", hashed)
+            return valid
+
+        await run(f"{kind} pool", pooled, args.logins)
+        await hasher.stop()
+
+    hasher = PasswordHasher(workers=args.workers, max_pending=args.workers, rounds=args.rounds)
+    await hasher.start()
+
+    async def capped():
+        return await hasher.verify("correct horse battery staple", hashed)
+
+    await run("thread, capped", capped, args.logins)
+    await hasher.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark access policy decisions with and without the decision cache
+
+Usage (from the repository root):
+    python benchmarks/bench_policy.py [--rules 50] [--principals 1000] [--rounds 20]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+
+from core.policy import PolicyEngine  # noqa: E402
+
+ENDPOINTS = [
+    "/api/v1/nodes/heartbeat/batch",
+    "/api/v1/nodes/node-17",
+    "/api/v1/security/threats",
+    "/api/v1/intelligence/learn/batch",
+    "/api/v1/intelligence/anomalies"
+]
+
+
+def make_rules(count):
+    rng = random.Random(7)
+    rules = [
+        {"name": "edge", "effect": "allow", "sources": ["10.0.0.0/8"],
+         "endpoints": ["/api/v1/nodes", "/api/v1/intelligence/learn"], "claims": {"role": "edge"}},
+        {"name": "operators", "effect": "allow", "endpoints": ["/api/v1"], "claims": {"role": ["admin", "operator"]}}
+    ]
+    for i in range(count - len(rules)):
+        rules.append({
+            "name": f"deny-{i}",
+            "effect": "deny",
+            "sources": [f"192.0.{rng.randrange(256)}.{rng.randrange(256)}/32", f"2001:db8:{i:x}::/48"],
+            "endpoints": [rng.choice(ENDPOINTS)]
+        })
+    return rules
+
+
+def report(name, count, elapsed):
+    print(f"  {name:<24} {count / elapsed:14,.0f} decisions/s  ({elapsed / count * 1e6:7.2f} us each)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rules", type=int, default=50)
+    parser.add_argument("--principals", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    requests = [
+        (
+            {"sub": f"node-{i}", "role": rng.choice(["edge", "operator", "guest"])},
+            f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+            rng.choice(ENDPOINTS)
+        )
+        for i in range(args.principals)
+    ]
+    rules = make_rules(args.rules)
+    total = args.principals * args.rounds
+
+    engine = PolicyEngine(rules)
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for claims, ip, endpoint in requests:
+            engine.evaluate(claims, ip, endpoint)
+    report("evaluate (uncached)", total, time.perf_counter() - start)
+
+    engine = PolicyEngine(rules, cache_size=args.principals)
+    for claims, ip, endpoint in requests:
+        engine.decide(claims, ip, endpoint)
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for claims, ip, endpoint in requests:
+            engine.decide(claims, ip, endpoint)
+    report("decide, cache hit", total, time.perf_counter() - start)
+    allowed = sum(engine.decide(*r) for r in requests)
+    print(f"  rules={len(engine)} allowed={allowed}/{len(requests)} hits={engine.hits} misses={engine.misses}")
+
+
+if __name__ == "__main__":
+    main()
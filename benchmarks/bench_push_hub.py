@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark push hub fan-out to thousands of connected clients
+
+Each tick publishes a heartbeat batch from the whole fleet plus a few
+threats, then flushes to every client. Most clients watch everything,
+the rest follow a few nodes or critical threats. The hub serializes
+each change once and each distinct subscription once; the naive figure
+serializes the full update per client.
+
+Usage (from the repository root):
+    python benchmarks/bench_push_hub.py [--nodes 10000] [--clients 1000 5000] [--ticks 5]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+
+from core.push import PushHub, Subscription  # noqa: E402
+
+
+def subscriptions(count, node_ids, rng):
+    subs = []
+    for i in range(count):
+        kind = i % 10
+        if kind < 7:
+            subs.append(Subscription())
+        elif kind < 9:
+            subs.append(Subscription(topics=["heartbeats", "nodes"], node_ids=rng.sample(node_ids, 5)))
+        else:
+            subs.append(Subscription(topics=["threats"], severities=["critical"]))
+    return subs
+
+
+def publish(hub, node_ids, tick):
+    count = len(node_ids)
+    hub.ingest(node_ids, np.random.rand(count) * 100, np.random.rand(count) * 100, np.full(count, time.time()))
+    for i in range(5):
+        seq = tick * 5 + i
+        hub.publish_threat(seq, {"alert_id": f"threat-{seq}", "severity": "critical" if i == 0 else "low"})
+
+
+def drain(clients):
+    for client in clients:
+        client.queue.clear()
+
+
+async def bench(node_count, client_count, ticks):
+    rng = random.Random(3)
+    node_ids = [f"node-{i}" for i in range(node_count)]
+    hub = PushHub(queue_size=8)
+    clients = [hub.connect(s, snapshot=False) for s in subscriptions(client_count, node_ids, rng)]
+
+    ingest = flush = 0.0
+    for tick in range(ticks):
+        start = time.perf_counter()
+        publish(hub, node_ids, tick)
+        ingest += time.perf_counter() - start
+        start = time.perf_counter()
+        await hub.flush()
+        flush += time.perf_counter() - start
+        drain(clients)
+    print(
+        f"  {client_count:>5} clients  ingest {ingest / ticks * 1e3:7.1f}ms/tick  "
+        f"flush {flush / ticks * 1e3:7.1f}ms/tick  frames={hub.frames_sent}"
+    )
+
+    # Same work serializing the whole update for each client
+    sample = {
+        "heartbeats": [
+            {"node_id": n, "cpu_usage": 1.0, "memory_usage": 2.0, "timestamp": "2024-01-01T00:00:00"}
+            for n in node_ids
+        ]
+    }
+    start = time.perf_counter()
+    naive_clients = min(client_count, 50)
+    for _ in range(naive_clients):
+        json.dumps(sample)
+    per_client = (time.perf_counter() - start) / naive_clients
+    print(f"  {'':>5}          naive per-client serialization ~{per_client * client_count * 1e3:9.1f}ms/tick")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=10_000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1_000, 5_000])
+    parser.add_argument("--ticks", type=int, default=5)
+    args = parser.parse_args()
+    print(f"{args.nodes} nodes heartbeating every tick")
+    for count in args.clients:
+        asyncio.run(bench(args.nodes, count, args.ticks))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark the load rebalancing planner on a large fleet
+
+Loads are skewed so a share of nodes sit above the high watermark and
+another share idle below the low one. Times the vectorised solver, a
+full plan (solve plus move list), a cached plan lookup, and a naive
+heap-based greedy that pairs the hottest source with the idlest receiver
+one move at a time.
+
+Usage (from the repository root):
+    python benchmarks/bench_rebalance.py [--nodes 10000] [--overloaded 0.1] [--idle 0.3]
+"""
+import argparse
+import asyncio
+import heapq
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+
+from core.node_store import NodeMetricStore  # noqa: E402
+from core.rebalance import LoadRebalancer, solve  # noqa: E402
+
+
+class Storage:
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    async def node_columns(self):
+        return self.nodes.columns()
+
+
+def fleet(count, overloaded, idle, rng):
+    nodes = NodeMetricStore(capacity=count)
+    for i in range(count):
+        nodes.add(f"node-{i}", f"edge-{i}", f"10.0.{i // 256}.{i % 256}", 0.0)
+    cpu = rng.uniform(35, 75, count)
+    hot = rng.random(count) < overloaded
+    cold = ~hot & (rng.random(count) < idle / (1 - overloaded))
+    cpu[hot] = rng.uniform(82, 100, hot.sum())
+    cpu[cold] = rng.uniform(0, 28, cold.sum())
+    memory = np.clip(cpu * rng.uniform(0.5, 1.1, count), 0, 100)
+    nodes.ingest(np.arange(count), cpu.astype(np.float32), memory.astype(np.float32), np.full(count, time.time()))
+    return nodes
+
+
+def naive(load, high, low, fill):
+    sources = [(-x, i) for i, x in enumerate(load) if x > high]
+    receivers = [(x, i) for i, x in enumerate(load) if x < low]
+    heapq.heapify(sources)
+    heapq.heapify(receivers)
+    moves = []
+    while sources and receivers:
+        negative, s = heapq.heappop(sources)
+        level, r = heapq.heappop(receivers)
+        amount = min(-negative - fill, fill - level)
+        moves.append((s, r, amount))
+        if -negative - amount > fill + 1e-9:
+            heapq.heappush(sources, (negative + amount, s))
+        if level + amount < fill - 1e-9:
+            heapq.heappush(receivers, (level + amount, r))
+    return moves
+
+
+async def bench(args):
+    rng = np.random.default_rng(11)
+    nodes = fleet(args.nodes, args.overloaded, args.idle, rng)
+    storage = Storage(nodes)
+    rebalancer = LoadRebalancer()
+    columns = nodes.columns()
+    load = np.maximum(columns["cpu_usage"], columns["memory_usage"]).astype(np.float64)
+    fill = min(max(load.mean(), rebalancer.low_watermark), rebalancer.high_watermark)
+
+    rounds = 20
+    start = time.perf_counter()
+    for _ in range(rounds):
+        source, _, amount = solve(load, rebalancer.high_watermark, rebalancer.low_watermark, fill)
+    solved = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        plan = rebalancer.compute(nodes.columns())
+    computed = (time.perf_counter() - start) / rounds
+
+    await rebalancer.plan(storage)
+    start = time.perf_counter()
+    for _ in range(rounds * 5):
+        await rebalancer.plan(storage)
+    cached = (time.perf_counter() - start) / (rounds * 5)
+
+    start = time.perf_counter()
+    moves = naive(load.tolist(), rebalancer.high_watermark, rebalancer.low_watermark, fill)
+    slow = time.perf_counter() - start
+
+    print(
+        f"{args.nodes} nodes: {plan['overloaded_nodes']} overloaded, {plan['idle_nodes']} idle, "
+        f"target load {plan['target_load']}"
+    )
+    print(
+        f"  plan: {plan['move_count']} moves, {plan['load_moved']} load points, "
+        f"max load {plan['max_load_before']} -> {plan['max_load_after']}, {plan['unresolved_nodes']} unresolved"
+    )
+    print(f"  vectorised solve   {solved * 1e3:8.2f} ms  ({len(source)} moves, {amount.sum():.0f} points)")
+    print(f"  full plan          {computed * 1e3:8.2f} ms  (solve, projection and move list)")
+    print(f"  cached plan        {cached * 1e3:8.2f} ms  (columns copy and drift check)")
+    print(f"  naive heap greedy  {slow * 1e3:8.2f} ms  ({len(moves)} moves, {sum(m[2] for m in moves):.0f} points)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=10_000)
+    parser.add_argument("--overloaded", type=float, default=0.1, help="share of nodes above the high watermark")
+    parser.add_argument("--idle", type=float, default=0.3, help="share of nodes below the low watermark")
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
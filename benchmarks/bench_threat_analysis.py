@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark AdaptiveDefense threat-pattern analysis over a large history
+
+Usage (from the repository root):
+    python benchmarks/bench_threat_analysis.py [--threats 1000000]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from intelligence.adaptive_defense import AdaptiveDefense  # noqa: E402
+
+THREAT_TYPES = ["ddos", "intrusion", "malware", "data_breach", "port_scan", "brute_force"]
+SEVERITIES = ["low", "medium", "high", "critical"]
+
+
+def make_threats(count: int):
+    start = datetime.utcnow() - timedelta(days=7)
+    step = timedelta(days=7) / count
+    return [
+        {
+            "threat_type": random.choice(THREAT_TYPES),
+            "severity": random.choices(SEVERITIES, weights=(50, 30, 15, 5))[0],
+            "source_ip": f"10.{random.randrange(4)}.{random.randrange(256)}.{random.randrange(256)}",
+            "timestamp": (start + step * i).isoformat()
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_pattern(threats):
+    threat_types = [t.get("threat_type", "unknown") for t in threats]
+    return max(set(threat_types), key=threat_types.count)
+
+
+def timed(label, fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<44} {best * 1000:10.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threats", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"Generating {args.threats:,} threats...")
+    threats = make_threats(args.threats)
+    defense = AdaptiveDefense()
+
+    start = time.perf_counter()
+    for i in range(0, len(threats), 10000):
+        defense.threat_history.extend(threats[i:i + 10000])
+    print(f"  {'ingest (batches of 10k)':<44} {(time.perf_counter() - start) * 1000:10.2f} ms")
+    start = time.perf_counter()
+    for threat in threats[:10000]:
+        defense.record_threat(threat)
+    per_threat = (time.perf_counter() - start) / 10000
+    print(f"  {'record_threat (per threat)':<44} {per_threat * 1e6:10.2f} us")
+
+    timed("legacy max(set, key=count)", lambda: legacy_pattern(threats), repeat=1)
+    analysis = timed("analyze_threat_pattern() over history", defense.analyze_threat_pattern)
+    timed("analyze_threat_pattern(window_seconds=3600)",
+          lambda: defense.analyze_threat_pattern(window_seconds=3600))
+    timed("top 10 source IPs", lambda: defense.threat_history.top("source_ip", 10))
+    timed("per-minute timeline, last 60", lambda: defense.threat_history.timeline("minute", 60))
+    print(f"  pattern={analysis['pattern']} threats={analysis['threat_count']:,}")
+
+
+if __name__ == "__main__":
+    main()
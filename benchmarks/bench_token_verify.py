@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark JWT verification with and without the verification cache
+
+Usage (from the repository root):
+    python benchmarks/bench_token_verify.py [--tokens 1000] [--rounds 20]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from jose import jwt
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+
+from core.security import KeySet, TokenVerifier, create_access_token  # noqa: E402
+from core.config import settings  # noqa: E402
+
+
+def report(name, count, elapsed):
+    print(f"  {name:<24} {count / elapsed:14,.0f} verifications/s  ({elapsed / count * 1e6:7.2f} us each)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    tokens = [create_access_token({"sub": f"node-{i}"}) for i in range(args.tokens)]
+    total = args.tokens * args.rounds
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for token in tokens:
+            jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    report("python-jose decode", total, time.perf_counter() - start)
+
+    keyset = KeySet({"default": settings.SECRET_KEY})
+    # Every lookup misses: the cache holds a single entry
+    verifier = TokenVerifier(keyset, algorithm=settings.ALGORITHM, max_entries=1)
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for token in tokens:
+            verifier.verify(token)
+    report("verifier, cache miss", total, time.perf_counter() - start)
+
+    verifier = TokenVerifier(keyset, algorithm=settings.ALGORITHM, max_entries=args.tokens)
+    for token in tokens:
+        verifier.verify(token)
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for token in tokens:
+            verifier.verify(token)
+    report("verifier, cache hit", total, time.perf_counter() - start)
+    print(f"  hits={verifier.hits} misses={verifier.misses}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,20 @@ Edge Node Agent for Raspberry Pi
 Handles registration, heartbeat, and local processing
 """
 import asyncio
+import gzip
+import json
 import httpx
 import psutil
+import random
 import socket
+import ssl
 import os
 import logging
+import time
 from datetime import datetime
+from typing import Dict, List, Optional
+
+from offline_buffer import OfflineBuffer
 
 # Configure logging
 logging.basicConfig(
@@ -22,6 +30,162 @@ logger = logging.getLogger(__name__)
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000/api/v1")
 HEARTBEAT_INTERVAL = int(os.getenv("HEARTBEAT_INTERVAL", "30"))
 NODE_HOSTNAME = socket.gethostname()
+# Bearer token for APIs running with AUTH_ENABLED
+API_TOKEN = os.getenv("API_TOKEN", "")
+# mTLS: CA bundle for the API certificate plus this node's client certificate
+TLS_CA_FILE = os.getenv("TLS_CA_FILE", "")
+TLS_CERT_FILE = os.getenv("TLS_CERT_FILE", "")
+TLS_KEY_FILE = os.getenv("TLS_KEY_FILE", "")
+# Use HTTP/2 when the h2 package is installed (httpx[http2])
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+# Compress request bodies at least this large (0 disables compression)
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "512"))
+# Metrics moving less than this many percentage points are sent as null
+DELTA_THRESHOLD = float(os.getenv("DELTA_THRESHOLD", "1.0"))
+# Send every metric in full every N heartbeats so the API can self-heal
+FULL_SYNC_EVERY = int(os.getenv("FULL_SYNC_EVERY", "10"))
+ANOMALY_THRESHOLD = 90
+# Offline buffer location and caps (protect the SD card during long outages)
+BUFFER_PATH = os.getenv("BUFFER_PATH", "/var/lib/hackerhardware/buffer.db")
+BUFFER_MAX_RECORDS = int(os.getenv("BUFFER_MAX_RECORDS", "20000"))
+BUFFER_MAX_AGE_HOURS = float(os.getenv("BUFFER_MAX_AGE_HOURS", "72"))
+BUFFER_MAX_MB = float(os.getenv("BUFFER_MAX_MB", "16"))
+# Buffered records sent per upload request
+DRAIN_BATCH_SIZE = int(os.getenv("DRAIN_BATCH_SIZE", "500"))
+# Retry backoff bounds in seconds
+BACKOFF_BASE = float(os.getenv("BACKOFF_BASE", "5"))
+BACKOFF_MAX = float(os.getenv("BACKOFF_MAX", "600"))
+
+
+class MetricsSampler:
+    """Non-blocking system sampler shared by reporting and anomaly checks"""
+
+    def __init__(self):
+        # Prime the counter; later calls measure usage since the previous one
+        psutil.cpu_percent(interval=None)
+
+    def sample(self) -> Dict[str, float]:
+        return {
+            "cpu_usage": psutil.cpu_percent(interval=None),
+            "memory_usage": psutil.virtual_memory().percent
+        }
+
+
+class DeltaEncoder:
+    """Replaces metrics that barely moved since the last sent value with null"""
+
+    def __init__(self, threshold: float = DELTA_THRESHOLD, full_sync_every: int = FULL_SYNC_EVERY):
+        self.threshold = threshold
+        self.full_sync_every = full_sync_every
+        self.last_sent: Dict[str, float] = {}
+        self.count = 0
+        self._pending = ({}, 0)
+
+    def encode(self, samples: List[Dict[str, float]]) -> List[Dict[str, Optional[float]]]:
+        """Delta-encode consecutive samples; call commit() once they are accepted"""
+        last_sent = dict(self.last_sent)
+        count = self.count
+        encoded = []
+        for sample in samples:
+            full_sync = self.full_sync_every <= 1 or count % self.full_sync_every == 0
+            row = {}
+            for name, value in sample.items():
+                previous = last_sent.get(name)
+                if full_sync or previous is None or abs(value - previous) >= self.threshold:
+                    row[name] = last_sent[name] = value
+                else:
+                    row[name] = None
+            encoded.append(row)
+            count += 1
+        self._pending = (last_sent, count)
+        return encoded
+
+    def commit(self):
+        """Record that the last encoded batch was accepted by the API"""
+        self.last_sent, self.count = self._pending
+
+    def reset(self):
+        """Force the next heartbeat to carry every metric"""
+        self.last_sent.clear()
+        self.count = 0
+
+
+class Backoff:
+    """Exponential backoff with full jitter so agents do not retry in lockstep"""
+
+    def __init__(self, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX):
+        self.base = base
+        self.cap = cap
+        self.failures = 0
+        self.next_attempt = 0.0
+
+    def ready(self) -> bool:
+        return time.monotonic() >= self.next_attempt
+
+    def fail(self, retry_after: Optional[float] = None) -> float:
+        """Schedule the next attempt and return the delay in seconds"""
+        self.failures += 1
+        delay = random.uniform(0, min(self.cap, self.base * 2 ** self.failures))
+        if retry_after is not None:
+            # Honour server backpressure, still jittered to spread the herd
+            delay = max(delay, retry_after * random.uniform(1.0, 1.5))
+        self.next_attempt = time.monotonic() + delay
+        return delay
+
+    def succeed(self):
+        self.failures = 0
+        self.next_attempt = 0.0
+
+
+class UnknownNodeError(Exception):
+    """The API no longer knows this node id"""
+
+
+def create_ssl_context():
+    """TLS settings for the API connection, built once per agent run"""
+    if not (TLS_CA_FILE or TLS_CERT_FILE):
+        return True
+    context = ssl.create_default_context(cafile=TLS_CA_FILE or None)
+    context.minimum_version = ssl.TLSVersion.TLSv1_3
+    if TLS_CERT_FILE:
+        context.load_cert_chain(TLS_CERT_FILE, TLS_KEY_FILE or None)
+    return context
+
+
+def create_client() -> httpx.AsyncClient:
+    """Build the single long-lived HTTP client used by the agent"""
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.info("h2 not installed, falling back to HTTP/1.1 keep-alive")
+            http2 = False
+    headers = {"Authorization": f"Bearer {API_TOKEN}"} if API_TOKEN else None
+    return httpx.AsyncClient(
+        base_url=API_BASE_URL,
+        http2=http2,
+        headers=headers,
+        verify=create_ssl_context(),
+        timeout=10.0,
+        # One warm connection is all a single agent needs; keep it open
+        # across heartbeats so TCP/TLS setup is paid once
+        limits=httpx.Limits(
+            max_connections=4,
+            max_keepalive_connections=1,
+            keepalive_expiry=HEARTBEAT_INTERVAL * 3
+        )
+    )
+
+
+def encode_body(payload: dict):
+    """Serialise a JSON payload, gzip-compressing it when large enough"""
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    headers = {"Content-Type": "application/json"}
+    if GZIP_MIN_BYTES and len(body) >= GZIP_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
 
 
 async def get_local_ip():
@@ -36,83 +200,199 @@ async def get_local_ip():
         return "127.0.0.1"
 
 
-async def register_node():
+async def register_node(client: httpx.AsyncClient):
     """Register this node with the API"""
     ip_address = await get_local_ip()
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{API_BASE_URL}/nodes/register",
-                json={
-                    "hostname": NODE_HOSTNAME,
-                    "ip_address": ip_address
-                },
-                timeout=10.0
-            )
-            response.raise_for_status()
-            node_data = response.json()
-            logger.info(f"Node registered: {node_data['node_id']}")
-            return node_data["node_id"]
-        except Exception as e:
-            logger.error(f"Failed to register node: {e}")
-            return None
 
+    try:
+        response = await client.post(
+            "/nodes/register",
+            json={
+                "hostname": NODE_HOSTNAME,
+                "ip_address": ip_address
+            }
+        )
+        response.raise_for_status()
+        node_data = response.json()
+        logger.info(f"Node registered: {node_data['node_id']}")
+        return node_data["node_id"]
+    except Exception as e:
+        logger.error(f"Failed to register node: {e}")
+        return None
 
-async def send_heartbeat(node_id: str):
-    """Send heartbeat with metrics"""
-    cpu_usage = psutil.cpu_percent(interval=1)
-    memory_usage = psutil.virtual_memory().percent
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{API_BASE_URL}/nodes/{node_id}/heartbeat",
-                params={
-                    "cpu_usage": cpu_usage,
-                    "memory_usage": memory_usage
-                },
-                timeout=10.0
-            )
-            response.raise_for_status()
-            logger.info(f"Heartbeat sent - CPU: {cpu_usage}%, Memory: {memory_usage}%")
-        except Exception as e:
-            logger.error(f"Failed to send heartbeat: {e}")
+
+async def send_heartbeats(
+    client: httpx.AsyncClient,
+    node_id: str,
+    rows: List[tuple],
+    encoder: DeltaEncoder
+):
+    """Upload buffered heartbeat rows as one batch"""
+    encoded = encoder.encode([
+        {"cpu_usage": p["cpu_usage"], "memory_usage": p["memory_usage"]}
+        for _, _, p in rows
+    ])
+    body, headers = encode_body({
+        "node_ids": [node_id] * len(rows),
+        "cpu_usage": [e["cpu_usage"] for e in encoded],
+        "memory_usage": [e["memory_usage"] for e in encoded],
+        "timestamps": [created for _, created, _ in rows]
+    })
+
+    response = await client.post("/nodes/heartbeats", content=body, headers=headers)
+    response.raise_for_status()
+    if response.json().get("unknown_nodes"):
+        raise UnknownNodeError(node_id)
+    encoder.commit()
+    latest = rows[-1][2]
+    logger.info(
+        f"Heartbeat sent ({len(rows)} samples) - "
+        f"CPU: {latest['cpu_usage']}%, Memory: {latest['memory_usage']}%"
+    )
+
+
+async def send_events(client: httpx.AsyncClient, node_id: str, rows: List[tuple]):
+    """Upload buffered local events in one batch"""
+    body, headers = encode_body({
+        "events": [
+            {
+                "event_type": event["event_type"],
+                "data": {**event["data"], "node_id": node_id},
+                "timestamp": created
+            }
+            for _, created, event in rows
+        ]
+    })
+    response = await client.post("/intelligence/learn/batch", content=body, headers=headers)
+    response.raise_for_status()
+
+
+def rejected(error: httpx.HTTPStatusError) -> bool:
+    """A 4xx other than 408/429: the batch itself is bad, not the uplink or the API"""
+    status = error.response.status_code
+    return 400 <= status < 500 and status not in (408, 429)
+
+
+async def drain_buffer(
+    client: httpx.AsyncClient,
+    node_id: str,
+    buffer: OfflineBuffer,
+    encoder: DeltaEncoder
+):
+    """
+    Upload buffered records oldest first, acknowledging each accepted batch.
+
+    Network errors, 408, 429 and 5xx propagate so the caller backs off and
+    retries the same rows; a batch rejected with any other 4xx is dropped.
+    """
+    for kind, send in (("heartbeat", send_heartbeats), ("event", send_events)):
+        while True:
+            rows = await asyncio.to_thread(buffer.peek, kind, DRAIN_BATCH_SIZE)
+            if not rows:
+                break
+            try:
+                if kind == "heartbeat":
+                    await send(client, node_id, rows, encoder)
+                else:
+                    await send(client, node_id, rows)
+            except httpx.HTTPStatusError as e:
+                if not rejected(e):
+                    raise
+                # Retrying would fail the same way and block everything queued behind it
+                logger.warning(
+                    f"API rejected {len(rows)} buffered {kind} records "
+                    f"({e.response.status_code}), dropping them: {e.response.text[:200]}"
+                )
+            await asyncio.to_thread(buffer.ack, [row_id for row_id, _, _ in rows])
+            if len(rows) < DRAIN_BATCH_SIZE:
+                break
 
 
-async def monitor_and_report():
+async def monitor_and_report(sample: Dict[str, float], buffer: OfflineBuffer):
     """Monitor local system and report anomalies"""
-    cpu_usage = psutil.cpu_percent(interval=1)
-    memory_usage = psutil.virtual_memory().percent
-    
+    cpu_usage = sample["cpu_usage"]
+    memory_usage = sample["memory_usage"]
+
     # Simple threshold-based anomaly detection
-    if cpu_usage > 90:
+    if cpu_usage > ANOMALY_THRESHOLD:
         logger.warning(f"High CPU usage detected: {cpu_usage}%")
-    
-    if memory_usage > 90:
+        await asyncio.to_thread(buffer.append, "event", {
+            "event_type": "local_anomaly",
+            "data": {"metric": "cpu_usage", "value": cpu_usage, "threshold": ANOMALY_THRESHOLD}
+        })
+
+    if memory_usage > ANOMALY_THRESHOLD:
         logger.warning(f"High memory usage detected: {memory_usage}%")
+        await asyncio.to_thread(buffer.append, "event", {
+            "event_type": "local_anomaly",
+            "data": {"metric": "memory_usage", "value": memory_usage, "threshold": ANOMALY_THRESHOLD}
+        })
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds requested by a 429/503 Retry-After header, if any"""
+    if isinstance(error, httpx.HTTPStatusError):
+        value = error.response.headers.get("Retry-After")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
 
 
 async def main():
     """Main agent loop"""
     logger.info(f"Starting edge node agent on {NODE_HOSTNAME}")
-    
-    # Register node
-    node_id = await register_node()
-    if not node_id:
-        logger.error("Failed to register. Exiting.")
-        return
-    
-    # Main loop
-    try:
-        while True:
-            await send_heartbeat(node_id)
-            await monitor_and_report()
-            await asyncio.sleep(HEARTBEAT_INTERVAL)
-    except KeyboardInterrupt:
-        logger.info("Shutting down edge node agent")
-    except Exception as e:
-        logger.error(f"Agent error: {e}")
+    sampler = MetricsSampler()
+    encoder = DeltaEncoder()
+    backoff = Backoff()
+    os.makedirs(os.path.dirname(BUFFER_PATH) or ".", exist_ok=True)
+    buffer = OfflineBuffer(
+        BUFFER_PATH,
+        max_records=BUFFER_MAX_RECORDS,
+        max_age_seconds=BUFFER_MAX_AGE_HOURS * 3600,
+        max_bytes=int(BUFFER_MAX_MB * 1024 * 1024)
+    )
+    node_id = None
+
+    # Spread agents that boot together (e.g. after a power cut) over one interval
+    await asyncio.sleep(random.uniform(0, HEARTBEAT_INTERVAL))
+
+    async with create_client() as client:
+        # Main loop: every sample is buffered first and uploaded when the uplink allows
+        try:
+            while True:
+                sample = sampler.sample()
+                await asyncio.to_thread(buffer.append, "heartbeat", sample)
+                await monitor_and_report(sample, buffer)
+
+                if backoff.ready():
+                    try:
+                        if node_id is None:
+                            node_id = await register_node(client)
+                            if node_id is None:
+                                raise ConnectionError("registration failed")
+                            encoder.reset()
+                        await drain_buffer(client, node_id, buffer, encoder)
+                        backoff.succeed()
+                    except UnknownNodeError:
+                        logger.warning(f"API does not know {node_id}, re-registering")
+                        node_id = None
+                    except Exception as e:
+                        delay = backoff.fail(retry_after(e))
+                        logger.error(
+                            f"Upload failed ({buffer.count()} records buffered), "
+                            f"retrying in {delay:.0f}s: {e}"
+                        )
+
+                await asyncio.sleep(HEARTBEAT_INTERVAL * random.uniform(0.9, 1.1))
+        except KeyboardInterrupt:
+            logger.info("Shutting down edge node agent")
+        except Exception as e:
+            logger.error(f"Agent error: {e}")
+        finally:
+            buffer.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+"""
+Disk-backed offline buffer for the edge node agent
+
+Telemetry is written to a SQLite database in WAL mode before any upload is
+attempted, and rows are only deleted once the API has acknowledged them.
+Row count, age and file size caps keep the buffer from filling the SD card
+during long outages; the oldest records are dropped first.
+"""
+import json
+import logging
+import sqlite3
+import time
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    created REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_kind ON records (kind, id);
+"""
+
+
+class OfflineBuffer:
+    """Append-only record buffer with acknowledged deletion"""
+
+    def __init__(
+        self,
+        path: str,
+        max_records: int = 20000,
+        max_age_seconds: float = 72 * 3600,
+        max_bytes: int = 16 * 1024 * 1024
+    ):
+        self.path = path
+        self.max_records = max_records
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        # auto_vacuum only takes effect before the first table is created
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL skips the fsync per commit in WAL mode, sparing the SD card
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def append(self, kind: str, payload: dict, created: Optional[float] = None):
+        """Persist one record and enforce the retention caps"""
+        if created is None:
+            created = time.time()
+        self._conn.execute(
+            "INSERT INTO records (kind, created, payload) VALUES (?, ?, ?)",
+            (kind, created, json.dumps(payload, separators=(",", ":")))
+        )
+        self._prune(created)
+
+    def peek(self, kind: str, limit: int) -> List[Tuple[int, float, dict]]:
+        """Oldest records of a kind as (id, created, payload), without removing them"""
+        rows = self._conn.execute(
+            "SELECT id, created, payload FROM records WHERE kind = ? ORDER BY id LIMIT ?",
+            (kind, limit)
+        ).fetchall()
+        return [(row_id, created, json.loads(payload)) for row_id, created, payload in rows]
+
+    def ack(self, ids: List[int]):
+        """Delete records the API has accepted"""
+        if not ids:
+            return
+        self._conn.execute("BEGIN")
+        self._conn.executemany("DELETE FROM records WHERE id = ?", [(i,) for i in ids])
+        self._conn.execute("COMMIT")
+
+    def count(self, kind: Optional[str] = None) -> int:
+        if kind is None:
+            return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM records WHERE kind = ?", (kind,)
+        ).fetchone()[0]
+
+    def _size_bytes(self) -> int:
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+
+    def _delete(self, sql: str, params: tuple) -> int:
+        deleted = self._conn.execute(sql, params).rowcount
+        if deleted > 0:
+            self.dropped += deleted
+            logger.warning(f"Offline buffer full, dropped {deleted} oldest records")
+        return deleted
+
+    def _prune(self, now: float):
+        self._delete("DELETE FROM records WHERE created < ?", (now - self.max_age_seconds,))
+        self._delete(
+            "DELETE FROM records WHERE id <= "
+            "(SELECT id FROM records ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (self.max_records,)
+        )
+        if self._size_bytes() > self.max_bytes:
+            # Drop the oldest tenth and hand the freed pages back to the filesystem
+            keep = max(self.count() * 9 // 10, 1)
+            self._delete(
+                "DELETE FROM records WHERE id <= "
+                "(SELECT id FROM records ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (keep,)
+            )
+            self._conn.execute("PRAGMA incremental_vacuum")
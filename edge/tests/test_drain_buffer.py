@@ -0,0 +1,68 @@
+"""
+Draining the offline buffer: retry transient failures, drop rejected batches
+"""
+import time
+
+import httpx
+import pytest
+
+import node_agent
+from node_agent import DeltaEncoder, drain_buffer
+from offline_buffer import OfflineBuffer
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def buffer(tmp_path):
+    buffer = OfflineBuffer(str(tmp_path / "buffer.db"))
+    now = time.time()
+    for i in range(3):
+        buffer.append("heartbeat", {"cpu_usage": 10.0 + i, "memory_usage": 20.0}, created=now - 10 + i)
+    yield buffer
+    buffer.close()
+
+
+def _client(statuses):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        status = statuses.pop(0) if statuses else 200
+        return httpx.Response(status, json={"accepted": 1, "unknown_nodes": []})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test"), requests
+
+
+async def test_rejected_batch_is_dropped_and_later_records_still_upload(buffer, monkeypatch):
+    monkeypatch.setattr(node_agent, "DRAIN_BATCH_SIZE", 2)
+    client, requests = _client([422])
+
+    async with client:
+        await drain_buffer(client, "node-1", buffer, DeltaEncoder())
+
+    assert len(requests) == 2
+    assert buffer.count() == 0
+
+
+@pytest.mark.parametrize("status", [408, 429, 503])
+async def test_transient_failure_keeps_records_for_retry(buffer, status):
+    client, requests = _client([status])
+
+    async with client:
+        with pytest.raises(httpx.HTTPStatusError):
+            await drain_buffer(client, "node-1", buffer, DeltaEncoder())
+
+    assert len(requests) == 1
+    assert buffer.count("heartbeat") == 3
+
+
+async def test_network_error_keeps_records_for_retry(buffer):
+    def handler(request):
+        raise httpx.ConnectError("uplink down", request=request)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+        with pytest.raises(httpx.ConnectError):
+            await drain_buffer(client, "node-1", buffer, DeltaEncoder())
+
+    assert buffer.count("heartbeat") == 3
@@ -2,9 +2,13 @@
 Adaptive Defense System using AI/ML
 """
 import logging
-from typing import List, Dict
+import time
+from collections import Counter, deque
+from typing import Iterable, List, Dict, Optional
 from datetime import datetime
-import random
+
+from intelligence.defense_rules import DefenseRuleEngine
+from intelligence.threat_analytics import ThreatAnalytics, to_epoch
 
 logger = logging.getLogger(__name__)
 
@@ -12,69 +16,125 @@ logger = logging.getLogger(__name__)
 class AdaptiveDefense:
     """AI-powered adaptive defense mechanism"""
     
-    def __init__(self):
-        self.threat_history = []
-        self.defense_rules = []
-        self.learning_data = []
+    def __init__(
+        self,
+        max_learning_records: int = 10000,
+        rule_ttl: Optional[float] = 3600,
+        forecaster=None
+    ):
+        self.threat_history = ThreatAnalytics()
+        # Optional ThreatForecaster (core.forecasting in the API) fed by record_threat
+        self.forecaster = forecaster
+        # Learned block rules expire after rule_ttl unless incidents recur
+        self.defense_rules = DefenseRuleEngine(default_ttl=rule_ttl)
+        # Recent records only; full history stays in the ingest segments
+        self.learning_data = deque(maxlen=max_learning_records)
+    
+    def record_threat(self, threat: Dict):
+        """Add a threat to the history; aggregates update incrementally"""
+        self.threat_history.add(threat)
+        if self.forecaster is not None:
+            self.forecaster.observe(threat.get("threat_type"), to_epoch(threat.get("timestamp")))
     
-    def analyze_threat_pattern(self, threats: List[Dict]) -> Dict:
-        """Analyze threat patterns using ML"""
+    def analyze_threat_pattern(
+        self,
+        threats: Optional[List[Dict]] = None,
+        window_seconds: Optional[float] = None
+    ) -> Dict:
+        """
+        Analyze threat patterns.
+
+        With a list, analyzes just those threats; otherwise analyzes the
+        recorded history, optionally limited to the last window_seconds.
+        """
         logger.info("Analyzing threat patterns")
         
-        if not threats:
+        if threats is not None:
+            history = ThreatAnalytics.from_threats(threats)
+            since = None
+        else:
+            history = self.threat_history
+            since = time.time() - window_seconds if window_seconds else None
+        
+        threat_count = history.count(since=since)
+        if not threat_count:
             return {
                 "pattern": "normal",
                 "confidence": 0.95,
                 "recommendations": []
             }
         
-        # Placeholder for actual ML analysis
-        # In production, use scikit-learn, TensorFlow, or PyTorch
-        
-        threat_types = [t.get("threat_type", "unknown") for t in threats]
-        most_common = max(set(threat_types), key=threat_types.count) if threat_types else "none"
+        top_types = history.top("threat_type", 5, since=since)
+        severities = history.breakdown("severity", since=since)
+        most_common, most_common_count = top_types[0]
         
         analysis = {
             "pattern": most_common,
-            "confidence": 0.85,
-            "threat_count": len(threats),
+            "confidence": round(most_common_count / threat_count, 2),
+            "threat_count": threat_count,
+            "top_threat_types": [{"threat_type": t, "count": c} for t, c in top_types],
+            "top_sources": [
+                {"source_ip": ip, "count": c} for ip, c in history.top("source_ip", 5, since=since)
+            ],
+            "severity_breakdown": severities,
             "timestamp": datetime.utcnow().isoformat(),
-            "recommendations": self._generate_recommendations(threats)
+            "recommendations": self._generate_recommendations(threat_count, severities)
         }
         
         return analysis
     
-    def _generate_recommendations(self, threats: List[Dict]) -> List[str]:
+    def _generate_recommendations(self, threat_count: int, severities: Dict[str, int]) -> List[str]:
         """Generate defense recommendations"""
         recommendations = []
         
-        if len(threats) > 10:
+        if threat_count > 10:
             recommendations.append("Increase firewall strictness")
             recommendations.append("Enable rate limiting")
         
-        if any(t.get("severity") == "critical" for t in threats):
+        if severities.get("critical"):
             recommendations.append("Immediate security audit required")
             recommendations.append("Isolate affected nodes")
         
         return recommendations
     
-    def predict_next_threat(self) -> Dict:
-        """Predict potential future threats"""
+    def predict_next_threat(self, window_seconds: float = 86400) -> Dict:
+        """
+        Predict the next threat type.
+
+        Served from the forecaster's cached forecast when one is attached;
+        otherwise the most frequent type of the last window_seconds, with
+        its share of those threats as the confidence.
+        """
         logger.info("Predicting next threat")
         
-        # Placeholder for actual predictive model
-        threat_types = ["ddos", "intrusion", "malware", "data_breach"]
+        if self.forecaster is not None:
+            forecast = self.forecaster.forecast()
+            return {
+                "predicted_threat": forecast["predicted_threat"],
+                "confidence": forecast["predicted_probability"],
+                "expected_threats": forecast["expected_threats"],
+                "threat_level": forecast["threat_level"],
+                "time_window": forecast["time_window"],
+                "timestamp": forecast["timestamp"],
+                "preventive_actions": forecast["recommendations"]
+            }
+        
+        since = time.time() - window_seconds
+        threat_count = self.threat_history.count(since=since)
+        top_types = self.threat_history.top("threat_type", 1, since=since)
+        predicted, count = top_types[0] if top_types else (None, 0)
         
         prediction = {
-            "predicted_threat": random.choice(threat_types),
-            "confidence": round(random.uniform(0.6, 0.95), 2),
-            "time_window": "next_24_hours",
+            "predicted_threat": predicted,
+            "confidence": round(count / threat_count, 2) if threat_count else 0.0,
+            "expected_threats": threat_count,
+            "time_window": f"next_{window_seconds / 3600:g}_hours",
             "timestamp": datetime.utcnow().isoformat(),
             "preventive_actions": [
                 "Strengthen authentication",
                 "Update firewall rules",
                 "Increase monitoring frequency"
-            ]
+            ] if threat_count else ["Continue monitoring"]
         }
         
         return prediction
@@ -119,12 +179,33 @@ class AdaptiveDefense:
         })
         
         # Update defense rules based on learning
-        new_rule = {
-            "trigger": incident.get("type"),
-            "action": "block",
-            "source": incident.get("source_ip"),
-            "created": datetime.utcnow().isoformat()
-        }
-        
-        self.defense_rules.append(new_rule)
-        logger.info(f"New defense rule created: {new_rule}")
+        self.defense_rules.purge()
+        source = incident.get("source_ip")
+        if not source:
+            logger.warning("Incident has no source_ip, no defense rule created")
+            return None
+        try:
+            rule = self.defense_rules.add(source, trigger=incident.get("type"), action="block")
+        except ValueError:
+            logger.warning(f"Incident source {source!r} is not an address or network")
+            return None
+        
+        if rule.hits == 1:
+            logger.info(f"New defense rule created: {rule.to_dict()}")
+        return rule
+    
+    def is_blocked(self, source_ip: str, event: Optional[str] = None) -> bool:
+        """Whether a learned rule blocks this source (for this event type)"""
+        return self.defense_rules.is_blocked(source_ip, event)
+    
+    def learn_from_events(self, events: Iterable[Dict]) -> Dict[str, int]:
+        """
+        Consume a stream of ingested events, such as the API's
+        core.ingest.iter_events(), without materialising it.
+        """
+        counts = Counter()
+        for event in events:
+            counts[event.get("event_type", "unknown")] += 1
+            self.learning_data.append(event)
+        logger.info(f"Learned from {sum(counts.values())} events")
+        return dict(counts)
@@ -0,0 +1,279 @@
+"""
+Indexed defense-rule engine
+"""
+import heapq
+import ipaddress
+import socket
+import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+# Rules without a trigger apply to every event type
+ANY_TRIGGER = None
+
+
+def parse_address(text: str) -> Tuple[int, int]:
+    """(IP version, integer value) of an address; much cheaper than ipaddress"""
+    try:
+        if ":" in text:
+            return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, text), "big")
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+    except (OSError, TypeError):
+        raise ValueError(f"{text!r} is not a valid IP address")
+
+
+class DefenseRule:
+    """A block (or other action) rule for a source, optionally per trigger"""
+
+    __slots__ = ("source", "trigger", "action", "created", "expires_at", "hits")
+
+    def __init__(
+        self,
+        source: Optional[Network],
+        trigger: Optional[str],
+        action: str,
+        created: float,
+        expires_at: Optional[float]
+    ):
+        self.source = source
+        self.trigger = trigger
+        self.action = action
+        self.created = created
+        self.expires_at = expires_at
+        self.hits = 1
+
+    @property
+    def key(self) -> Tuple[Optional[Network], Optional[str]]:
+        return self.source, self.trigger
+
+    def expired(self, now: float) -> bool:
+        return self.expires_at is not None and now >= self.expires_at
+
+    def to_dict(self) -> Dict:
+        return {
+            "trigger": self.trigger,
+            "action": self.action,
+            "source": str(self.source) if self.source is not None else None,
+            "created": self.created,
+            "expires_at": self.expires_at,
+            "hits": self.hits
+        }
+
+
+class _PrefixTrie:
+    """
+    Binary trie over address bits. Each node is [zero, one, rules] where
+    rules maps trigger -> DefenseRule for the prefix ending at that node.
+    Lookups are walked inline by DefenseRuleEngine.match.
+    """
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self.root: list = [None, None, None]
+        self.depth = 0  # longest prefix stored, bounds every walk
+
+    def _walk(self, network: Network, create: bool) -> Optional[list]:
+        node = self.root
+        value = int(network.network_address)
+        for i in range(network.prefixlen):
+            bit = (value >> (self.bits - 1 - i)) & 1
+            child = node[bit]
+            if child is None:
+                if not create:
+                    return None
+                child = node[bit] = [None, None, None]
+            node = child
+        return node
+
+    def insert(self, network: Network, rule: DefenseRule):
+        node = self._walk(network, create=True)
+        if node[2] is None:
+            node[2] = {}
+        node[2][rule.trigger] = rule
+        self.depth = max(self.depth, network.prefixlen)
+
+    def remove(self, network: Network, trigger: Optional[str]):
+        node = self._walk(network, create=False)
+        if node is not None and node[2]:
+            node[2].pop(trigger, None)
+
+
+class DefenseRuleEngine:
+    """
+    Compiled, indexed view of defense rules.
+
+    Single addresses live in a hash map, networks in a per-family prefix
+    trie, and rules without a source in a per-trigger table, so checking a
+    (source_ip, event) pair costs one dict lookup plus a walk bounded by
+    the longest stored prefix. Adding a rule that already exists for the
+    same source and trigger merges into it: the hit count grows and the
+    expiry is extended. Expired rules are ignored on lookup and removed by
+    purge(), which pops a heap ordered by expiry.
+    """
+
+    def __init__(self, default_ttl: Optional[float] = None):
+        self.default_ttl = default_ttl
+        self._rules: Dict[Tuple[Optional[Network], Optional[str]], DefenseRule] = {}
+        self._exact: Dict[Tuple[int, int], Dict[Optional[str], DefenseRule]] = {}
+        self._tries = {4: _PrefixTrie(32), 6: _PrefixTrie(128)}
+        self._by_trigger: Dict[Optional[str], Dict[Optional[Network], DefenseRule]] = {}
+        self._global: Dict[Optional[str], DefenseRule] = {}
+        self._expiry: List[Tuple[float, int, DefenseRule]] = []
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def __iter__(self) -> Iterator[DefenseRule]:
+        return iter(list(self._rules.values()))
+
+    @staticmethod
+    def _network(source: Optional[str]) -> Optional[Network]:
+        if source is None:
+            return None
+        return ipaddress.ip_network(source, strict=False)
+
+    def add(
+        self,
+        source: Optional[str],
+        trigger: Optional[str] = ANY_TRIGGER,
+        action: str = "block",
+        ttl: Optional[float] = None,
+        now: Optional[float] = None
+    ) -> DefenseRule:
+        """
+        Add or merge a rule. source is an address, a CIDR block, or None
+        for every source; trigger None matches every event type.
+        """
+        now = time.time() if now is None else now
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = now + ttl if ttl else None
+        network = self._network(source)
+        key = (network, trigger)
+
+        rule = self._rules.get(key)
+        if rule is not None and not rule.expired(now):
+            rule.hits += 1
+            rule.action = action
+            if rule.expires_at is not None:
+                rule.expires_at = None if expires_at is None else max(rule.expires_at, expires_at)
+        else:
+            rule = DefenseRule(network, trigger, action, now, expires_at)
+            self._rules[key] = rule
+            self._by_trigger.setdefault(trigger, {})[network] = rule
+            if network is None:
+                self._global[trigger] = rule
+            elif network.prefixlen == network.max_prefixlen:
+                address = (network.version, int(network.network_address))
+                self._exact.setdefault(address, {})[trigger] = rule
+            else:
+                self._tries[network.version].insert(network, rule)
+        if rule.expires_at is not None:
+            self._seq += 1
+            heapq.heappush(self._expiry, (rule.expires_at, self._seq, rule))
+        return rule
+
+    def remove(self, source: Optional[str], trigger: Optional[str] = ANY_TRIGGER) -> bool:
+        return self._drop(self._rules.get((self._network(source), trigger)))
+
+    def _drop(self, rule: Optional[DefenseRule]) -> bool:
+        if rule is None or self._rules.get(rule.key) is not rule:
+            return False
+        del self._rules[rule.key]
+        network, trigger = rule.key
+        table = self._by_trigger.get(trigger)
+        if table is not None:
+            table.pop(network, None)
+            if not table:
+                del self._by_trigger[trigger]
+        if network is None:
+            self._global.pop(trigger, None)
+        elif network.prefixlen == network.max_prefixlen:
+            address = (network.version, int(network.network_address))
+            rules = self._exact.get(address)
+            if rules is not None:
+                rules.pop(trigger, None)
+                if not rules:
+                    del self._exact[address]
+        else:
+            self._tries[network.version].remove(network, trigger)
+        return True
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """Remove every expired rule and return how many were dropped"""
+        now = time.time() if now is None else now
+        removed = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, _, rule = heapq.heappop(self._expiry)
+            # Stale heap entries belong to rules whose expiry was extended
+            if rule.expires_at == expires_at and self._drop(rule):
+                removed += 1
+        return removed
+
+    def rules_for(self, trigger: Optional[str]) -> List[DefenseRule]:
+        """Rules registered for a trigger (None for the any-trigger rules)"""
+        return list(self._by_trigger.get(trigger, {}).values())
+
+    @staticmethod
+    def _pick(table: Dict[Optional[str], DefenseRule], event: Optional[str], now: float) -> Optional[DefenseRule]:
+        if event is None:
+            for rule in table.values():
+                if not rule.expired(now):
+                    return rule
+            return None
+        rule = table.get(event)
+        if rule is not None and not rule.expired(now):
+            return rule
+        rule = table.get(ANY_TRIGGER)
+        if rule is not None and not rule.expired(now):
+            return rule
+        return None
+
+    def match(
+        self,
+        source_ip: str,
+        event: Optional[str] = None,
+        now: Optional[float] = None
+    ) -> Optional[DefenseRule]:
+        """
+        The most specific live rule covering source_ip for event (or for
+        any event when event is None), or None.
+        """
+        if not self._rules:
+            return None
+        now = time.time() if now is None else now
+        version, value = parse_address(source_ip)
+
+        table = self._exact.get((version, value))
+        if table:
+            rule = self._pick(table, event, now)
+            if rule is not None:
+                return rule
+        best = None
+        trie = self._tries[version]
+        node = trie.root
+        shift = trie.bits - 1
+        for _ in range(trie.depth + 1):
+            if node[2]:
+                rule = self._pick(node[2], event, now)
+                if rule is not None:
+                    best = rule
+            if shift < 0:
+                break
+            node = node[(value >> shift) & 1]
+            if node is None:
+                break
+            shift -= 1
+        if best is not None:
+            return best
+        if event is not None:
+            return self._pick(self._global, event, now) if self._global else None
+        # Source-less rules are scoped to their trigger; only an any-trigger
+        # one applies when no event is given
+        rule = self._global.get(ANY_TRIGGER)
+        return rule if rule is not None and not rule.expired(now) else None
+
+    def is_blocked(self, source_ip: str, event: Optional[str] = None, now: Optional[float] = None) -> bool:
+        rule = self.match(source_ip, event, now)
+        return rule is not None and rule.action == "block"
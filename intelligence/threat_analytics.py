@@ -0,0 +1,274 @@
+"""
+Columnar, incrementally maintained threat aggregates
+"""
+import time
+import warnings
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+FIELDS = ("threat_type", "severity", "source_ip")
+SEVERITIES = ("low", "medium", "high", "critical")
+RESOLUTIONS = {"minute": 60, "hour": 3600}
+
+
+def to_epoch(value) -> float:
+    """Epoch seconds for a datetime, ISO string or number; now for None (naive means UTC)"""
+    if value is None:
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _epochs(values: List) -> np.ndarray:
+    """Vectorised to_epoch for a batch of timestamps"""
+    if values and all(isinstance(v, str) for v in values):
+        # Naive ISO strings parse in one call; anything with an offset
+        # (which NumPy warns about) takes the per-item path
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                return np.array(values, dtype="datetime64[us]").astype(np.int64) / 1e6
+        except (ValueError, Warning):
+            pass
+    return np.fromiter(map(to_epoch, values), dtype=np.float64, count=len(values))
+
+
+class Categories:
+    """Interns category strings as dense integer codes"""
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.names: List[str] = []
+        self._codes: Dict[str, int] = {}
+        for name in names:
+            self.code(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def code(self, name: str) -> int:
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def lookup(self, name: str) -> Optional[int]:
+        return self._codes.get(name)
+
+
+class BucketRing:
+    """
+    Event counts in fixed-width time buckets covering the last
+    `buckets` periods. Adding an event is O(1); buckets that fall out of
+    the window are zeroed lazily as time advances.
+    """
+
+    def __init__(self, width: float, buckets: int):
+        self.width = width
+        self.counts = np.zeros(buckets, dtype=np.int64)
+        self.head = None  # absolute index of the newest bucket
+
+    def _advance(self, index: int):
+        if self.head is None:
+            self.head = index
+            return
+        if index <= self.head:
+            return
+        size = len(self.counts)
+        if index - self.head >= size:
+            self.counts[:] = 0
+        else:
+            for stale in range(self.head + 1, index + 1):
+                self.counts[stale % size] = 0
+        self.head = index
+
+    def add(self, ts: float, count: int = 1):
+        index = int(ts // self.width)
+        self._advance(index)
+        if self.head - index < len(self.counts):
+            self.counts[index % len(self.counts)] += count
+
+    def series(self, now: Optional[float] = None, periods: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(bucket start times, counts) for the most recent periods, oldest first"""
+        size = len(self.counts)
+        periods = size if periods is None else min(periods, size)
+        index = int((time.time() if now is None else now) // self.width)
+        if self.head is None:
+            self.head = index
+        self._advance(index)
+        absolute = np.arange(index - periods + 1, index + 1)
+        return absolute * self.width, self.counts[absolute % size].copy()
+
+
+class ThreatAnalytics:
+    """
+    Threat history stored as parallel NumPy columns.
+
+    Threat type, severity and source IP are dictionary-encoded, so counting
+    is a bincount and top-k an argpartition over small integer arrays.
+    Running totals and per-minute/per-hour bucket rings are updated as each
+    threat is added; windowed breakdowns binary-search the time column,
+    which is kept sorted (out-of-order inserts are merged lazily).
+    """
+
+    def __init__(self, capacity: int = 1024, minutes: int = 24 * 60, hours: int = 7 * 24):
+        self.categories = {field: Categories() for field in FIELDS}
+        self.categories["severity"] = Categories(SEVERITIES)
+        self._size = 0
+        self._sorted = True
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.codes = {field: np.zeros(capacity, dtype=np.int32) for field in FIELDS}
+        self.totals = {field: np.zeros(16, dtype=np.int64) for field in FIELDS}
+        self.buckets = {
+            "minute": BucketRing(RESOLUTIONS["minute"], minutes),
+            "hour": BucketRing(RESOLUTIONS["hour"], hours)
+        }
+
+    def __len__(self) -> int:
+        return self._size
+
+    @classmethod
+    def from_threats(cls, threats: List[Dict]) -> "ThreatAnalytics":
+        analytics = cls(capacity=max(len(threats), 1))
+        analytics.extend(threats)
+        return analytics
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        capacity = len(self.timestamps)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros(capacity, dtype=np.float64)
+        grown[:self._size] = self.timestamps[:self._size]
+        self.timestamps = grown
+        for field, column in self.codes.items():
+            grown = np.zeros(capacity, dtype=np.int32)
+            grown[:self._size] = column[:self._size]
+            self.codes[field] = grown
+
+    def _totals(self, field: str, size: int) -> np.ndarray:
+        totals = self.totals[field]
+        if size > len(totals):
+            grown = np.zeros(max(size, 2 * len(totals)), dtype=np.int64)
+            grown[:len(totals)] = totals
+            totals = self.totals[field] = grown
+        return totals
+
+    def add(self, threat: Dict):
+        """Record one threat, updating every aggregate incrementally"""
+        self._reserve(1)
+        slot = self._size
+        for field in FIELDS:
+            code = self.categories[field].code(threat.get(field) or "unknown")
+            self.codes[field][slot] = code
+            self._totals(field, code + 1)[code] += 1
+        ts = to_epoch(threat.get("timestamp"))
+        self.timestamps[slot] = ts
+        if slot and ts < self.timestamps[slot - 1]:
+            self._sorted = False
+        self._size += 1
+        for ring in self.buckets.values():
+            ring.add(ts)
+
+    def extend(self, threats: List[Dict]):
+        """Record a batch of threats with one vectorised update per column"""
+        n = len(threats)
+        if not n:
+            return
+        self._reserve(n)
+        start, end = self._size, self._size + n
+        for field in FIELDS:
+            code = self.categories[field].code
+            codes = np.fromiter(
+                (code(t.get(field) or "unknown") for t in threats), dtype=np.int32, count=n
+            )
+            self.codes[field][start:end] = codes
+            # bincount over the batch's code range only
+            low = int(codes.min())
+            counts = np.bincount(codes - low)
+            self._totals(field, low + len(counts))[low:low + len(counts)] += counts
+        timestamps = _epochs([t.get("timestamp") for t in threats])
+        self.timestamps[start:end] = timestamps
+        if self._sorted and (
+            (start and timestamps[0] < self.timestamps[start - 1])
+            or (n > 1 and (np.diff(timestamps) < 0).any())
+        ):
+            self._sorted = False
+        self._size = end
+        for ring in self.buckets.values():
+            indexes, counts = np.unique((timestamps // ring.width).astype(np.int64), return_counts=True)
+            for index, count in zip(indexes.tolist(), counts.tolist()):
+                ring.add(index * ring.width, count)
+
+    def _ensure_sorted(self):
+        if self._sorted:
+            return
+        order = np.argsort(self.timestamps[:self._size], kind="stable")
+        self.timestamps[:self._size] = self.timestamps[:self._size][order]
+        for column in self.codes.values():
+            column[:self._size] = column[:self._size][order]
+        self._sorted = True
+
+    def _range(self, since: Optional[float], until: Optional[float]) -> slice:
+        if since is None and until is None:
+            return slice(0, self._size)
+        self._ensure_sorted()
+        times = self.timestamps[:self._size]
+        lo = 0 if since is None else int(np.searchsorted(times, since, side="left"))
+        hi = self._size if until is None else int(np.searchsorted(times, until, side="right"))
+        return slice(lo, hi)
+
+    def counts(self, field: str, since: Optional[float] = None, until: Optional[float] = None) -> np.ndarray:
+        """Counts per category code, over all history or a time window"""
+        size = len(self.categories[field])
+        if since is None and until is None:
+            return self.totals[field][:size]
+        window = self.codes[field][self._range(since, until)]
+        return np.bincount(window, minlength=size)
+
+    def breakdown(self, field: str, since: Optional[float] = None, until: Optional[float] = None) -> Dict[str, int]:
+        names = self.categories[field].names
+        counts = self.counts(field, since, until)
+        return {names[i]: int(counts[i]) for i in np.flatnonzero(counts).tolist()}
+
+    def top(
+        self,
+        field: str,
+        k: int = 10,
+        since: Optional[float] = None,
+        until: Optional[float] = None
+    ) -> List[Tuple[str, int]]:
+        """The k most frequent categories, most frequent first"""
+        counts = self.counts(field, since, until)
+        nonzero = int(np.count_nonzero(counts))
+        k = min(k, nonzero)
+        if k <= 0:
+            return []
+        if k < len(counts):
+            candidates = np.argpartition(-counts, k - 1)[:k]
+        else:
+            candidates = np.arange(len(counts))
+        candidates = candidates[np.argsort(-counts[candidates], kind="stable")]
+        names = self.categories[field].names
+        return [(names[i], int(counts[i])) for i in candidates.tolist()]
+
+    def count(self, since: Optional[float] = None, until: Optional[float] = None) -> int:
+        window = self._range(since, until)
+        return window.stop - window.start
+
+    def timeline(self, resolution: str = "minute", periods: int = 60, now: Optional[float] = None) -> List[Dict]:
+        """Threat counts per minute or hour bucket, oldest first"""
+        starts, counts = self.buckets[resolution].series(now, periods)
+        return [
+            {"start": datetime.fromtimestamp(s, timezone.utc).replace(tzinfo=None).isoformat(), "count": c}
+            for s, c in zip(starts.tolist(), counts.tolist())
+        ]
@@ -0,0 +1,44 @@
+#!/bin/bash
+# Generate a development CA plus server and client certificates for mTLS
+#
+# Usage: scripts/generate_certs.sh [directory] [server hostname]
+# Re-running replaces the server and client certificates (signed by the
+# existing CA), which is also a quick way to exercise hot reload.
+
+set -e
+
+DIR="${1:-certs}"
+HOST="${2:-localhost}"
+DAYS=365
+
+mkdir -p "$DIR"
+cd "$DIR"
+
+if [ ! -f ca.crt ] || [ ! -f ca.key ]; then
+    openssl req -x509 -nodes -days $DAYS -newkey rsa:2048 \
+        -keyout ca.key -out ca.crt \
+        -subj "/O=HackerHardware/CN=HackerHardware Dev CA" \
+        -addext "basicConstraints=critical,CA:TRUE" \
+        -addext "keyUsage=critical,keyCertSign,cRLSign" \
+        2>/dev/null
+fi
+
+issue() {
+    local name=$1 subject=$2 extensions=$3
+    openssl req -nodes -newkey rsa:2048 -keyout "$name.key.tmp" -out "$name.csr" -subj "$subject" 2>/dev/null
+    printf "%b" "$extensions" > "$name.ext"
+    openssl x509 -req -in "$name.csr" -CA ca.crt -CAkey ca.key -CAcreateserial \
+        -days $DAYS -extfile "$name.ext" -out "$name.crt.tmp" 2>/dev/null
+    # Key first, then certificate: readers retry until the pair matches
+    mv "$name.key.tmp" "$name.key"
+    mv "$name.crt.tmp" "$name.crt"
+    rm -f "$name.csr" "$name.ext"
+}
+
+issue server "/O=HackerHardware/CN=$HOST" \
+    "subjectAltName=DNS:$HOST,DNS:localhost,IP:127.0.0.1\nextendedKeyUsage=serverAuth"
+issue client "/O=HackerHardware/CN=edge-node" \
+    "extendedKeyUsage=clientAuth"
+
+chmod 600 ./*.key
+echo "Certificates written to $DIR (ca.crt, server.crt/key, client.crt/key)"
@@ -49,11 +49,7 @@ echo "Setting up certificates directory..."
 mkdir -p certs
 if [ ! -f certs/server.crt ]; then
     echo "Generating self-signed certificates for development..."
-    openssl req -x509 -nodes -days 365 -newkey rsa:2048 \
-        -keyout certs/server.key \
-        -out certs/server.crt \
-        -subj "/C=US/ST=State/L=City/O=HackerHardware/CN=localhost" \
-        2>/dev/null
+    "$(dirname "$0")/generate_certs.sh" certs > /dev/null
     echo "${GREEN}✓ Certificates generated${NC}"
 else
     echo "${YELLOW}⚠ Certificates already exist${NC}"
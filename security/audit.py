@@ -0,0 +1,430 @@
+"""
+Asynchronous, hash-chained audit log
+"""
+import argparse
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+AUDIT_PREFIX = "audit-"
+# prev of the very first record in a directory
+GENESIS = "0" * 64
+# Overflow policies when the queue is full
+DROP = "drop"
+BLOCK = "block"
+
+
+def _canonical(record: Dict) -> bytes:
+    try:
+        return json.dumps(record, sort_keys=True, separators=(",", ":"), default=str).encode()
+    except TypeError:
+        # Mixed-type keys cannot be sorted; normalise them to strings first
+        return _canonical(json.loads(json.dumps(record, default=str)))
+
+
+def encode_record(record: Dict) -> Tuple[bytes, str]:
+    """
+    The JSON line for a record and its hash. The hash covers the canonical
+    form of every other field, including prev, which chains the records.
+    """
+    body = _canonical(record)
+    digest = hashlib.sha256(body).hexdigest()
+    return body[:-1] + b',"hash":"' + digest.encode() + b'"}\n', digest
+
+
+def record_hash(record: Dict) -> str:
+    return hashlib.sha256(_canonical({k: v for k, v in record.items() if k != "hash"})).hexdigest()
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class AuditFileWriter:
+    """
+    Append-only audit files, rotated by size and age.
+
+    Files are named audit-<UTC start>-<pid>-<seq>.jsonl, so lexical order is
+    chronological; sealed files are gzipped when compress is set. Nothing
+    is ever deleted. All methods block and run on the sink's writer thread.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age_seconds: float = 86400,
+        compress: bool = True,
+        fsync: bool = False
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.compress = compress
+        self.fsync = fsync
+        self._file = None
+        self._path: Optional[Path] = None
+        self._opened_at = 0.0
+        self._size = 0
+        self._seq = 0
+
+    def _open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._seq += 1
+        # Microseconds keep names unique across writers opened in the same second
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        self._path = self.directory / f"{AUDIT_PREFIX}{stamp}-{os.getpid()}-{self._seq:06d}.jsonl"
+        self._file = open(self._path, "ab")
+        self._opened_at = time.monotonic()
+        self._size = 0
+
+    def write(self, payload: bytes):
+        if self._file is not None and (
+            self._size >= self.max_bytes
+            or time.monotonic() - self._opened_at >= self.max_age_seconds
+        ):
+            self.seal()
+        if self._file is None:
+            self._open()
+        try:
+            self._file.write(payload)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        except OSError:
+            # Cut off a partial write so the retried batch starts a clean line
+            try:
+                self._file.truncate(self._size)
+            except (OSError, ValueError):
+                pass
+            raise
+        self._size += len(payload)
+
+    def seal(self):
+        """Close the active file and compress it"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        path = self._path
+        if not self._size:
+            path.unlink()
+        elif self.compress:
+            with open(path, "rb") as src, gzip.open(f"{path}.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            path.unlink()
+
+
+class AuditSink:
+    """
+    Structured audit records written by a background thread.
+
+    emit() only builds a small tuple and puts it on a bounded queue; the
+    writer thread assigns sequence numbers, hash-chains each record to the
+    previous one and writes batches of up to batch_size records, or
+    whatever arrived within flush_interval. When the queue is full the
+    "drop" policy discards the record and "block" waits up to
+    block_timeout before doing so; either way it is counted in dropped.
+    The chain resumes from the newest file in the directory, so a
+    directory must have a single writing process.
+    """
+
+    def __init__(
+        self,
+        writer: AuditFileWriter,
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow: str = DROP,
+        block_timeout: float = 0.05
+    ):
+        if overflow not in (DROP, BLOCK):
+            raise ValueError(f"overflow must be {DROP!r} or {BLOCK!r}, not {overflow!r}")
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.seq = 0
+        self.head = GENESIS
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._atexit = False
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            last = last_record(self.writer.directory)
+            if last is not None:
+                self.seq, self.head = last["seq"], last["hash"]
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+            if not self._atexit:
+                atexit.register(self.close)
+                self._atexit = True
+
+    def emit(self, event_type: str, details: Dict, ts: Optional[float] = None) -> bool:
+        """Queue a record; False if it was dropped"""
+        if self._thread is None:
+            self.start()
+        item = (time.time() if ts is None else ts, event_type, dict(details))
+        try:
+            if self.overflow == BLOCK:
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def _encode(self, batch: List[tuple]) -> bytes:
+        lines = []
+        for ts, event_type, details in batch:
+            self.seq += 1
+            line, self.head = encode_record({
+                "seq": self.seq,
+                "ts": ts,
+                "event_type": event_type,
+                "details": details,
+                "prev": self.head
+            })
+            lines.append(line)
+        return b"".join(lines)
+
+    def _write(self, batch: List[tuple]):
+        seq, head = self.seq, self.head
+        while True:
+            try:
+                self.writer.write(self._encode(batch))
+                break
+            except OSError as e:
+                # Re-encode the same records from the same chain position
+                self.seq, self.head = seq, head
+                self.write_errors += 1
+                if self._stopping:
+                    logger.error(f"Dropping {len(batch)} audit records on shutdown: {e}")
+                    with self._lock:
+                        self.dropped += len(batch)
+                    return
+                if self.write_errors == 1 or self.write_errors % 100 == 0:
+                    logger.error(f"Writing audit log failed: {e}")
+                time.sleep(self.flush_interval)
+        self.written += len(batch)
+        self.batches += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item] if item is not None else []
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is not None:
+                    batch.append(item)
+            if batch:
+                self._write(batch)
+            # None is the stop sentinel put by close()
+            if item is None:
+                break
+        self.writer.seal()
+
+    def close(self, timeout: Optional[float] = 10):
+        """Write everything queued, then seal the active file"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._thread = None
+            self._stopping = True
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def stats(self) -> Dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "write_errors": self.write_errors,
+            "seq": self.seq
+        }
+
+
+def _iter_lines(path: Path) -> Iterator[bytes]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rb") as f:
+        for line in f:
+            # A partially written last line belongs to an active file
+            if line.endswith(b"\n"):
+                yield line
+
+
+def iter_files(directory: Union[str, Path]) -> List[Path]:
+    """Audit files oldest first, sealed and active"""
+    directory = Path(directory)
+    if not directory.exists():
+        return []
+    return sorted(
+        p for p in directory.iterdir()
+        if p.name.startswith(AUDIT_PREFIX) and p.name.endswith((".jsonl", ".jsonl.gz"))
+    )
+
+
+def _file_info(path: Path) -> Tuple[float, str]:
+    """(UTC start time, writer pid) from a file name"""
+    stamp, pid = path.name[len(AUDIT_PREFIX):].split("-")[:2]
+    start = datetime.strptime(stamp, "%Y%m%dT%H%M%S%f").replace(tzinfo=timezone.utc).timestamp()
+    return start, pid
+
+
+def last_record(directory: Union[str, Path]) -> Optional[Dict]:
+    """The newest record in the directory, where a new chain link starts"""
+    for path in reversed(iter_files(directory)):
+        last = None
+        for last in _iter_lines(path):
+            pass
+        if last is not None:
+            return json.loads(last)
+    return None
+
+
+def iter_records(
+    directory: Union[str, Path],
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    event_type: Optional[str] = None
+) -> Iterator[Dict]:
+    """
+    Stream records with since <= ts <= until, one at a time.
+
+    Files that end before since (the writer's next file started earlier)
+    or start after until are skipped without being opened.
+    """
+    files = iter_files(directory)
+    info = [_file_info(p) for p in files]
+    # Start of the same writer's next file bounds this file's records
+    ends: List[Optional[float]] = [None] * len(files)
+    following: Dict[str, float] = {}
+    for i in range(len(files) - 1, -1, -1):
+        start, pid = info[i]
+        ends[i] = following.get(pid)
+        following[pid] = start
+    for path, (start, _), end in zip(files, info, ends):
+        if until is not None and start > until:
+            break
+        if since is not None and end is not None and end < since:
+            continue
+        if not path.exists():
+            # Sealed since we listed the directory; the .gz holds the same records
+            path = path.with_name(path.name + ".gz")
+            if not path.exists():
+                continue
+        for line in _iter_lines(path):
+            record = json.loads(line)
+            ts = record["ts"]
+            if since is not None and ts < since:
+                continue
+            if until is not None and ts > until:
+                continue
+            if event_type is not None and record["event_type"] != event_type:
+                continue
+            yield record
+
+
+def verify_chain(directory: Union[str, Path]) -> Dict:
+    """
+    Recompute every hash and check each record links to the one before.
+
+    The first record's prev is reported as the anchor; compare it with a
+    previously exported head to detect removal of whole leading files.
+    """
+    result = {"valid": True, "records": 0, "files": 0, "anchor": None, "head": None, "error": None}
+    prev = None
+    seq = None
+    for path in iter_files(directory):
+        result["files"] += 1
+        for line in _iter_lines(path):
+            record = json.loads(line)
+            error = None
+            if record_hash(record) != record.get("hash"):
+                error = "hash mismatch"
+            elif prev is None:
+                result["anchor"] = record["prev"]
+            elif record["prev"] != prev:
+                error = "broken chain"
+            elif record["seq"] != seq + 1:
+                error = "sequence gap"
+            if error is not None:
+                result.update(valid=False, error=f"{error} at seq {record.get('seq')} in {path.name}")
+                return result
+            prev, seq = record["hash"], record["seq"]
+            result["records"] += 1
+    result["head"] = prev
+    return result
+
+
+def _parse_time(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query or verify an audit log directory")
+    parser.add_argument("directory")
+    parser.add_argument("--since", type=_parse_time, help="epoch seconds or ISO time (UTC if naive)")
+    parser.add_argument("--until", type=_parse_time, help="epoch seconds or ISO time (UTC if naive)")
+    parser.add_argument("--event-type")
+    parser.add_argument("--verify", action="store_true", help="check the hash chain instead of printing records")
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        result = verify_chain(args.directory)
+        print(json.dumps(result, indent=2))
+        return 0 if result["valid"] else 1
+    for record in iter_records(args.directory, args.since, args.until, args.event_type):
+        record["time"] = _iso(record["ts"])
+        sys.stdout.write(json.dumps(record) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
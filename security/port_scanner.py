@@ -0,0 +1,177 @@
+"""
+Asynchronous TCP connect port scanner
+"""
+import asyncio
+import ipaddress
+import logging
+import time
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PortSpec = Union[int, str, Iterable[Union[int, str]]]
+
+
+class PortResult(NamedTuple):
+    """Outcome of probing one host:port"""
+    host: str
+    port: int
+    state: str  # open, closed, filtered
+
+
+def expand_ports(spec: PortSpec) -> List[int]:
+    """
+    Expand a port specification into a sorted, de-duplicated list.
+
+    Accepts an int, a string such as "22,80,8000-8100", or an iterable
+    mixing both.
+    """
+    if isinstance(spec, (int, str)):
+        spec = [spec]
+    ports = set()
+    for item in spec:
+        if isinstance(item, int):
+            ports.add(item)
+            continue
+        for part in str(item).split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if "-" in part:
+                low, high = part.split("-", 1)
+                ports.update(range(int(low), int(high) + 1))
+            else:
+                ports.add(int(part))
+    invalid = [p for p in ports if not 0 < p < 65536]
+    if invalid:
+        raise ValueError(f"Invalid port numbers: {sorted(invalid)[:5]}")
+    return sorted(ports)
+
+
+def expand_targets(targets: Union[str, Iterable[str]]) -> List[str]:
+    """Expand hostnames, addresses and CIDR blocks into individual hosts"""
+    if isinstance(targets, str):
+        targets = [targets]
+    hosts = []
+    for target in targets:
+        if "/" in target:
+            network = ipaddress.ip_network(target, strict=False)
+            if network.num_addresses == 1:
+                hosts.append(str(network.network_address))
+            else:
+                hosts.extend(str(h) for h in network.hosts())
+        else:
+            hosts.append(target)
+    return hosts
+
+
+class RateLimiter:
+    """Token bucket limiting connection attempts per second"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncPortScanner:
+    """
+    TCP connect scanner built on asyncio.open_connection.
+
+    A fixed pool of workers bounds total concurrency, a semaphore per host
+    bounds how hard any single target is hit, and an optional per-host rate
+    limit caps connection attempts per second. Results are streamed as they
+    complete.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 500,
+        per_host_concurrency: int = 100,
+        timeout: float = 1.0,
+        rate_per_host: Optional[float] = None
+    ):
+        self.concurrency = concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.timeout = timeout
+        self.rate_per_host = rate_per_host
+
+    async def probe(self, host: str, port: int) -> str:
+        """Attempt a single TCP connection and classify the port"""
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), self.timeout
+            )
+        except asyncio.TimeoutError:
+            return "filtered"
+        except ConnectionRefusedError:
+            return "closed"
+        except OSError:
+            # Unreachable host/network and similar; nothing is listening for us
+            return "filtered"
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return "open"
+
+    async def scan(
+        self,
+        targets: Union[str, Iterable[str]],
+        ports: PortSpec
+    ) -> AsyncIterator[PortResult]:
+        """Scan every port on every target, yielding results as they complete"""
+        hosts = expand_targets(targets)
+        port_list = expand_ports(ports)
+        host_slots: Dict[str, asyncio.Semaphore] = {
+            h: asyncio.Semaphore(self.per_host_concurrency) for h in hosts
+        }
+        limiters: Dict[str, RateLimiter] = {}
+        if self.rate_per_host:
+            limiters = {h: RateLimiter(self.rate_per_host) for h in hosts}
+
+        # Interleave hosts so one large target does not monopolise the workers
+        work = ((h, p) for p in port_list for h in hosts)
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        done = object()
+
+        async def worker():
+            for host, port in work:
+                async with host_slots[host]:
+                    if limiters:
+                        await limiters[host].acquire()
+                    state = await self.probe(host, port)
+                await results.put(PortResult(host, port, state))
+            await results.put(done)
+
+        worker_count = max(1, min(self.concurrency, len(hosts) * len(port_list)))
+        workers = [asyncio.create_task(worker()) for _ in range(worker_count)]
+        try:
+            finished = 0
+            while finished < worker_count:
+                item = await results.get()
+                if item is done:
+                    finished += 1
+                else:
+                    yield item
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def open_ports(self, target: str, ports: PortSpec) -> List[int]:
+        """Scan a single host and return its open ports in ascending order"""
+        found = [r.port async for r in self.scan(target, ports) if r.state == "open"]
+        return sorted(found)
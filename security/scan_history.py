@@ -0,0 +1,250 @@
+"""
+Bounded, queryable scan-result history
+"""
+import json
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+TimeSpec = Union[datetime, float, None]
+
+# Result keys stored in dedicated slots; anything else goes to "extra"
+_CORE_KEYS = frozenset((
+    "scan_type", "target", "timestamp", "risk_level",
+    "open_ports", "reachable", "vulnerabilities", "findings"
+))
+_FINDINGS_KEY = {"vulnerability_scan": "vulnerabilities", "penetration_test": "findings"}
+
+
+def _epoch(value: TimeSpec) -> Optional[float]:
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def _finding_key(finding) -> str:
+    """Hashable canonical form of a finding (vulnerabilities are dicts)"""
+    return json.dumps(finding, sort_keys=True, default=str)
+
+
+def diff_ports(old: array, new: array) -> Tuple[List[int], List[int]]:
+    """Merge two sorted port arrays into (opened, closed)"""
+    opened, closed = [], []
+    i = j = 0
+    while i < len(old) and j < len(new):
+        if old[i] == new[j]:
+            i += 1
+            j += 1
+        elif old[i] < new[j]:
+            closed.append(old[i])
+            i += 1
+        else:
+            opened.append(new[j])
+            j += 1
+    closed.extend(old[i:])
+    opened.extend(new[j:])
+    return opened, closed
+
+
+class _Entry:
+    __slots__ = ("time", "scan_type", "risk_level", "ports", "reachable", "findings", "extra")
+
+    def __init__(self, result: Dict):
+        self.time = _epoch(datetime.fromisoformat(result["timestamp"]))
+        self.scan_type = result["scan_type"]
+        self.risk_level = result.get("risk_level")
+        ports = result.get("open_ports")
+        self.ports = array("H", sorted(ports)) if ports is not None else None
+        self.reachable = result.get("reachable")
+        findings = result.get(_FINDINGS_KEY.get(self.scan_type, ""))
+        self.findings = tuple(findings) if findings else ()
+        extra = {k: v for k, v in result.items() if k not in _CORE_KEYS}
+        self.extra = extra or None
+
+    def to_dict(self, target: str) -> Dict:
+        result = {
+            "scan_type": self.scan_type,
+            "target": target,
+            "timestamp": _iso(self.time),
+            "risk_level": self.risk_level
+        }
+        if self.ports is not None:
+            result["open_ports"] = self.ports.tolist()
+        if self.reachable is not None:
+            result["reachable"] = self.reachable
+        if self.scan_type in _FINDINGS_KEY:
+            result[_FINDINGS_KEY[self.scan_type]] = list(self.findings)
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+
+class _Ring:
+    """Fixed-capacity ring of entries for one target, oldest first"""
+
+    __slots__ = ("entries", "times", "start", "size", "latest")
+
+    def __init__(self, capacity: int):
+        self.entries: List[Optional[_Entry]] = [None] * capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.start = 0
+        self.size = 0
+        # Most recent entry per scan type, for diffing
+        self.latest: Dict[str, _Entry] = {}
+
+    def append(self, entry: _Entry):
+        capacity = len(self.entries)
+        if self.size == capacity:
+            slot = self.start
+            self.start = (self.start + 1) % capacity
+        else:
+            slot = (self.start + self.size) % capacity
+            self.size += 1
+        self.entries[slot] = entry
+        self.times[slot] = entry.time
+        self.latest[entry.scan_type] = entry
+
+    def _at(self, i: int) -> _Entry:
+        return self.entries[(self.start + i) % len(self.entries)]
+
+    def _time_at(self, i: int) -> float:
+        return self.times[(self.start + i) % len(self.entries)]
+
+    def _bound(self, t: float, right: bool) -> int:
+        # Binary search over the logical (unwrapped) order
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self._time_at(mid)
+            if value < t or (right and value == t):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def range(self, since: Optional[float], until: Optional[float]) -> Iterator[_Entry]:
+        lo = 0 if since is None else self._bound(since, right=False)
+        hi = self.size if until is None else self._bound(until, right=True)
+        for i in range(lo, hi):
+            yield self._at(i)
+
+
+class ScanHistory:
+    """
+    Per-target ring buffers of compact scan records.
+
+    Each target keeps at most per_target results, and at most max_targets
+    targets are tracked (least recently scanned dropped first). Open ports
+    are stored as sorted uint16 arrays, so "what changed" between two
+    port scans is a linear merge rather than a set rebuild.
+    """
+
+    def __init__(self, per_target: int = 100, max_targets: int = 10000):
+        self.per_target = per_target
+        self.max_targets = max_targets
+        self._rings: "OrderedDict[str, _Ring]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return sum(ring.size for ring in self._rings.values())
+
+    def targets(self) -> List[str]:
+        return list(self._rings)
+
+    def record(self, result: Dict) -> Optional[Dict]:
+        """
+        Store a scan result and return what changed since the previous
+        result of the same type for that target (None if nothing did).
+        """
+        target = result["target"]
+        ring = self._rings.get(target)
+        if ring is None:
+            ring = self._rings[target] = _Ring(self.per_target)
+            if len(self._rings) > self.max_targets:
+                self._rings.popitem(last=False)
+        else:
+            self._rings.move_to_end(target)
+        entry = _Entry(result)
+        previous = ring.latest.get(entry.scan_type)
+        ring.append(entry)
+        return self._diff(target, previous, entry)
+
+    @staticmethod
+    def _diff(target: str, old: Optional[_Entry], new: _Entry) -> Optional[Dict]:
+        changes = {}
+        if new.ports is not None:
+            opened, closed = diff_ports(old.ports if old and old.ports else array("H"), new.ports)
+            if opened:
+                changes["opened_ports"] = opened
+            if closed:
+                changes["closed_ports"] = closed
+        if old is not None and None not in (old.reachable, new.reachable) \
+                and new.reachable != old.reachable:
+            changes["reachable"] = new.reachable
+        old_findings = old.findings if old else ()
+        new_findings = new.findings or ()
+        old_keys = set(map(_finding_key, old_findings))
+        new_keys = set(map(_finding_key, new_findings))
+        added = [f for f in new_findings if _finding_key(f) not in old_keys]
+        removed = [f for f in old_findings if _finding_key(f) not in new_keys]
+        if added:
+            changes["new_findings"] = added
+        if removed:
+            changes["resolved_findings"] = removed
+        if old is not None and new.risk_level != old.risk_level:
+            changes["risk_level"] = {"from": old.risk_level, "to": new.risk_level}
+        if not changes:
+            return None
+        return {
+            "target": target,
+            "scan_type": new.scan_type,
+            "timestamp": _iso(new.time),
+            "previous_timestamp": _iso(old.time) if old else None,
+            **changes
+        }
+
+    def query(
+        self,
+        target: Optional[str] = None,
+        since: TimeSpec = None,
+        until: TimeSpec = None,
+        scan_type: Optional[str] = None
+    ) -> List[Dict]:
+        """Results for one or all targets in [since, until], oldest first"""
+        since, until = _epoch(since), _epoch(until)
+        if target is not None:
+            rings = [(target, self._rings[target])] if target in self._rings else []
+        else:
+            rings = list(self._rings.items())
+        rows = []
+        for name, ring in rings:
+            for entry in ring.range(since, until):
+                if scan_type is None or entry.scan_type == scan_type:
+                    rows.append((entry.time, name, entry))
+        if target is None:
+            rows.sort(key=lambda row: row[0])
+        return [entry.to_dict(name) for _, name, entry in rows]
+
+    def latest(self, target: str, scan_type: str = "port_scan") -> Optional[Dict]:
+        ring = self._rings.get(target)
+        if ring is None or scan_type not in ring.latest:
+            return None
+        return ring.latest[scan_type].to_dict(target)
+
+    def changes_since(self, target: str, since: TimeSpec, scan_type: str = "port_scan") -> Optional[Dict]:
+        """Difference between the last result before since and the latest result"""
+        ring = self._rings.get(target)
+        if ring is None or scan_type not in ring.latest:
+            return None
+        since = _epoch(since)
+        baseline = None
+        for entry in ring.range(None, since):
+            if entry.scan_type == scan_type and entry.time < since:
+                baseline = entry
+        return self._diff(target, baseline, ring.latest[scan_type])
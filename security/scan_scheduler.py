@@ -0,0 +1,246 @@
+"""
+Concurrent scan scheduler for continuous monitoring
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ScanFunction = Callable[[str], Awaitable[Dict]]
+
+
+def default_fingerprint(result: Dict) -> Hashable:
+    """Everything in a scan result except when it was taken"""
+    return repr(sorted((k, v) for k, v in result.items() if k != "timestamp"))
+
+
+class _TargetState:
+    __slots__ = (
+        "target", "priority", "interval", "next_due", "backoff",
+        "failures", "fingerprint", "generation", "scans"
+    )
+
+    def __init__(self, target: str, priority: int, interval: float, next_due: float):
+        self.target = target
+        self.priority = priority
+        self.interval = interval
+        self.next_due = next_due
+        self.backoff = 1.0
+        self.failures = 0
+        self.fingerprint: Optional[Hashable] = None
+        self.generation = 0
+        self.scans = 0
+
+
+class ScanScheduler:
+    """
+    Runs scans for many targets concurrently on a fixed worker pool.
+
+    Each target is due once per interval. Initial runs are staggered across
+    the interval and every reschedule is jittered so scans do not burst.
+    Targets whose results did not change, or that could not be reached,
+    back off geometrically (up to max_backoff times their interval) and
+    snap back to the base interval as soon as something changes. When
+    several targets are due at once, higher priority runs first.
+    """
+
+    def __init__(
+        self,
+        scan: ScanFunction,
+        interval: float = 3600,
+        workers: int = 8,
+        jitter: float = 0.1,
+        unchanged_backoff: float = 1.5,
+        failure_backoff: float = 2.0,
+        max_backoff: float = 8.0,
+        fingerprint: Callable[[Dict], Hashable] = default_fingerprint,
+        on_result: Optional[Callable[[str, Dict, bool], Any]] = None
+    ):
+        self.scan = scan
+        self.interval = interval
+        self.workers = workers
+        self.jitter = jitter
+        self.unchanged_backoff = unchanged_backoff
+        self.failure_backoff = failure_backoff
+        self.max_backoff = max_backoff
+        self.fingerprint = fingerprint
+        self.on_result = on_result
+
+        self._targets: Dict[str, _TargetState] = {}
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._queue: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.max_lag = 0.0
+        self._lag_ewma = 0.0
+        self._completions: deque = deque()
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _push(self, state: _TargetState):
+        state.generation += 1
+        heapq.heappush(
+            self._heap,
+            (state.next_due, -state.priority, next(self._seq), state.target, state.generation)
+        )
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def add_target(self, target: str, priority: int = 0, interval: Optional[float] = None):
+        """Add or update a target; new targets get a random start offset"""
+        interval = interval or self.interval
+        state = self._targets.get(target)
+        if state is None:
+            offset = random.uniform(0, interval)
+            state = _TargetState(target, priority, interval, time.monotonic() + offset)
+            self._targets[target] = state
+        else:
+            state.priority = priority
+            state.interval = interval
+        self._push(state)
+
+    def set_targets(self, targets: List[str], priority: int = 0):
+        """Add many targets at once, staggered evenly across the interval"""
+        now = time.monotonic()
+        new = [t for t in targets if t not in self._targets]
+        for i, target in enumerate(new):
+            offset = self.interval * i / len(new)
+            state = _TargetState(target, priority, self.interval, now + self._jittered(offset))
+            self._targets[target] = state
+            self._push(state)
+
+    def remove_target(self, target: str) -> bool:
+        # Heap entries for removed targets are skipped lazily
+        return self._targets.pop(target, None) is not None
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            due, _, _, target, generation = self._heap[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            state = self._targets.get(target)
+            if state is None or state.generation != generation:
+                continue
+            # Bounded queue: when all workers are busy the dispatcher waits
+            # here and overdue targets show up as lag instead of piling up
+            await self._queue.put(state)
+
+    async def _work(self):
+        while True:
+            state = await self._queue.get()
+            if self._targets.get(state.target) is not state:
+                continue
+            now = time.monotonic()
+            lag = max(0.0, now - state.next_due)
+            self.max_lag = max(self.max_lag, lag)
+            self._lag_ewma = 0.8 * self._lag_ewma + 0.2 * lag
+            self.in_flight += 1
+            try:
+                result = await self.scan(state.target)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Scan of {state.target} failed: {e}")
+                result = None
+            finally:
+                self.in_flight -= 1
+            self._complete(state, result)
+
+    def _complete(self, state: _TargetState, result: Optional[Dict]):
+        now = time.monotonic()
+        self.completed += 1
+        self._completions.append(now)
+        state.scans += 1
+
+        if result is None or result.get("reachable") is False:
+            self.failed += 1
+            state.failures += 1
+            state.backoff = min(self.max_backoff, state.backoff * self.failure_backoff)
+            changed = False
+        else:
+            state.failures = 0
+            fingerprint = self.fingerprint(result)
+            changed = fingerprint != state.fingerprint
+            state.fingerprint = fingerprint
+            if changed:
+                state.backoff = 1.0
+            else:
+                state.backoff = min(self.max_backoff, state.backoff * self.unchanged_backoff)
+
+        if result is not None and self.on_result is not None:
+            try:
+                self.on_result(state.target, result, changed)
+            except Exception as e:
+                logger.error(f"Scan result handler failed for {state.target}: {e}")
+
+        if self._targets.get(state.target) is state:
+            state.next_due = now + self._jittered(state.interval * state.backoff)
+            self._push(state)
+
+    def start(self):
+        """Start the dispatcher and worker tasks on the running loop"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.workers)
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._dispatch())]
+        self._tasks += [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logger.info(f"Scan scheduler started with {self.workers} workers for {len(self._targets)} targets")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run(self):
+        """Start the scheduler and run until cancelled"""
+        self.start()
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.stop()
+
+    def stats(self, window: float = 60.0) -> Dict:
+        """Queue depth, lag and throughput figures"""
+        now = time.monotonic()
+        while self._completions and now - self._completions[0] > window:
+            self._completions.popleft()
+        overdue = sum(
+            1 for due, _, _, target, generation in self._heap
+            if due <= now and self._targets.get(target) is not None
+            and self._targets[target].generation == generation
+        )
+        return {
+            "targets": len(self._targets),
+            "queue_depth": overdue + (self._queue.qsize() if self._queue else 0),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "lag_seconds": round(self._lag_ewma, 3),
+            "max_lag_seconds": round(self.max_lag, 3),
+            "scans_per_second": round(len(self._completions) / window, 3),
+            "backed_off": sum(1 for s in self._targets.values() if s.backoff > 1.0)
+        }
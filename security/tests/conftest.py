@@ -0,0 +1,14 @@
+"""
+Shared fixtures: run from the repository root (``pytest security/tests``)
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
@@ -0,0 +1,95 @@
+"""
+Audit hash chain: written batches verify, and any edit is caught at its record
+"""
+import json
+
+import pytest
+
+from security.audit import GENESIS, AuditFileWriter, AuditSink, encode_record, iter_files, main, verify_chain
+
+
+def _write(directory, count: int, compress: bool = False):
+    sink = AuditSink(AuditFileWriter(directory, compress=compress), flush_interval=0.01)
+    for i in range(count):
+        assert sink.emit("login", {"user": f"user-{i}", "ok": i % 2 == 0}, ts=1700000000.0 + i)
+    sink.close()
+    assert sink.written == count
+
+
+def _lines(directory):
+    (path,) = iter_files(directory)
+    return path, path.read_bytes().splitlines(keepends=True)
+
+
+def test_written_batch_verifies(tmp_path):
+    _write(tmp_path, 5)
+
+    result = verify_chain(tmp_path)
+
+    assert result["valid"] and result["error"] is None
+    assert result["records"] == 5 and result["anchor"] == GENESIS
+    _, lines = _lines(tmp_path)
+    assert result["head"] == json.loads(lines[-1])["hash"]
+    assert main([str(tmp_path), "--verify"]) == 0
+
+
+def test_edited_record_fails_at_that_record(tmp_path):
+    _write(tmp_path, 5)
+    path, lines = _lines(tmp_path)
+    record = json.loads(lines[2])
+    record["details"]["ok"] = not record["details"]["ok"]
+    lines[2] = json.dumps(record).encode() + b"\n"
+    path.write_bytes(b"".join(lines))
+
+    result = verify_chain(tmp_path)
+
+    assert not result["valid"]
+    assert result["error"].startswith("hash mismatch at seq 3 ")
+    assert result["records"] == 2
+    assert main([str(tmp_path), "--verify"]) == 1
+
+
+def test_rehashed_edit_breaks_the_chain_at_the_next_record(tmp_path):
+    _write(tmp_path, 5)
+    path, lines = _lines(tmp_path)
+    record = json.loads(lines[2])
+    record.pop("hash")
+    record["details"]["user"] = "mallory"
+    lines[2], _ = encode_record(record)
+    path.write_bytes(b"".join(lines))
+
+    result = verify_chain(tmp_path)
+
+    assert not result["valid"] and result["error"].startswith("broken chain at seq 4 ")
+
+
+@pytest.mark.parametrize("index, seq", [(2, 4), (4, None)])
+def test_deleted_record_is_detected(tmp_path, index, seq):
+    _write(tmp_path, 5)
+    path, lines = _lines(tmp_path)
+    head = json.loads(lines[-1])["hash"]
+    del lines[index]
+    path.write_bytes(b"".join(lines))
+
+    result = verify_chain(tmp_path)
+
+    if seq is None:
+        # Dropping the newest record leaves a valid prefix; only an exported head shows it
+        assert result["valid"] and result["head"] != head
+    else:
+        assert not result["valid"] and result["error"].startswith(f"broken chain at seq {seq} ")
+
+
+def test_chain_resumes_across_sinks_and_compressed_files(tmp_path):
+    _write(tmp_path, 3, compress=True)
+    _write(tmp_path, 2, compress=True)
+
+    result = verify_chain(tmp_path)
+
+    assert result["valid"] and result["records"] == 5 and result["files"] == 2
+    assert all(p.name.endswith(".jsonl.gz") for p in iter_files(tmp_path))
+
+    iter_files(tmp_path)[0].unlink()
+    result = verify_chain(tmp_path)
+    # The remaining file still verifies, but no longer starts at the genesis
+    assert result["valid"] and result["anchor"] != GENESIS
@@ -0,0 +1,91 @@
+"""
+AsyncPortScanner against listeners on 127.0.0.1
+"""
+import asyncio
+import socket
+import time
+from collections import Counter
+
+import pytest
+
+from security.port_scanner import AsyncPortScanner, expand_ports, expand_targets
+
+pytestmark = pytest.mark.anyio
+
+
+def _closed_ports(count: int):
+    """Ports that were free a moment ago, so connecting to them is refused"""
+    sockets = [socket.create_server(("127.0.0.1", 0)) for _ in range(count)]
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+    return ports
+
+
+def _instrument(scanner: AsyncPortScanner, delay: float = 0.0):
+    """Replace probe with a stub recording per-host concurrency and start times"""
+    active, peak, started = Counter(), Counter(), []
+
+    async def probe(host, port):
+        active[host] += 1
+        peak[host] = max(peak[host], active[host])
+        started.append(time.monotonic())
+        await asyncio.sleep(delay)
+        active[host] -= 1
+        return "closed"
+
+    scanner.probe = probe
+    return peak, started
+
+
+def test_expand_ports_and_targets():
+    assert expand_ports("22, 80,8000-8002") == [22, 80, 8000, 8001, 8002]
+    assert expand_ports([443, "22"]) == [22, 443]
+    with pytest.raises(ValueError):
+        expand_ports("0-2")
+    assert expand_targets("10.0.0.0/30") == ["10.0.0.1", "10.0.0.2"]
+    assert expand_targets(["10.0.0.9/32", "localhost"]) == ["10.0.0.9", "localhost"]
+
+
+async def test_open_and_closed_ports():
+    servers = [await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0) for _ in range(3)]
+    open_ports = sorted(s.sockets[0].getsockname()[1] for s in servers)
+    closed_ports = _closed_ports(3)
+    try:
+        scanner = AsyncPortScanner(concurrency=8, timeout=2.0)
+        results = [r async for r in scanner.scan("127.0.0.1", open_ports + closed_ports)]
+        found = await scanner.open_ports("127.0.0.1", open_ports + closed_ports)
+    finally:
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+
+    states = {r.port: r.state for r in results}
+    assert states == {**{p: "open" for p in open_ports}, **{p: "closed" for p in closed_ports}}
+    assert {r.host for r in results} == {"127.0.0.1"}
+    assert found == open_ports
+
+
+async def test_per_host_concurrency_limit():
+    scanner = AsyncPortScanner(concurrency=50, per_host_concurrency=3)
+    peak, _ = _instrument(scanner, delay=0.01)
+
+    results = [r async for r in scanner.scan(["10.0.0.1", "10.0.0.2"], "1-30")]
+
+    assert len(results) == 60
+    assert peak == {"10.0.0.1": 3, "10.0.0.2": 3}
+
+
+async def test_rate_limit_per_host():
+    scanner = AsyncPortScanner(concurrency=50, rate_per_host=40)
+    _, started = _instrument(scanner)
+
+    start = time.monotonic()
+    results = [r async for r in scanner.scan(["10.0.0.1", "10.0.0.2"], "1-80")]
+    elapsed = time.monotonic() - start
+
+    assert len(results) == 160
+    # A burst of 40 per host, then 40 per second each: about a second for both hosts together
+    assert 0.9 <= elapsed < 2.5
+    early = sum(1 for t in started if t - start < 0.5)
+    assert early <= 2 * (40 + 40 * 0.5) + 2
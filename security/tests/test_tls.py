@@ -0,0 +1,111 @@
+"""
+TLSContextManager against certificates from scripts/generate_certs.sh
+"""
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+from pathlib import Path
+
+import pytest
+
+from security.tls import TLSContextManager
+
+GENERATE_CERTS = Path(__file__).resolve().parent.parent.parent / "scripts" / "generate_certs.sh"
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("openssl") is None or shutil.which("bash") is None,
+    reason="needs openssl and bash to generate certificates"
+)
+
+
+def _generate(directory: Path):
+    subprocess.run(["bash", str(GENERATE_CERTS), str(directory)], check=True, capture_output=True)
+
+
+def _client_context(directory: Path) -> ssl.SSLContext:
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.load_verify_locations(str(directory / "ca.crt"))
+    context.load_cert_chain(str(directory / "client.crt"), str(directory / "client.key"))
+    return context
+
+
+def _talk(port: int, context: ssl.SSLContext) -> bytes:
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        with context.wrap_socket(sock, server_hostname="localhost") as tls:
+            return tls.recv(2)
+
+
+def _rejected(port: int, context: ssl.SSLContext) -> bool:
+    try:
+        return _talk(port, context) != b"ok"
+    except (ssl.SSLError, OSError):
+        return True
+
+
+@pytest.fixture
+def serve():
+    """Serve an SSL context on 127.0.0.1, answering b"ok" after each handshake"""
+    listeners = []
+
+    def start(context: ssl.SSLContext) -> int:
+        listener = socket.create_server(("127.0.0.1", 0))
+        listeners.append(listener)
+
+        def run():
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                except OSError:
+                    return
+                conn.settimeout(5)
+                try:
+                    with context.wrap_socket(conn, server_side=True) as tls:
+                        tls.sendall(b"ok")
+                except (ssl.SSLError, OSError):
+                    conn.close()
+
+        threading.Thread(target=run, daemon=True).start()
+        return listener.getsockname()[1]
+
+    yield start
+    for listener in listeners:
+        listener.close()
+
+
+def test_mtls_handshake(tmp_path, serve):
+    _generate(tmp_path)
+    manager = TLSContextManager(tmp_path, check_interval=0)
+    port = serve(manager.server_context())
+
+    assert _talk(port, manager.client_context()) == b"ok"
+    anonymous = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    anonymous.load_verify_locations(str(tmp_path / "ca.crt"))
+    assert _rejected(port, anonymous)
+
+
+def test_reload_after_ca_rotation(tmp_path, serve):
+    certs, old = tmp_path / "certs", tmp_path / "old"
+    _generate(certs)
+    shutil.copytree(certs, old)
+    manager = TLSContextManager(certs, check_interval=3600)
+    server = manager.server_context()
+    port = serve(server)
+    assert _talk(port, manager.client_context()) == b"ok"
+
+    for name in ("ca.crt", "ca.key"):
+        (certs / name).unlink()
+    _generate(certs)
+    # Not picked up until the next check
+    assert _rejected(port, _client_context(certs))
+
+    assert manager.reload()
+    assert manager.server_context() is server
+    assert _talk(port, manager.client_context()) == b"ok"
+    assert _talk(port, _client_context(certs)) == b"ok"
+    # Trusts the new server, but presents a client certificate from the old CA
+    old_client = _client_context(old)
+    old_client.load_verify_locations(str(certs / "ca.crt"))
+    assert _rejected(port, old_client)
+    assert not manager.reload()
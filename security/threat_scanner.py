@@ -4,48 +4,88 @@ Threat Scanner and Penetration Testing Module
 import asyncio
 import logging
 from datetime import datetime
-from typing import List, Dict
-import socket
+from typing import AsyncIterator, Callable, List, Dict, Optional, Union
+
+from security.port_scanner import AsyncPortScanner, PortResult, PortSpec
+from security.scan_history import ScanHistory
+from security.scan_scheduler import ScanScheduler
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PORTS = [22, 80, 443, 8000, 8080]
+
 
 class ThreatScanner:
     """Performs security scans and vulnerability assessments"""
     
-    def __init__(self):
-        self.scan_results = []
+    def __init__(
+        self,
+        concurrency: int = 500,
+        per_host_concurrency: int = 100,
+        timeout: float = 1.0,
+        rate_per_host: Optional[float] = None,
+        history_per_target: int = 100
+    ):
+        self.history = ScanHistory(per_target=history_per_target)
+        # Called with the change-set whenever a scan differs from the previous one
+        self.change_handlers: List[Callable[[Dict], None]] = []
+        self.scheduler: Optional[ScanScheduler] = None
+        self.port_scanner = AsyncPortScanner(
+            concurrency=concurrency,
+            per_host_concurrency=per_host_concurrency,
+            timeout=timeout,
+            rate_per_host=rate_per_host
+        )
+    
+    def _record(self, result: Dict):
+        changes = self.history.record(result)
+        if changes is None:
+            return
+        logger.info(f"Scan change on {changes['target']}: {changes}")
+        for handler in self.change_handlers:
+            try:
+                handler(changes)
+            except Exception as e:
+                logger.error(f"Scan change handler failed: {e}")
     
-    async def port_scan(self, target: str, ports: List[int] = None) -> Dict:
+    async def port_scan(self, target: str, ports: PortSpec = None) -> Dict:
         """Perform port scan on target"""
         if ports is None:
-            ports = [22, 80, 443, 8000, 8080]
+            ports = DEFAULT_PORTS
         
         logger.info(f"Starting port scan on {target}")
         open_ports = []
-        
-        for port in ports:
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(1)
-                result = sock.connect_ex((target, port))
-                if result == 0:
-                    open_ports.append(port)
-                sock.close()
-            except Exception as e:
-                logger.error(f"Error scanning port {port}: {e}")
+        reachable = False
+        async for result in self.port_scanner.scan(target, ports):
+            if result.state == "open":
+                open_ports.append(result.port)
+            # A refused connection still proves the host answered
+            reachable = reachable or result.state != "filtered"
+        open_ports.sort()
         
         scan_result = {
             "scan_type": "port_scan",
             "target": target,
             "open_ports": open_ports,
+            "reachable": reachable,
             "timestamp": datetime.utcnow().isoformat(),
             "risk_level": "high" if len(open_ports) > 3 else "medium" if open_ports else "low"
         }
         
-        self.scan_results.append(scan_result)
+        self._record(scan_result)
         return scan_result
     
+    async def stream_port_scan(
+        self,
+        targets: Union[str, List[str]],
+        ports: PortSpec = None
+    ) -> AsyncIterator[PortResult]:
+        """Scan hosts or CIDR ranges, yielding each port result as it completes"""
+        if ports is None:
+            ports = DEFAULT_PORTS
+        async for result in self.port_scanner.scan(targets, ports):
+            yield result
+    
     async def vulnerability_scan(self, target: str) -> Dict:
         """Perform vulnerability assessment"""
         logger.info(f"Starting vulnerability scan on {target}")
@@ -63,7 +103,7 @@ class ThreatScanner:
             "risk_level": "low"
         }
         
-        self.scan_results.append(scan_result)
+        self._record(scan_result)
         return scan_result
     
     async def penetration_test(self, target: str) -> Dict:
@@ -84,20 +124,59 @@ class ThreatScanner:
             "risk_level": "low"
         }
         
-        self.scan_results.append(test_results)
+        self._record(test_results)
         return test_results
     
-    def get_scan_history(self) -> List[Dict]:
-        """Get all scan results"""
-        return self.scan_results
+    def get_scan_history(
+        self,
+        target: Optional[str] = None,
+        since: Union[datetime, float, None] = None,
+        until: Union[datetime, float, None] = None,
+        scan_type: Optional[str] = None
+    ) -> List[Dict]:
+        """Get retained scan results, optionally by target, time range and type"""
+        return self.history.query(target=target, since=since, until=until, scan_type=scan_type)
+    
+    def get_changes(self, target: str, since: Union[datetime, float], scan_type: str = "port_scan") -> Optional[Dict]:
+        """What changed on a target between since and its latest scan"""
+        return self.history.changes_since(target, since, scan_type)
+    
+    async def monitor_target(self, target: str) -> Dict:
+        """Run one monitoring pass (port and vulnerability scan) on a target"""
+        ports, vulnerabilities = await asyncio.gather(
+            self.port_scan(target),
+            self.vulnerability_scan(target)
+        )
+        return {
+            "target": target,
+            "reachable": ports["reachable"],
+            "open_ports": ports["open_ports"],
+            "vulnerabilities": vulnerabilities["vulnerabilities"]
+        }
     
-    async def continuous_monitoring(self, targets: List[str], interval: int = 3600):
-        """Continuous security monitoring"""
+    def create_scheduler(self, interval: int = 3600, workers: int = 8, **kwargs) -> ScanScheduler:
+        """Build a scheduler that runs monitor_target for each target"""
+        return ScanScheduler(self.monitor_target, interval=interval, workers=workers, **kwargs)
+    
+    async def continuous_monitoring(
+        self,
+        targets: Union[List[str], Dict[str, int]],
+        interval: int = 3600,
+        workers: int = 8
+    ):
+        """
+        Continuous security monitoring.
+
+        targets is a list of hosts or a mapping of host to priority. Targets
+        are scanned concurrently and spread across the interval; see
+        ScanScheduler for backoff of unchanged and unreachable hosts.
+        """
         logger.info("Starting continuous security monitoring")
         
-        while True:
-            for target in targets:
-                await self.port_scan(target)
-                await self.vulnerability_scan(target)
-            
-            await asyncio.sleep(interval)
+        self.scheduler = self.create_scheduler(interval=interval, workers=workers)
+        if isinstance(targets, dict):
+            for target, priority in targets.items():
+                self.scheduler.add_target(target, priority=priority)
+        else:
+            self.scheduler.set_targets(targets)
+        await self.scheduler.run()
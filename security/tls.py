@@ -0,0 +1,154 @@
+"""
+Cached, hot-reloadable TLS contexts
+"""
+import logging
+import os
+import ssl
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+TLS_VERSIONS = {
+    "1.2": ssl.TLSVersion.TLSv1_2,
+    "1.3": ssl.TLSVersion.TLSv1_3
+}
+SERVER_FILES = ("server.crt", "server.key", "ca.crt")
+CLIENT_FILES = ("client.crt", "client.key", "ca.crt")
+
+
+def _fingerprint(directory: Path, names: Tuple[str, ...]) -> tuple:
+    """(mtime, size, inode) per file, None for missing ones"""
+    prints = []
+    for name in names:
+        try:
+            st = os.stat(directory / name)
+            prints.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        except OSError:
+            prints.append(None)
+    return tuple(prints)
+
+
+class TLSContextManager:
+    """
+    Builds server and client SSL contexts once and swaps in new ones when
+    the certificate files change.
+
+    The server context handed to the listener never changes. Its SNI
+    callback moves each new handshake onto the newest built context, so
+    rotating server.crt/server.key/ca.crt takes effect without a restart
+    and open connections keep the context they started with. Session
+    tickets are issued from that long-lived context, so edge agents can
+    resume sessions, and skip the certificate exchange, across
+    rotations. Files are checked at most every check_interval seconds; a
+    rebuild that fails (for example a key that does not yet match its
+    certificate mid-rotation) is logged and the previous context stays
+    in use.
+    """
+
+    def __init__(
+        self,
+        cert_path: Union[str, Path] = "/certs",
+        require_mtls: bool = True,
+        min_version: str = "1.3",
+        check_interval: float = 5.0,
+        num_tickets: int = 2
+    ):
+        if min_version not in TLS_VERSIONS:
+            raise ValueError(f"Unsupported minimum TLS version {min_version!r}")
+        self.cert_path = Path(cert_path)
+        self.require_mtls = require_mtls
+        self.min_version = TLS_VERSIONS[min_version]
+        self.check_interval = check_interval
+        self.num_tickets = num_tickets
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._front: Optional[ssl.SSLContext] = None
+        self._contexts: Dict[str, Optional[ssl.SSLContext]] = {"server": None, "client": None}
+        self._prints: Dict[str, Optional[tuple]] = {"server": None, "client": None}
+        self._next_check = {"server": 0.0, "client": 0.0}
+
+    def _build_server(self) -> ssl.SSLContext:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.minimum_version = self.min_version
+        cert_file = self.cert_path / "server.crt"
+        key_file = self.cert_path / "server.key"
+        if cert_file.exists() and key_file.exists():
+            context.load_cert_chain(str(cert_file), str(key_file))
+        else:
+            logger.warning("SSL certificates not found, using defaults")
+        if self.require_mtls:
+            context.verify_mode = ssl.CERT_REQUIRED
+            ca_file = self.cert_path / "ca.crt"
+            if ca_file.exists():
+                context.load_verify_locations(str(ca_file))
+        return context
+
+    def _build_client(self) -> ssl.SSLContext:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.minimum_version = self.min_version
+        ca_file = self.cert_path / "ca.crt"
+        if ca_file.exists():
+            context.load_verify_locations(str(ca_file))
+        else:
+            context.load_default_certs()
+        cert_file = self.cert_path / "client.crt"
+        key_file = self.cert_path / "client.key"
+        if cert_file.exists() and key_file.exists():
+            context.load_cert_chain(str(cert_file), str(key_file))
+        return context
+
+    def _refresh(self, kind: str, force: bool = False) -> Optional[ssl.SSLContext]:
+        now = time.monotonic()
+        current = self._contexts[kind]
+        if current is not None and not force and now < self._next_check[kind]:
+            return current
+        with self._lock:
+            self._next_check[kind] = now + self.check_interval
+            names = SERVER_FILES if kind == "server" else CLIENT_FILES
+            prints = _fingerprint(self.cert_path, names)
+            current = self._contexts[kind]
+            if current is not None and prints == self._prints[kind]:
+                return current
+            try:
+                context = self._build_server() if kind == "server" else self._build_client()
+            except (OSError, ssl.SSLError) as e:
+                if current is None:
+                    raise
+                logger.error(f"Reloading {kind} TLS context failed, keeping the current one: {e}")
+                return current
+            self._contexts[kind] = context
+            self._prints[kind] = prints
+            if current is not None:
+                self.reloads += 1
+                logger.info(f"Reloaded {kind} TLS context from {self.cert_path}")
+            return context
+
+    def _select(self, ssl_object, server_name, front):
+        # Runs during every server handshake; switch it to the newest context
+        context = self._refresh("server")
+        if context is not front:
+            ssl_object.context = context
+
+    def server_context(self) -> ssl.SSLContext:
+        """The long-lived context to pass to the listening server"""
+        if self._front is None:
+            front = self._refresh("server")
+            front.num_tickets = self.num_tickets
+            front.sni_callback = self._select
+            self._front = front
+        return self._front
+
+    def client_context(self) -> ssl.SSLContext:
+        """The current client context (ca.crt, plus client.crt/key for mTLS)"""
+        return self._refresh("client")
+
+    def reload(self) -> bool:
+        """Rebuild now if the files changed; True if a new context was swapped in"""
+        reloads = self.reloads
+        self._refresh("server", force=True)
+        if self._contexts["client"] is not None:
+            self._refresh("client", force=True)
+        return self.reloads > reloads
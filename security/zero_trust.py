@@ -6,19 +6,46 @@ import logging
 from typing import Optional
 from pathlib import Path
 
+from security.audit import AuditFileWriter, AuditSink
+from security.tls import TLSContextManager
+
 logger = logging.getLogger(__name__)
 
 
 class ZeroTrustManager:
     """Manages zero-trust security policies"""
     
-    def __init__(self, cert_path: str = "/certs"):
+    def __init__(
+        self,
+        cert_path: str = "/certs",
+        defense_rules=None,
+        policy=None,
+        audit: Optional[AuditSink] = None,
+        audit_path: str = "data/audit",
+        policies: Optional[dict] = None
+    ):
         self.cert_path = Path(cert_path)
-        self.policies = self._load_policies()
+        self.policies = self._load_policies(policies)
+        # Contexts are built once and rebuilt only when the cert files change
+        self.tls = TLSContextManager(
+            self.cert_path,
+            require_mtls=self.policies["require_mtls"],
+            min_version=self.policies["min_tls_version"],
+            check_interval=self.policies["cert_check_interval"],
+            num_tickets=self.policies["session_tickets"]
+        )
+        # Optional intelligence.defense_rules.DefenseRuleEngine (for example
+        # AdaptiveDefense().defense_rules) consulted on every access check
+        self.defense_rules = defense_rules
+        # Access policy decision point (the API's core.policy.PolicyEngine);
+        # without one every request is denied
+        self.policy = policy
+        # Records are written by a background thread, started on first use
+        self.audit = audit if audit is not None else AuditSink(AuditFileWriter(audit_path))
     
-    def _load_policies(self) -> dict:
-        """Load security policies"""
-        return {
+    def _load_policies(self, overrides: Optional[dict] = None) -> dict:
+        """Load security policies, with any overrides applied to the defaults"""
+        policies = {
             "require_mtls": True,
             "min_tls_version": "1.3",
             "allowed_ciphers": [
@@ -27,40 +54,35 @@ class ZeroTrustManager:
                 "TLS_AES_128_GCM_SHA256"
             ],
             "certificate_validation": "strict",
-            "token_expiry_minutes": 30
+            "token_expiry_minutes": 30,
+            "cert_check_interval": 5.0,
+            "session_tickets": 2
         }
+        policies.update(overrides or {})
+        return policies
     
     def create_ssl_context(self) -> ssl.SSLContext:
-        """Create SSL context with zero-trust settings"""
-        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-        context.minimum_version = ssl.TLSVersion.TLSv1_3
-        
-        # Load certificates if available
-        cert_file = self.cert_path / "server.crt"
-        key_file = self.cert_path / "server.key"
-        
-        if cert_file.exists() and key_file.exists():
-            context.load_cert_chain(str(cert_file), str(key_file))
-            logger.info("SSL certificates loaded")
-        else:
-            logger.warning("SSL certificates not found, using defaults")
-        
-        # Configure for mutual TLS
-        if self.policies["require_mtls"]:
-            context.verify_mode = ssl.CERT_REQUIRED
-            ca_file = self.cert_path / "ca.crt"
-            if ca_file.exists():
-                context.load_verify_locations(str(ca_file))
-        
-        return context
+        """Server SSL context with zero-trust settings (cached, follows cert rotation)"""
+        return self.tls.server_context()
+    
+    def create_client_context(self) -> ssl.SSLContext:
+        """Client SSL context presenting client.crt for mutual TLS"""
+        return self.tls.client_context()
     
-    def validate_access(self, source_ip: str, endpoint: str) -> bool:
-        """Validate access based on zero-trust principles"""
-        # Implement access validation logic
-        # This is a placeholder for more sophisticated validation
-        logger.info(f"Validating access from {source_ip} to {endpoint}")
-        return True
+    def validate_access(self, source_ip: str, endpoint: str, claims: Optional[dict] = None) -> bool:
+        """Validate access based on zero-trust principles (default deny)"""
+        if self.defense_rules is not None:
+            try:
+                if self.defense_rules.is_blocked(source_ip):
+                    logger.debug(f"Access from {source_ip} to {endpoint} blocked by defense rule")
+                    return False
+            except ValueError:
+                logger.warning(f"Rejecting access from invalid address {source_ip!r}")
+                return False
+        if self.policy is None:
+            return False
+        return self.policy.decide(claims or {}, source_ip, endpoint)
     
-    def audit_log(self, event_type: str, details: dict):
-        """Log security events for audit trail"""
-        logger.info(f"Security Event: {event_type} - {details}")
+    def audit_log(self, event_type: str, details: dict) -> bool:
+        """Queue a security event for the audit trail; False if it was dropped"""
+        return self.audit.emit(event_type, details)